@@ -3,11 +3,9 @@ set -euo pipefail
 
 echo "=== FINAL FULL REBUILD & VALIDATION START ==="
 
-# 0) Rebuild artifacts (idempotent)
+# 0) Rebuild artifacts (only stages whose inputs/code changed; FORCE=1 rebuilds all)
 mkdir -p reports/summary
-python -m src.features.derive_numeric
-python -m src.visualization.eda_report
-python -m src.features.preprocess
+python -m src.pipeline run derive_numeric eda_report preprocess ${FORCE:+--force}
 
 # 1) Strict validation (everything required by the case) — NO README HEADER CHECK
 python - <<'PY'
@@ -24,7 +22,8 @@ FEATS_TXT= "reports/feature_names.txt"
 
 # 1A) Raw spec: exact shape & column order
 try:
-    raw = pd.read_excel(RAW_XLSX)
+    from src.data.excel_cache import read_excel_cached
+    raw = read_excel_cached(RAW_XLSX)  # parsed once, shared with the stages
     expected_cols = ['HastaNo','Yas','Cinsiyet','KanGrubu','Uyruk',
                      'KronikHastalik','Bolum','Alerji','Tanilar','TedaviAdi',
                      'TedaviSuresi','UygulamaYerleri','UygulamaSuresi']
@@ -77,8 +76,10 @@ try:
     pipe = joblib.load(PIPE)
     names_map = getattr(pipe, "named_transformers_", {})
     has_mlb = "mlb" in names_map
-    X_input_cols = ['Yas','UygulamaSuresi_min','Cinsiyet','KanGrubu','Uyruk',
-                    'Bolum','TedaviAdi','KronikHastalik','Alerji','UygulamaYerleri']
+    # the columns the pipeline was fitted on (Tanilar too when --hash-width is set)
+    X_input_cols = list(getattr(pipe, "feature_names_in_", [
+        'Yas','UygulamaSuresi_min','Cinsiyet','KanGrubu','Uyruk',
+        'Bolum','TedaviAdi','KronikHastalik','Alerji','UygulamaYerleri']))
     num = pd.read_parquet(NUM_PARQ)  # ensure 'num' is available even if 1B failed
     Xt = pipe.transform(num[X_input_cols].head(10))
     arr = Xt.toarray() if hasattr(Xt, "toarray") else Xt
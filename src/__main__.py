@@ -0,0 +1,56 @@
+"""
+Single entry point: `python -m src <command> [args]`.
+
+Only the module behind the chosen command is imported, so `--help` and
+short jobs (e.g. `transform` with the numpy-only JSON artifact) do not pay
+for pandas/sklearn/matplotlib imports they never use. Each command is the
+`main(argv)` of the module listed below; `python -m <module>` still works.
+
+    python -m src                      # list commands
+    python -m src preprocess --help
+    python -m src transform --input records.jsonl --output X.npy
+"""
+import importlib
+import sys
+
+COMMANDS = {
+    "check":      ("src.data.load_and_check", "spec check of the raw export"),
+    "profile":    ("src.data.profiler", "one-pass data profile checked against the schema contract"),
+    "derive":     ("src.features.derive_numeric", "derive TedaviSuresi_num / UygulamaSuresi_min"),
+    "dedup":      ("src.data.dedup", "drop duplicate rows / repeated ids out-of-core"),
+    "eda":        ("src.visualization.eda_report", "EDA figures & summaries"),
+    "preprocess": ("src.features.preprocess", "fit the pipeline and build the model-ready dataset"),
+    "append":     ("src.features.append", "append a raw batch without refitting"),
+    "transform":  ("src.serving.compiled", "transform JSON records with the saved pipeline"),
+    "serve":      ("src.serving.server", "serve the saved pipeline over HTTP"),
+    "pipeline":   ("src.pipeline", "run stale pipeline stages"),
+    "bench":      ("src.bench", "benchmark the pipeline stages"),
+    "synthetic":  ("src.data.synthetic", "write a seeded synthetic raw dataset"),
+}
+
+
+def usage() -> str:
+    width = max(map(len, COMMANDS))
+    lines = ["usage: python -m src <command> [args]", "", "commands:"]
+    lines += [f"  {name:<{width}}  {summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += ["", "`python -m src <command> --help` shows the options of a command."]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        print(usage(), file=sys.stderr)
+        print(f"\nunknown command: {name}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[name][0])
+    sys.argv = [f"python -m src {name}"] + rest  # argparse usage lines name the command
+    return module.main(rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
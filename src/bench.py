@@ -0,0 +1,238 @@
+"""
+Benchmark suite: time and peak memory of each pipeline stage on synthetic
+data of several sizes (see src.data.synthetic), compared with a stored baseline.
+The baseline (reports/benchmarks/baseline.json) is machine-specific and kept
+out of git: each machine records its own with --save-baseline.
+
+Every (case, size) runs in a fresh subprocess inside `.bench/n<size>_s<seed>/`, which
+mirrors the repo layout (data/raw, data/interim, reports, models), so module
+caches and earlier allocations do not leak between measurements.
+
+- seconds : best wall time of `--repeat` runs of the timed section
+- peak_mb : peak RSS during the timed section (Linux: VmHWM after a reset,
+            elsewhere the process-lifetime ru_maxrss)
+
+A case regresses when seconds or peak_mb exceed the baseline by more than
+`--threshold` (timings under `--min-seconds` are only reported).
+
+Usage:
+    python -m src.bench                                   # 1k/10k/100k, all cases
+    python -m src.bench --sizes 1000 1000000 --cases derive_numeric preprocess
+    python -m src.bench --save-baseline                   # overwrite the baseline
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.perf import peak_rss_mb, reset_peak_rss
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BENCH_DIR = REPO_ROOT / ".bench"
+RESULTS_DIR = REPO_ROOT / "reports" / "benchmarks"
+BASELINE = RESULTS_DIR / "baseline.json"
+LATEST = RESULTS_DIR / "latest.json"
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+RAW = "data/raw/synthetic.parquet"
+NUM_PARQ = "data/interim/01_numeric.parquet"
+
+
+# -------- Cases: setup() -> state, run(state) is timed --------
+def _setup_raw():
+    from src.data.readers import read_raw
+    return read_raw(RAW)
+
+
+def _run_derive(df):
+    from src.features.derive_numeric import derive
+    derive(df.copy())
+
+
+def _setup_mlb():
+    import pandas as pd
+    from src.features.preprocess import MLB_COLS
+    return pd.read_parquet(NUM_PARQ, columns=MLB_COLS)
+
+
+def _run_mlb_fit(X):
+    from src.features.memo import clear_caches
+    from src.features.multilabel import MultiLabelBinarizerDF
+    clear_caches()
+    MultiLabelBinarizerDF(columns=list(X.columns)).fit(X)
+
+
+def _setup_mlb_fitted():
+    from src.features.memo import clear_caches
+    from src.features.multilabel import MultiLabelBinarizerDF
+    X = _setup_mlb()
+    mlb = MultiLabelBinarizerDF(columns=list(X.columns)).fit(X)
+    clear_caches()
+    return mlb, X
+
+
+def _run_mlb_transform(state):
+    from src.features.memo import clear_caches
+    mlb, X = state
+    clear_caches()
+    mlb.transform(X)
+
+
+def _setup_profile():
+    from src.data.profiler import load_contract
+    contract = load_contract(REPO_ROOT / "docs" / "schema_contract.json")
+    contract.pop("rows", None)  # synthetic sizes differ from the real export
+    return contract
+
+
+def _run_profile(contract):
+    from src.data.profiler import iter_input, profile_chunks
+    profile_chunks(iter_input(RAW), contract)
+
+
+def _main_case(module, argv):
+    """Whole stage via its main(); the import is part of setup, not timing."""
+    def setup():
+        import importlib
+        return importlib.import_module(module)
+    return setup, lambda mod: mod.main(argv)
+
+
+CASES = {
+    "derive_numeric": (_setup_raw, _run_derive),
+    "mlb_fit": (_setup_mlb, _run_mlb_fit),
+    "mlb_transform": (_setup_mlb_fitted, _run_mlb_transform),
+    "profile": (_setup_profile, _run_profile),
+    "dedup": _main_case("src.data.dedup", []),
+    "preprocess": _main_case("src.features.preprocess", ["--no-csv"]),
+    "preprocess_chunked": _main_case("src.features.preprocess", ["--no-csv", "--chunksize", "50000"]),
+    "eda_report": _main_case("src.visualization.eda_report", ["--force"]),
+    "eda_large": _main_case("src.visualization.eda_report", ["--large", "--force"]),
+}
+
+
+def _worker(case: str, repeat: int) -> None:
+    """Runs inside the size's work dir; prints one JSON result line."""
+    import gc
+    setup, run = CASES[case]
+    best, peak = float("inf"), 0.0
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        exact = reset_peak_rss()
+        out = io.StringIO()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(out):
+            run(state)
+        best = min(best, time.perf_counter() - t0)
+        peak = max(peak, peak_rss_mb())
+        del state
+    print(json.dumps({"seconds": round(best, 6), "peak_mb": round(peak, 1), "peak_exact": exact}))
+
+
+# -------- Driver --------
+def prepare(size: int, seed: int) -> Path:
+    """Work dir with the synthetic raw file and its derived numeric parquet."""
+    from src.data.synthetic import write
+    work = BENCH_DIR / f"n{size}_s{seed}"
+    if not (work / RAW).exists():
+        print(f"▶ generating {size} rows (seed={seed})")
+        write(work / RAW, size, seed=seed)
+    if not (work / NUM_PARQ).exists():
+        subprocess.run([sys.executable, "-m", "src.features.derive_numeric", "--input", RAW,
+                        "--output", NUM_PARQ, "--chunksize", "100000"],
+                       cwd=work, env=_env(), check=True, stdout=subprocess.DEVNULL)
+    return work
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(REPO_ROOT), env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    env.setdefault("MPLBACKEND", "Agg")
+    return env
+
+
+def measure(case: str, work: Path, repeat: int) -> dict:
+    proc = subprocess.run([sys.executable, "-m", "src.bench", "--worker", case, "--repeat", str(repeat)],
+                          cwd=work, env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{case} failed in {work}:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds: float) -> list:
+    """Return the list of regressions (case/size/metric/baseline/now)."""
+    regressions = []
+    for key, now in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            if metric == "seconds" and base[metric] < min_seconds:
+                continue
+            if now[metric] > base[metric] * (1.0 + threshold):
+                regressions.append({"case": key, "metric": metric, "baseline": base[metric], "now": now[metric]})
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m src.bench", description="Benchmark the pipeline stages.")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown / memory growth")
+    ap.add_argument("--min-seconds", type=float, default=0.05, help="ignore timing regressions below this")
+    ap.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    ap.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.worker:
+        return _worker(args.worker, args.repeat)
+
+    results = {}
+    for size in args.sizes:
+        work = prepare(size, args.seed)
+        for case in args.cases:
+            res = measure(case, work, args.repeat)
+            results[f"{case}@{size}"] = res
+            print(f"  {case:20s} n={size:<9d} {res['seconds']:9.3f}s  peak {res['peak_mb']:8.1f} MB")
+
+    meta = {"python": platform.python_version(), "machine": platform.machine(),
+            "seed": args.seed, "repeat": args.repeat}
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    LATEST.write_text(json.dumps({"meta": meta, "results": results}, indent=2), encoding="utf-8")
+    print(f"✅ Saved: {LATEST.relative_to(REPO_ROOT)}")
+
+    if args.save_baseline:
+        stored = json.loads(BASELINE.read_text(encoding="utf-8"))["results"] if BASELINE.exists() else {}
+        stored.update(results)
+        BASELINE.write_text(json.dumps({"meta": meta, "results": stored}, indent=2, sort_keys=True), encoding="utf-8")
+        print(f"✅ Baseline updated: {BASELINE.relative_to(REPO_ROOT)}")
+        return 0
+    if not BASELINE.exists():
+        print("⚠️ No baseline yet (run with --save-baseline).")
+        return 0
+
+    baseline = json.loads(BASELINE.read_text(encoding="utf-8"))
+    base_env = {k: baseline.get("meta", {}).get(k) for k in ("python", "machine")}
+    if base_env != {k: meta[k] for k in base_env}:
+        print(f"⚠️ Baseline recorded on {base_env}, not this environment; re-record it with --save-baseline.")
+    regressions = compare(results, baseline["results"], args.threshold, args.min_seconds)
+    for r in regressions:
+        print(f"❌ {r['case']} {r['metric']}: {r['baseline']} -> {r['now']}")
+    if regressions:
+        return 1
+    print(f"✅ No regressions beyond {args.threshold:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
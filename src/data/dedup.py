@@ -0,0 +1,424 @@
+"""
+Streaming, hash-based de-duplication.
+
+Same rows as the in-memory
+
+    df.drop_duplicates().drop_duplicates(subset="HastaNo", keep="first")
+
+but computed chunk by chunk with a compact seen-set, so the input never has
+to fit in memory:
+
+- every row is fingerprinted with a vectorized 64-bit hash
+  (`row_hashes`: per-column hashes of the values, combined);
+- ids and row hashes go into `UInt64Set`, an open-addressing hash set held
+  in two numpy arrays (~18 bytes per distinct key);
+- optionally the row hashes go into a `BloomFilter` instead (fixed memory,
+  the full-row count may then over-count by the false-positive rate).
+
+The first row of an id always survives the full-row pass, so the rows kept
+are exactly "first row per id" (missing ids count as one id). That decision
+uses the ids themselves (integer ids are exact keys), not the row hashes, so
+a hash collision can only shift a row between the two dropped counts. Without
+an id column the full-row pass decides alone; two different rows then share
+a 64-bit hash with probability ~ n^2 / 2^65.
+
+Usage:
+    python -m src.data.dedup --chunksize 200000
+    python -m src.data.dedup --input big.parquet --output big_dedup.parquet --rows bloom
+"""
+from __future__ import annotations
+
+import argparse
+import math
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from src import perf
+
+INPUT = Path("data/interim/01_numeric.parquet")
+OUTPUT = Path("data/interim/02_dedup.parquet")
+ID_COL = "HastaNo"
+DEFAULT_CHUNKSIZE = 200_000
+ROW_MODES = ("exact", "bloom", "off")
+
+_NA_HASH = np.uint64(0x9E3779B97F4A7C15)
+_SEED = np.uint64(0x243F6A8885A308D3)
+
+
+def mix64(x) -> np.ndarray:
+    """splitmix64 finalizer (well-spread uint64 -> uint64)."""
+    x = np.asarray(x, dtype=np.uint64)
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+# -------- Hashing --------
+def _numeric_keys(s: pd.Series):
+    """uint64 value keys (1 and 1.0 share a key, -0.0 == 0.0) and the NA mask."""
+    if pd.api.types.is_integer_dtype(s) or pd.api.types.is_bool_dtype(s):
+        na = s.isna().to_numpy()
+        return s.to_numpy(dtype="int64", na_value=0).view(np.uint64), na
+    v = s.to_numpy(dtype="float64", na_value=np.nan)
+    na = np.isnan(v)
+    integral = ~na & (v == np.trunc(v)) & (np.abs(v) < 2.0 ** 63)
+    as_int = np.where(integral, v, 0.0).astype(np.int64).view(np.uint64)
+    return np.where(integral, as_int, (v + 0.0).view(np.uint64)), na
+
+
+def column_hash(s: pd.Series) -> np.ndarray:
+    """
+    64-bit hash per cell, by value: stable across chunks even when the
+    chunk dtypes differ (Int8 vs float32, category vs string vs object).
+    """
+    if pd.api.types.is_numeric_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype):
+        keys, na = _numeric_keys(s)
+        h = mix64(keys)
+        h[na] = _NA_HASH
+        return h
+    # strings / categories / objects: hash each distinct value once
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    uh = pd.util.hash_array(np.asarray(uniques, dtype=object), categorize=False)
+    return np.append(uh, _NA_HASH)[codes]
+
+
+def combine_hashes(hashes: Iterable[np.ndarray], n: int) -> np.ndarray:
+    """Row fingerprints from per-column hashes (order matters)."""
+    acc = np.full(n, _SEED, dtype=np.uint64)
+    for h in hashes:
+        acc *= np.uint64(0x100000001B3)
+        acc ^= h
+    return mix64(acc)
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """64-bit fingerprint per row (column order matters, names do not)."""
+    return combine_hashes((column_hash(df[col]) for col in df.columns), len(df))
+
+
+def id_keys(ids: pd.Series):
+    """Exact uint64 keys for integer ids (hashed otherwise) and the missing mask."""
+    if pd.api.types.is_numeric_dtype(ids) and not isinstance(ids.dtype, pd.CategoricalDtype):
+        return _numeric_keys(ids)
+    na = ids.isna().to_numpy()
+    return column_hash(ids), na
+
+
+# -------- Seen-sets --------
+class UInt64Set:
+    """
+    Open-addressing (linear probing) set of uint64 keys in numpy arrays.
+    Batch operations are vectorized: each probe round handles every pending
+    key at once. The table doubles when it would pass half full.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        size = 1 << max(4, (2 * max(int(capacity), 1) - 1).bit_length())
+        self._keys = np.zeros(size, dtype=np.uint64)
+        self._used = np.zeros(size, dtype=bool)
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        return self._keys.nbytes + self._used.nbytes
+
+    def _home(self, keys: np.ndarray) -> np.ndarray:
+        return (mix64(keys) & np.uint64(len(self._keys) - 1)).astype(np.intp)
+
+    def _reserve(self, n: int) -> None:
+        if 2 * n <= len(self._keys):
+            return
+        old = self._keys[self._used]
+        size = len(self._keys)
+        while 2 * n > size:
+            size *= 2
+        self._keys = np.zeros(size, dtype=np.uint64)
+        self._used = np.zeros(size, dtype=bool)
+        self._n = 0
+        self._insert_distinct(old)
+
+    def _insert_distinct(self, keys: np.ndarray) -> np.ndarray:
+        """Insert distinct keys; True where the key was not in the set before."""
+        mask = len(self._keys) - 1
+        inserted = np.zeros(len(keys), dtype=bool)
+        slot = self._home(keys)
+        todo = np.arange(len(keys))
+        while todo.size:
+            s = slot[todo]
+            used = self._used[s]
+            hit = used & (self._keys[s] == keys[todo])
+            done = hit.copy()
+            free = np.flatnonzero(~used)
+            if free.size:
+                # several keys may claim the same free slot: one write lands,
+                # the others see it occupied on the next round
+                fs = s[free]
+                self._keys[fs] = keys[todo[free]]
+                self._used[fs] = True
+                win = free[self._keys[fs] == keys[todo[free]]]
+                inserted[todo[win]] = True
+                done[win] = True
+            taken = used & ~hit
+            slot[todo[taken]] = (s[taken] + 1) & mask
+            todo = todo[~done]
+        self._n += int(inserted.sum())
+        return inserted
+
+    def add(self, keys) -> np.ndarray:
+        """
+        Insert `keys`; returns True for each position whose key was not seen
+        before (first occurrence within `keys` included, repeats excluded).
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        new = np.zeros(len(keys), dtype=bool)
+        if not len(keys):
+            return new
+        first = np.flatnonzero(~pd.Index(keys).duplicated(keep="first"))  # hash table, no sort
+        uniq = keys[first]
+        self._reserve(self._n + len(uniq))
+        new[first[self._insert_distinct(uniq)]] = True
+        return new
+
+    def keys(self) -> np.ndarray:
+        """The stored keys (table order)."""
+        return self._keys[self._used]
+
+    def contains(self, keys) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.uint64)
+        mask = len(self._keys) - 1
+        found = np.zeros(len(keys), dtype=bool)
+        slot = self._home(keys)
+        todo = np.arange(len(keys))
+        while todo.size:
+            s = slot[todo]
+            used = self._used[s]
+            hit = used & (self._keys[s] == keys[todo])
+            found[todo[hit]] = True
+            more = used & ~hit
+            slot[todo[more]] = (s[more] + 1) & mask
+            todo = todo[more]
+        return found
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over uint64 keys (double hashing, k probes)."""
+
+    def __init__(self, n_bits: int, n_hashes: int = 4):
+        n_bits = 1 << max(6, (int(n_bits) - 1).bit_length())
+        self._bits = np.zeros(n_bits // 8, dtype=np.uint8)
+        self._mask = np.uint64(n_bits - 1)
+        self.n_hashes = int(n_hashes)
+
+    @classmethod
+    def for_capacity(cls, n: int, fp_rate: float = 1e-3) -> "BloomFilter":
+        n = max(int(n), 1)
+        m = -n * math.log(fp_rate) / math.log(2) ** 2
+        return cls(int(m), max(1, round(m / n * math.log(2))))
+
+    @property
+    def nbytes(self) -> int:
+        return self._bits.nbytes
+
+    def _positions(self, keys: np.ndarray):
+        h1 = mix64(keys)
+        h2 = mix64(h1 ^ _SEED) | np.uint64(1)
+        for i in range(self.n_hashes):
+            yield ((h1 + np.uint64(i) * h2) & self._mask).astype(np.intp)
+
+    def add(self, keys) -> None:
+        keys = np.asarray(keys, dtype=np.uint64)
+        for p in self._positions(keys):
+            np.bitwise_or.at(self._bits, p >> 3, (1 << (p & 7)).astype(np.uint8))
+
+    def contains(self, keys) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.uint64)
+        found = np.ones(len(keys), dtype=bool)
+        for p in self._positions(keys):
+            found &= ((self._bits[p >> 3] >> (p & 7).astype(np.uint8)) & 1).astype(bool)
+        return found
+
+
+# -------- Engine --------
+class Deduplicator:
+    """
+    Stateful keep-first filter; feed chunks in order with `filter(chunk)`.
+
+    rows:
+    - "exact": exact set of row hashes (full-duplicate count is exact)
+    - "bloom": Bloom filter of row hashes (fixed memory, count approximate)
+    - "off"  : no row hashes, only ids (fastest; full-duplicate count 0)
+    Without `id_col` in the chunks the row pass decides, and is always exact.
+    """
+
+    def __init__(self, id_col=ID_COL, rows: str = "exact", bloom_capacity: int = 10_000_000,
+                 bloom_fp_rate: float = 1e-3):
+        if rows not in ROW_MODES:
+            raise ValueError(f"rows must be one of {ROW_MODES}, got {rows!r}")
+        self.id_col = id_col
+        self.rows = rows
+        self.bloom_capacity = bloom_capacity
+        self.bloom_fp_rate = bloom_fp_rate
+        self._ids = UInt64Set()
+        self._missing_id_seen = False
+        self._row_set = None
+        self.rows_in = 0
+        self.rows_out = 0
+        self.dropped_full_rows = 0
+        self.dropped_duplicate_ids = 0
+
+    def _new_rows(self, chunk: pd.DataFrame, by_rows_only: bool) -> np.ndarray:
+        h = row_hashes(chunk)
+        if self._row_set is None:
+            bloom = self.rows == "bloom" and not by_rows_only
+            self._row_set = (BloomFilter.for_capacity(self.bloom_capacity, self.bloom_fp_rate)
+                             if bloom else UInt64Set())
+        if isinstance(self._row_set, UInt64Set):
+            return self._row_set.add(h)
+        first = np.flatnonzero(~pd.Index(h).duplicated(keep="first"))
+        uniq = h[first]
+        fresh = ~self._row_set.contains(uniq)
+        self._row_set.add(uniq[fresh])
+        new = np.zeros(len(h), dtype=bool)
+        new[first[fresh]] = True
+        return new
+
+    def _new_ids(self, ids: pd.Series) -> np.ndarray:
+        keys, na = id_keys(ids)
+        new = np.zeros(len(ids), dtype=bool)
+        present = ~na
+        new[present] = self._ids.add(keys[present])
+        if na.any() and not self._missing_id_seen:
+            new[np.flatnonzero(na)[0]] = True
+            self._missing_id_seen = True
+        return new
+
+    def keep_mask(self, chunk: pd.DataFrame) -> np.ndarray:
+        """Boolean mask of the rows of `chunk` to keep (updates the seen-sets)."""
+        n = len(chunk)
+        has_id = self.id_col is not None and self.id_col in chunk.columns
+        row_new = None
+        if self.rows != "off" or not has_id:
+            row_new = self._new_rows(chunk, by_rows_only=not has_id)
+        if has_id:
+            keep = self._new_ids(chunk[self.id_col])
+            if row_new is not None:
+                self.dropped_full_rows += int((~row_new & ~keep).sum())
+                self.dropped_duplicate_ids += int((row_new & ~keep).sum())
+            else:
+                self.dropped_duplicate_ids += int(n - keep.sum())
+        else:
+            keep = row_new
+            self.dropped_full_rows += int(n - keep.sum())
+        self.rows_in += n
+        self.rows_out += int(keep.sum())
+        return keep
+
+    def filter(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        keep = self.keep_mask(chunk)
+        return chunk if keep.all() else chunk[keep]
+
+    @property
+    def dropped(self) -> int:
+        return self.rows_in - self.rows_out
+
+    def save_ids(self, path) -> None:
+        """Persist the seen-id set (keys + missing-id flag) for a later delta run."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, keys=self._ids.keys(), missing_id_seen=np.array(self._missing_id_seen))
+
+    def load_ids(self, path) -> "Deduplicator":
+        """Seed the seen-id set from `save_ids`: rows with those ids count as repeats."""
+        with np.load(path) as z:
+            keys = z["keys"]
+            self._ids = UInt64Set(len(keys))
+            self._ids.add(keys)
+            self._missing_id_seen = bool(z["missing_id_seen"])
+        return self
+
+    def summary(self) -> dict:
+        row_bytes = self._row_set.nbytes if self._row_set is not None else 0
+        return {
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "dropped": self.dropped,
+            "dropped_full_rows": self.dropped_full_rows,
+            "dropped_duplicate_ids": self.dropped_duplicate_ids,
+            "row_set": self.rows,
+            "seen_set_mb": round((self._ids.nbytes + row_bytes) / (1024 * 1024), 2),
+        }
+
+    def report(self, label: str = "Dedup") -> None:
+        s = self.summary()
+        approx = "~" if self.rows == "bloom" else ""
+        print(f"{label}: {s['rows_in']} -> {s['rows_out']} rows "
+              f"(dropped {s['dropped']}: {approx}{s['dropped_full_rows']} full duplicates, "
+              f"{s['dropped_duplicate_ids']} repeated {self.id_col}) | seen-set {s['seen_set_mb']} MB")
+        perf.set_extra(dedup=s)
+
+
+def dedup_chunks(chunks: Iterable[pd.DataFrame], dedup: Deduplicator) -> Iterator[pd.DataFrame]:
+    for chunk in chunks:
+        yield dedup.filter(chunk)
+
+
+def dedup_frame(df: pd.DataFrame, id_col=ID_COL, rows: str = "exact") -> tuple[pd.DataFrame, Deduplicator]:
+    """In-memory convenience: one chunk through a fresh Deduplicator."""
+    dd = Deduplicator(id_col=id_col, rows=rows)
+    return dd.filter(df), dd
+
+
+# -------- Stage --------
+def stream(in_path: Path, out_path: Path, chunksize: int, dedup: Deduplicator, columns=None) -> None:
+    """Parquet -> parquet, one record batch at a time (schema preserved)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from src.data.typed import STRING_DTYPE
+
+    pf = pq.ParquetFile(in_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    schema = pf.schema_arrow if columns is None else pa.schema([pf.schema_arrow.field(c) for c in columns])
+    as_str = {pa.string(): STRING_DTYPE, pa.large_string(): STRING_DTYPE}.get
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for batch in perf.timed_iter(pf.iter_batches(batch_size=chunksize, columns=columns), "read"):
+            with perf.step("hash", rows=batch.num_rows):
+                keep = dedup.keep_mask(batch.to_pandas(types_mapper=as_str))
+            with perf.step("write", rows=int(keep.sum())):
+                writer.write_batch(batch.filter(pa.array(keep)))
+    tmp_path.replace(out_path)
+
+
+@perf.instrument_stage("dedup")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Drop duplicate rows / repeated ids out-of-core.")
+    ap.add_argument("--input", type=Path, default=INPUT)
+    ap.add_argument("--output", type=Path, default=OUTPUT)
+    ap.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    ap.add_argument("--id-col", default=ID_COL, help="keep the first row per id ('' for full-row only)")
+    ap.add_argument("--rows", choices=ROW_MODES, default="exact",
+                    help="how full-row duplicates are tracked (see Deduplicator)")
+    ap.add_argument("--bloom-capacity", type=int, default=10_000_000,
+                    help="expected distinct rows for --rows bloom")
+    ap.add_argument("--columns", nargs="+", default=None, help="only read/write these columns")
+    args = ap.parse_args(argv)
+
+    assert args.input.exists(), f"Data file not found: {args.input}"
+    dd = Deduplicator(id_col=args.id_col or None, rows=args.rows, bloom_capacity=args.bloom_capacity)
+    stream(args.input, args.output, args.chunksize, dd, columns=args.columns)
+    perf.note_read(args.input)
+    perf.note_written(args.output)
+    perf.set_rows(rows_in=dd.rows_in, rows_out=dd.rows_out)
+    dd.report()
+    print(f"✅ Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
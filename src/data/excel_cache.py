@@ -0,0 +1,138 @@
+"""
+Parse-once cache for the raw Excel export.
+
+openpyxl parsing is the slowest IO in the project, and several entry points
+read the same workbook (load_and_check, derive_numeric, the eda_report
+fallback, final_validate.sh). The first read converts the sheet to an
+uncompressed Arrow IPC file under CACHE_DIR; later reads memory-map it.
+
+Cache entries are keyed by the source's (size, mtime) and sha256:
+- size and mtime unchanged -> cache hit without hashing the workbook
+- touched but same content -> same sha256, entry re-validated
+- content changed          -> re-parsed; the old cache file is evicted
+
+`read_excel_cached` returns the same frame as `pd.read_excel` (missing text
+cells as NaN, same dtypes and column order).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = Path("data/interim/.xlsx_cache")
+INDEX = "index.json"
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_index(cache_dir: Path) -> dict:
+    p = cache_dir / INDEX
+    if p.exists():
+        try:
+            return json.loads(p.read_text(encoding="utf-8"))
+        except ValueError:
+            return {}
+    return {}
+
+
+def _save_index(cache_dir: Path, index: dict) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_dir / (INDEX + ".tmp")
+    tmp.write_text(json.dumps(index, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(cache_dir / INDEX)
+
+
+def _evict(cache_dir: Path, index: dict) -> None:
+    """Delete cache files no index entry points to."""
+    live = {e["file"] for e in index.values()}
+    for f in cache_dir.glob("*.arrow"):
+        if f.name not in live:
+            f.unlink(missing_ok=True)
+
+
+def _entry_key(path: Path, sheet) -> str:
+    return f"{path.resolve()}::{sheet}"
+
+
+def cached_table(path, sheet=0, cache_dir=CACHE_DIR):
+    """Memory-mapped Arrow table of a valid cache entry, or None (never parses)."""
+    import pyarrow as pa
+    path, cache_dir = Path(path), Path(cache_dir)
+    entry = _load_index(cache_dir).get(_entry_key(path, sheet))
+    st = path.stat()
+    if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+        return None
+    f = cache_dir / entry["file"]
+    if not f.exists():
+        return None
+    return pa.ipc.open_file(pa.memory_map(str(f), "r")).read_all()
+
+
+def _to_frame(table) -> pd.DataFrame:
+    df = table.to_pandas()
+    # Arrow hands back None for null strings; pd.read_excel gives NaN
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _write_cache(df: pd.DataFrame, dest: Path) -> bool:
+    import pyarrow as pa
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return False  # mixed-type column: not representable, read from xlsx every time
+    tmp = dest.with_name(dest.name + f".{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    tmp.replace(dest)
+    return True
+
+
+def read_excel_cached(path, sheet=0, cache_dir=CACHE_DIR) -> pd.DataFrame:
+    """`pd.read_excel(path, sheet_name=sheet)`, parsed at most once per content change."""
+    path, cache_dir = Path(path), Path(cache_dir)
+    table = cached_table(path, sheet, cache_dir)
+    if table is not None:
+        return _to_frame(table)
+
+    st = path.stat()
+    digest = _sha256(path)
+    key = _entry_key(path, sheet)
+    index = _load_index(cache_dir)
+    fname = f"{digest[:24]}_{sheet}.arrow"
+    entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest, "file": fname}
+
+    old = index.get(key)
+    if old is not None and old["sha256"] == digest and (cache_dir / fname).exists():
+        index[key] = entry  # touched, same bytes
+        _save_index(cache_dir, index)
+        return read_excel_cached(path, sheet, cache_dir)
+
+    df = pd.read_excel(path, sheet_name=sheet)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if _write_cache(df, cache_dir / fname):
+        index[key] = entry
+    else:
+        index.pop(key, None)
+    _save_index(cache_dir, index)
+    _evict(cache_dir, index)
+    return df
+
+
+def clear_cache(cache_dir=CACHE_DIR) -> None:
+    cache_dir = Path(cache_dir)
+    _save_index(cache_dir, {})
+    _evict(cache_dir, {})
@@ -1,84 +1,110 @@
+import argparse
 import sys
 from pathlib import Path
 import pandas as pd
 import numpy as np
 
+from src import perf
+from src.data.profiler import (CONTRACT, DEFAULT_CHUNKSIZE, EXACT_LIMIT, PROFILE_JSON,
+                               iter_input, load_contract, profile_chunks, write_profile)
+
 DATA_PATH = Path("data/raw/Talent_Academy_Case_DT_2025.xlsx")
-EXPECTED_ROWS = 2235
-EXPECTED_COLS = 13
-EXPECTED_COL_NAMES = [
-    "HastaNo","Yas","Cinsiyet","KanGrubu","Uyruk",
-    "KronikHastalik","Bolum","Alerji","Tanilar","TedaviAdi",
-    "TedaviSuresi","UygulamaYerleri","UygulamaSuresi"
-]
-
-def main():
-    if not DATA_PATH.exists():
-        print(f"❌ Data file not found at: {DATA_PATH}")
+
+
+def _shape_spec(contract):
+    rows = contract.get("rows")
+    if isinstance(rows, dict):
+        rows = f"{rows.get('min', 0)}-{rows.get('max', '')}"
+    return f"{rows if rows is not None else '*'}x{len(contract['columns'])}"
+
+
+@perf.instrument_stage("load_and_check")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Spec check of the raw export (one profiling pass).")
+    ap.add_argument("--input", type=Path, default=DATA_PATH, help=".xlsx / .csv / .parquet")
+    ap.add_argument("--contract", type=Path, default=CONTRACT, help="schema contract (JSON/YAML)")
+    ap.add_argument("--output", type=Path, default=PROFILE_JSON, help="JSON profile")
+    ap.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    ap.add_argument("--exact-limit", type=int, default=EXACT_LIMIT,
+                    help="exact distinct/duplicate counts up to N values, HyperLogLog above")
+    ap.add_argument("--fail-fast", action="store_true",
+                    help="stop reading as soon as the header or row maximum fails")
+    args = ap.parse_args(argv)
+
+    if not args.input.exists():
+        print(f"❌ Data file not found at: {args.input}")
         sys.exit(1)
+    contract = load_contract(args.contract)
 
-    # Load
+    # One pass: shape, duplicates, missingness, numeric sanity
     try:
-        df = pd.read_excel(DATA_PATH)
+        profile = profile_chunks(iter_input(args.input, args.chunksize), contract,
+                                 args.exact_limit, args.fail_fast)
     except Exception as e:
-        print("❌ Failed to read Excel:", e)
+        print("❌ Failed to read input:", e)
         sys.exit(1)
+    profile.update({"source": str(args.input), "contract": str(args.contract)})
+    write_profile(profile, args.output)
+    perf.note_read(args.input)
+    perf.note_written(args.output)
+    perf.set_rows(rows_in=profile["rows"])
+    checks = profile["checks"]
 
     # Shape check
-    rows, cols = df.shape
-    ok_shape = (rows == EXPECTED_ROWS and cols == EXPECTED_COLS)
-
-    # Column-name check (set equality; order-insensitive)
-    col_list = list(df.columns)
-    set_match = set(col_list) == set(EXPECTED_COL_NAMES)
-    order_match = (col_list == EXPECTED_COL_NAMES)
+    rows, cols = profile["rows"], profile["n_columns"]
+    row_failed = any(m.startswith("Row count") for m in checks["failures"])
+    ok_shape = not row_failed and cols == len(contract["columns"])
 
     # Report basic info
     print("=== Overview ===")
-    print(f"Path        : {DATA_PATH}")
-    print(f"Shape       : {rows} rows x {cols} cols")
-    print(f"Cols (found): {col_list}")
-    print(f"Match shape (2235x13): {ok_shape}")
-    print(f"Match column names (set): {set_match}")
-    print(f"Match column order     : {order_match}")
-    missing = list(set(EXPECTED_COL_NAMES) - set(col_list))
-    extra   = list(set(col_list) - set(EXPECTED_COL_NAMES))
-    if missing: print("Missing columns:", missing)
-    if extra:   print("Extra columns  :", extra)
-
-    # Decide pass/fail on hard requirements
-    if not ok_shape or not set_match:
-        print("❌ Hard requirement failed (shape and/or required column names).")
+    print(f"Path        : {args.input}")
+    print(f"Shape       : {rows} rows x {cols} cols" + ("" if profile["complete"] else " (stopped early)"))
+    print(f"Cols (found): {profile['columns']}")
+    print(f"Match shape ({_shape_spec(contract)}): {ok_shape}")
+    print(f"Match column names (set): {checks['set_match']}")
+    print(f"Match column order     : {checks['order_match']}")
+    if checks["missing"]: print("Missing columns:", checks["missing"])
+    if checks["extra"]:   print("Extra columns  :", checks["extra"])
+
+    # Decide pass/fail on the contract
+    if not checks["passed"]:
+        print("❌ Hard requirement failed (contract: " + "; ".join(checks["failures"]) + ").")
+        print(f"Profile: {args.output}")
         sys.exit(1)
 
     # Duplicates
-    dup_rows = int(df.duplicated().sum())
+    dup = profile["duplicates"]
+    approx = "" if dup["full_rows_exact"] else "~"
     print("\n=== Duplicates ===")
-    print(f"Duplicate full rows: {dup_rows}")
-    if "HastaNo" in df.columns:
-        dup_hastano = int(df.duplicated(subset=["HastaNo"]).sum())
-        uniq_hastano = int(df["HastaNo"].nunique(dropna=True))
-        print(f"Unique HastaNo: {uniq_hastano} | Duplicated HastaNo: {dup_hastano}")
+    print(f"Duplicate full rows: {approx}{dup['full_rows']}")
+    if "id_column" in dup:
+        approx = "" if dup["ids_exact"] else "~"
+        print(f"Unique {dup['id_column']}: {approx}{dup['unique_ids']} | "
+              f"Duplicated {dup['id_column']}: {approx}{dup['duplicated_ids']}")
 
     # Missingness
-    na_counts = df.isna().sum()
-    na_pct = (na_counts / len(df) * 100).round(2)
+    fields = profile["fields"]
+    na_counts = pd.Series({c: f["missing_count"] for c, f in fields.items()}, dtype="int64")
+    na_pct = (na_counts / rows * 100).round(2)
     miss_df = pd.DataFrame({"missing_count": na_counts, "missing_pct": na_pct})
     print("\n=== Missingness (top 10 by pct) ===")
     print(miss_df.sort_values("missing_pct", ascending=False).head(10).to_string())
 
-    # Numeric sanity checks (coerce)
-    numeric_targets = ["Yas","TedaviSuresi","UygulamaSuresi"]
+    # Numeric sanity checks (coerced)
     print("\n=== Numeric sanity ===")
-    for c in numeric_targets:
-        if c in df.columns:
-            s = pd.to_numeric(df[c], errors="coerce")
-            print(f"- {c}: non-null={s.notna().sum()}, min={s.min()}, max={s.max()}, negatives={(s<0).sum()}, zeros={(s==0).sum()}, non_numeric_or_missing={s.isna().sum()}")
+    for c, f in fields.items():
+        s = f.get("numeric")
+        if s is None:
+            continue
+        lo = np.nan if s["min"] is None else s["min"]
+        hi = np.nan if s["max"] is None else s["max"]
+        print(f"- {c}: non-null={s['non_null']}, min={lo}, max={hi}, negatives={s['negatives']}, zeros={s['zeros']}, non_numeric_or_missing={s['non_numeric_or_missing']}")
 
-    # Soft warnings for order mismatch
-    if not order_match:
-        print("\n⚠️ Column order differs from the spec; this is not critical but keep it consistent if possible.")
+    # Soft warnings (e.g. column order)
+    for m in checks["warnings"]:
+        print(f"\n⚠️ {m} This is not critical but keep it consistent if possible.")
 
+    print(f"\nProfile: {args.output}")
     print("\n✅ All required case checks satisfied. Data is ready for EDA.")
     sys.exit(0)
 
@@ -0,0 +1,561 @@
+"""
+Readers/writers for the model-ready dataset layouts under data/processed/.
+
+- dense  : dataset_model_ready.parquet (ID + target + feature columns),
+           written in small row groups, + batches appended since the last
+           full run in dataset_model_ready_parts/part-NNNNN.parquet
+           (src.features.append), + dataset_model_ready_index.npz
+           (HastaNo -> file, row group, offset; sorted by HastaNo). `lookup()`
+           binary-searches the index and reads only the row groups it needs.
+- sparse : dataset_model_ready.npz (CSR feature matrix)
+           + dataset_model_ready_ids.parquet (ID + target, same row order)
+- mmap   : dataset_model_ready_X.npy (contiguous C-order feature matrix)
+           + dataset_model_ready_ids.npy (ID/target structured array)
+           + dataset_model_ready.json (feature names, dtypes, shapes).
+           Uncompressed .npy files map straight into memory: `load_mmap()`
+           returns read-only views, so training processes on one host
+           share the page cache instead of each decoding a copy.
+Feature names (ID, target, features) are listed in reports/feature_names.txt.
+
+Output dtypes follow a per-branch policy (`dtype_policy`): "float64" keeps
+every feature as fitted; "compact" stores the scaled numerics as float32,
+one-hot / multi-label indicators as uint8 (or bool) and hash buckets as
+int8. Parquet keeps the column types; the mmap layout then holds one
+dataset_model_ready_X_<branch>.npy per branch, indicator blocks optionally
+np.packbits-ed along the columns (`load_mmap_blocks()`). Integer casts are
+checked, and nothing is upcast on load unless a dtype is asked for.
+"""
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+PROCESSED_DIR = Path("data/processed")
+DENSE_PARQ = PROCESSED_DIR / "dataset_model_ready.parquet"
+PARTS_DIR = PROCESSED_DIR / "dataset_model_ready_parts"
+KNOWN_IDS = PROCESSED_DIR / "known_ids.npz"  # Deduplicator.save_ids of every row in the dataset
+INDEX_NPZ = PROCESSED_DIR / "dataset_model_ready_index.npz"
+ROW_GROUP_ROWS = 8192  # rows per parquet row group: the unit a lookup reads
+SPARSE_NPZ = PROCESSED_DIR / "dataset_model_ready.npz"
+IDS_PARQ = PROCESSED_DIR / "dataset_model_ready_ids.parquet"
+FEATURES_TXT = Path("reports/feature_names.txt")
+MMAP_X = PROCESSED_DIR / "dataset_model_ready_X.npy"
+MMAP_IDS = PROCESSED_DIR / "dataset_model_ready_ids.npy"
+MMAP_JSON = PROCESSED_DIR / "dataset_model_ready.json"
+DTYPE_POLICIES = ("float64", "compact")
+INDICATOR_BRANCHES = ("cat", "mlb")  # one-hot / multi-label: 0/1 columns
+
+
+def dtype_policy(name="float64", indicator="uint8") -> dict:
+    """Branch (feature name prefix, "num" in "num__Yas") -> dtype; unlisted branches stay float64."""
+    if name == "float64":
+        return {}
+    if name != "compact":
+        raise ValueError(f"Unknown dtype policy {name!r} (expected one of {DTYPE_POLICIES})")
+    return {"num": "float32", "hash": "int8", **{b: indicator for b in INDICATOR_BRANCHES}}
+
+
+def branch_of(feature_name) -> str:
+    return str(feature_name).split("__", 1)[0]
+
+
+def feature_blocks(feature_names, policy) -> list:
+    """Contiguous runs of one branch: [(branch, start, stop, dtype)]."""
+    blocks = []
+    for j, name in enumerate(feature_names):
+        branch = branch_of(name)
+        if blocks and blocks[-1][0] == branch:
+            blocks[-1][2] = j + 1
+        else:
+            blocks.append([branch, j, j + 1, np.dtype(policy.get(branch, "float64"))])
+    return [tuple(b) for b in blocks]
+
+
+def feature_dtypes(feature_names, policy):
+    """Per-column dtypes under `policy`, or None when every column keeps the fitted dtype."""
+    if not policy:
+        return None
+    return [np.dtype(policy.get(branch_of(n), "float64")) for n in feature_names]
+
+
+def cast_features(X, dtype) -> np.ndarray:
+    """X as `dtype`; a cast to an integer/bool dtype must be exact (no wrap-around, no rounding)."""
+    X = np.asarray(X)
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f" or X.dtype == dtype:
+        return X.astype(dtype, copy=False)
+    with np.errstate(invalid="ignore"):
+        out = X.astype(dtype)
+    if not np.array_equal(out.astype(X.dtype), X):
+        bad = X[out.astype(X.dtype) != X]
+        raise ValueError(f"{bad.size} feature value(s) do not fit {dtype} exactly (e.g. {bad[0]}).")
+    return out
+
+
+def feature_frame(X, feature_names, dtypes=None) -> pd.DataFrame:
+    """Dense feature matrix as a DataFrame, column j stored as `dtypes[j]` (default: X's dtype)."""
+    X = np.asarray(X)
+    names = list(feature_names)
+    if dtypes is None:
+        return pd.DataFrame(X, columns=names)
+    dtypes = [np.dtype(d) for d in dtypes]
+    frames, start = [], 0
+    for j in range(1, len(names) + 1):
+        if j == len(names) or dtypes[j] != dtypes[start]:
+            frames.append(pd.DataFrame(cast_features(X[:, start:j], dtypes[start]), columns=names[start:j]))
+            start = j
+    return pd.concat(frames, axis=1) if frames else pd.DataFrame(index=range(len(X)))
+
+
+def sparse_dtype(policy) -> np.dtype:
+    """One dtype for a CSR matrix under `policy`: the widest of its branches."""
+    return np.result_type(*policy.values()) if policy else np.dtype(np.float64)
+
+
+def save_sparse(ids: pd.DataFrame, X, npz_path=SPARSE_NPZ, ids_path=IDS_PARQ) -> None:
+    """Write the CSR feature matrix and its ID/target table (row-aligned)."""
+    X = sparse.csr_matrix(X)
+    assert X.shape[0] == len(ids), "ID table and feature matrix row counts differ."
+    Path(npz_path).parent.mkdir(parents=True, exist_ok=True)
+    sparse.save_npz(npz_path, X, compressed=False)
+    ids.reset_index(drop=True).to_parquet(ids_path, index=False)
+
+
+def _zip_npy_header(out, dtype, count) -> None:
+    header = np.lib.format.header_data_from_array_1_0(np.empty(0, dtype=dtype))
+    header["shape"] = (count,)
+    np.lib.format.write_array_header_1_0(out, header)
+
+
+class SparseWriter:
+    """
+    Streamed counterpart of `save_sparse` for the out-of-core path: each CSR
+    block's data / indices / indptr are appended to raw files in a temporary
+    directory next to the .npz and its ID rows go to a ParquetWriter, so only
+    one block is in memory at a time. `close()` copies the raw files into an
+    uncompressed .npz with the members `scipy.sparse.save_npz` writes.
+    """
+
+    COPY_ITEMS = 1 << 22  # items per copy step in close()
+
+    def __init__(self, n_features, dtype=np.float64, npz_path=SPARSE_NPZ, ids_path=IDS_PARQ):
+        self.n_features = n_features
+        self.dtype = np.dtype(dtype)
+        self.npz_path, self.ids_path = Path(npz_path), Path(ids_path)
+        self.npz_path.parent.mkdir(parents=True, exist_ok=True)
+        import tempfile
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix=".sparse-", dir=self.npz_path.parent))
+        self.files = {k: open(self.tmp_dir / k, "wb") for k in ("data", "indices", "indptr")}
+        np.zeros(1, dtype=np.int64).tofile(self.files["indptr"])
+        self.rows = self.nnz = 0
+        self.ids_writer = None
+
+    def write(self, ids: pd.DataFrame, X) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        X = sparse.csr_matrix(X, dtype=self.dtype)
+        assert X.shape[0] == len(ids), "ID table and feature matrix row counts differ."
+        X.data.tofile(self.files["data"])
+        X.indices.astype(np.int64).tofile(self.files["indices"])
+        (X.indptr[1:].astype(np.int64) + self.nnz).tofile(self.files["indptr"])
+        self.rows += X.shape[0]
+        self.nnz += X.nnz
+        table = pa.Table.from_pandas(ids.reset_index(drop=True), preserve_index=False)
+        if self.ids_writer is None:  # first block's schema, pandas metadata included (Int64 etc.)
+            self.ids_writer = pq.ParquetWriter(self.tmp_dir / "ids.parquet", table.schema)
+        self.ids_writer.write_table(table.cast(self.ids_writer.schema))
+
+    def _copy(self, zf, name, dtype, count) -> None:
+        with zf.open(name + ".npy", "w", force_zip64=True) as out, open(self.tmp_dir / name, "rb") as src:
+            _zip_npy_header(out, dtype, count)
+            src_dtype = self.dtype if name == "data" else np.int64
+            while True:
+                part = np.fromfile(src, dtype=src_dtype, count=self.COPY_ITEMS)
+                if not len(part):
+                    break
+                out.write(part.astype(dtype, copy=False).tobytes())
+
+    def close(self) -> None:
+        import shutil
+        import zipfile
+
+        for f in self.files.values():
+            f.close()
+        if self.ids_writer is None:
+            raise ValueError("No rows written.")
+        self.ids_writer.close()
+        # int32 indices unless the non-zeros overflow them, as scipy picks
+        index_dtype = np.int32 if self.nnz <= np.iinfo(np.int32).max else np.int64
+        tmp_npz = self.npz_path.with_name(self.npz_path.name + ".tmp")
+        with zipfile.ZipFile(tmp_npz, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            self._copy(zf, "indices", index_dtype, self.nnz)
+            self._copy(zf, "indptr", index_dtype, self.rows + 1)
+            for name, value in (("format", np.array(b"csr")), ("shape", np.array((self.rows, self.n_features)))):
+                with zf.open(name + ".npy", "w") as out:
+                    np.lib.format.write_array(out, value, allow_pickle=False)
+            self._copy(zf, "data", self.dtype, self.nnz)
+        tmp_npz.replace(self.npz_path)
+        (self.tmp_dir / "ids.parquet").replace(self.ids_path)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def discard(self) -> None:
+        """Drop the temporary files (after a failed run)."""
+        import shutil
+
+        for f in self.files.values():
+            f.close()
+        if self.ids_writer is not None:
+            self.ids_writer.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def load_sparse(npz_path=SPARSE_NPZ, ids_path=IDS_PARQ, features_path=FEATURES_TXT):
+    """Return (ids DataFrame, CSR matrix, feature names without ID/target)."""
+    X = sparse.load_npz(npz_path).tocsr()
+    ids = pd.read_parquet(ids_path)
+    names = Path(features_path).read_text(encoding="utf-8").splitlines()[ids.shape[1]:]
+    if len(names) != X.shape[1]:
+        raise ValueError(f"feature_names.txt lists {len(names)} features, matrix has {X.shape[1]}")
+    return ids, X, names
+
+
+def ids_records(ids: pd.DataFrame) -> np.ndarray:
+    """ID/target columns as one structured array (nullable columns widen to float64 + NaN)."""
+    fields = []
+    for col in ids.columns:
+        s = ids[col]
+        if pd.api.types.is_integer_dtype(s) and not s.hasnans:
+            fields.append((col, s.to_numpy(dtype=np.int64)))
+        elif pd.api.types.is_numeric_dtype(s):
+            fields.append((col, s.to_numpy(dtype=np.float64, na_value=np.nan)))
+        else:
+            raise TypeError(f"Column {col!r} ({s.dtype}) cannot be stored in a memory-mappable array.")
+    out = np.empty(len(ids), dtype=[(name, values.dtype) for name, values in fields])
+    for name, values in fields:
+        out[name] = values
+    return out
+
+
+class MmapBlock(NamedTuple):
+    """Columns [start, stop) of one branch in the per-branch mmap layout."""
+    branch: str
+    start: int
+    stop: int
+    dtype: np.dtype
+    data: np.ndarray  # read-only memory map; bit-packed rows when `packed`
+    packed: bool
+
+    def values(self) -> np.ndarray:
+        """The block in its stored dtype (a bit-packed block is unpacked into a copy)."""
+        if not self.packed:
+            return self.data
+        return np.unpackbits(self.data, axis=1, count=self.stop - self.start).astype(self.dtype, copy=False)
+
+
+class MmapWriter:
+    """
+    Fill the memory-mappable layout block by block: the .npy feature matrix
+    is preallocated for `n_rows` on the first block, so the out-of-core path
+    never holds the full matrix. `close()` writes the ID array and header.
+    With a dtype `policy` each branch gets its own .npy in its dtype;
+    `packbits` stores the indicator branches as np.packbits rows.
+    """
+
+    def __init__(self, n_rows, feature_names, x_path=MMAP_X, ids_path=MMAP_IDS, header_path=MMAP_JSON,
+                 policy=None, packbits=False):
+        self.n_rows = n_rows
+        self.feature_names = [str(n) for n in feature_names]
+        self.x_path, self.ids_path, self.header_path = Path(x_path), Path(ids_path), Path(header_path)
+        self.X = None
+        self.pos = 0
+        self.id_blocks = []
+        self.blocks = feature_blocks(self.feature_names, policy) if policy else None
+        self.packbits = packbits
+        self.arrays = []
+
+    def _block_path(self, branch) -> Path:
+        return self.x_path.with_name(f"{self.x_path.stem}_{branch}.npy")
+
+    def _packed(self, branch, dtype) -> bool:
+        return self.packbits and branch in INDICATOR_BRANCHES and dtype.kind in "bu"
+
+    def _open_blocks(self) -> None:
+        self.x_path.parent.mkdir(parents=True, exist_ok=True)
+        for old in [self.x_path, *self.x_path.parent.glob(f"{self.x_path.stem}_*.npy")]:
+            old.unlink(missing_ok=True)  # the other layout's files, or blocks of another policy
+        for branch, start, stop, dtype in self.blocks:
+            packed = self._packed(branch, dtype)
+            shape = (self.n_rows, -(-(stop - start) // 8) if packed else stop - start)
+            self.arrays.append(np.lib.format.open_memmap(self._block_path(branch), mode="w+",
+                                                         dtype=np.uint8 if packed else dtype, shape=shape))
+
+    def _write_blocks(self, X) -> None:
+        if not self.arrays:
+            self._open_blocks()
+        for (branch, start, stop, dtype), out in zip(self.blocks, self.arrays):
+            if self._packed(branch, dtype):
+                out[self.pos:self.pos + len(X)] = np.packbits(cast_features(X[:, start:stop], np.bool_), axis=1)
+            else:
+                out[self.pos:self.pos + len(X)] = cast_features(X[:, start:stop], dtype)
+
+    def write(self, ids: pd.DataFrame, X) -> None:
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X)
+        assert X.shape[0] == len(ids), "ID table and feature matrix row counts differ."
+        if self.blocks is not None:
+            self._write_blocks(X)
+            self.pos += len(X)
+            self.id_blocks.append(ids.reset_index(drop=True))
+            return
+        if self.X is None:
+            for old in self.x_path.parent.glob(f"{self.x_path.stem}_*.npy"):
+                old.unlink()  # blocks of an earlier per-branch export
+            self.x_path.parent.mkdir(parents=True, exist_ok=True)
+            self.X = np.lib.format.open_memmap(self.x_path, mode="w+", dtype=X.dtype,
+                                               shape=(self.n_rows, len(self.feature_names)))
+        self.X[self.pos:self.pos + len(X)] = X
+        self.pos += len(X)
+        self.id_blocks.append(ids.reset_index(drop=True))
+
+    def close(self) -> None:
+        assert self.pos == self.n_rows, f"Wrote {self.pos} of {self.n_rows} rows."
+        if self.blocks is not None:
+            return self._close_blocks()
+        if self.X is None:  # no rows: still a valid (empty) layout
+            self.x_path.parent.mkdir(parents=True, exist_ok=True)
+            self.X = np.lib.format.open_memmap(self.x_path, mode="w+", dtype=np.float64,
+                                               shape=(0, len(self.feature_names)))
+        self.X.flush()
+        ids = ids_records(pd.concat(self.id_blocks, ignore_index=True)) if self.id_blocks else np.empty(0)
+        np.save(self.ids_path, ids)
+        header = {
+            "rows": self.n_rows,
+            "x": {"file": self.x_path.name, "dtype": self.X.dtype.str, "shape": list(self.X.shape), "order": "C"},
+            "ids": {"file": self.ids_path.name, "fields": {n: ids.dtype[n].str for n in ids.dtype.names or ()}},
+            "feature_names": self.feature_names,
+        }
+        self.header_path.write_text(json.dumps(header, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.X = None
+
+    def _close_blocks(self) -> None:
+        if not self.arrays:
+            self._open_blocks()
+        blocks = []
+        for (branch, start, stop, dtype), out in zip(self.blocks, self.arrays):
+            out.flush()
+            blocks.append({"branch": branch, "file": self._block_path(branch).name, "dtype": dtype.str,
+                           "columns": [start, stop], "shape": list(out.shape),
+                           "packed": self._packed(branch, dtype)})
+        ids = ids_records(pd.concat(self.id_blocks, ignore_index=True)) if self.id_blocks else np.empty(0)
+        np.save(self.ids_path, ids)
+        header = {
+            "rows": self.n_rows,
+            "blocks": blocks,  # packed: np.packbits(axis=1), default (big) bit order
+            "ids": {"file": self.ids_path.name, "fields": {n: ids.dtype[n].str for n in ids.dtype.names or ()}},
+            "feature_names": self.feature_names,
+        }
+        self.header_path.write_text(json.dumps(header, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.arrays = []
+
+
+def save_mmap(ids: pd.DataFrame, X, feature_names, policy=None, packbits=False, **paths) -> None:
+    """Write the memory-mappable layout in one go (see MmapWriter)."""
+    writer = MmapWriter(len(ids), feature_names, policy=policy, packbits=packbits, **paths)
+    writer.write(ids, X)
+    writer.close()
+
+
+def _load_ids(header_path: Path, header: dict):
+    ids = np.load(header_path.parent / header["ids"]["file"], mmap_mode="r")
+    if len(ids) != header["rows"]:
+        raise ValueError(f"{header_path} does not match its arrays (stale export?)")
+    return ids
+
+
+def load_mmap_blocks(header_path=MMAP_JSON):
+    """
+    Return (ids structured array, [MmapBlock], feature names), every array
+    a read-only memory map in its stored dtype. A single-matrix export is
+    one block.
+    """
+    header_path = Path(header_path)
+    header = json.loads(header_path.read_text(encoding="utf-8"))
+    ids = _load_ids(header_path, header)
+    if "blocks" not in header:
+        _, X, names = load_mmap(header_path)
+        return ids, [MmapBlock("X", 0, X.shape[1], X.dtype, X, False)], names
+    blocks = []
+    for b in header["blocks"]:
+        data = np.load(header_path.parent / b["file"], mmap_mode="r")
+        if list(data.shape) != b["shape"]:
+            raise ValueError(f"{header_path} does not match {b['file']} (stale export?)")
+        blocks.append(MmapBlock(b["branch"], b["columns"][0], b["columns"][1], np.dtype(b["dtype"]),
+                                data, b["packed"]))
+    return ids, blocks, header["feature_names"]
+
+
+def load_mmap(header_path=MMAP_JSON, dtype=None):
+    """
+    Return (ids structured array, X, feature names); both arrays are
+    read-only memory maps of the files next to the header (no copy).
+    A per-branch export is only assembled into one X when `dtype` is given
+    (a copy); without it a ValueError points to load_mmap_blocks(), so
+    compact data is never upcast silently.
+    """
+    header_path = Path(header_path)
+    header = json.loads(header_path.read_text(encoding="utf-8"))
+    ids = _load_ids(header_path, header)
+    if "blocks" in header:
+        if dtype is None:
+            dtypes = sorted({b["dtype"] for b in header["blocks"]})
+            raise ValueError(f"{header_path} stores per-branch dtypes {dtypes}: use load_mmap_blocks(), "
+                             f"or load_mmap(dtype=...) for one upcast copy.")
+        _, blocks, names = load_mmap_blocks(header_path)
+        X = np.empty((len(ids), len(names)), dtype=dtype)
+        for b in blocks:
+            X[:, b.start:b.stop] = b.values()
+        return ids, X, names
+    X = np.load(header_path.parent / header["x"]["file"], mmap_mode="r")
+    if list(X.shape) != header["x"]["shape"]:
+        raise ValueError(f"{header_path} does not match its arrays (stale export?)")
+    return ids, (X if dtype is None else np.asarray(X, dtype=dtype)), header["feature_names"]
+
+
+def mmap_files(header_path=MMAP_JSON) -> list:
+    """The files of the mmap export described by `header_path` (header included)."""
+    header_path = Path(header_path)
+    if not header_path.exists():
+        return []
+    header = json.loads(header_path.read_text(encoding="utf-8"))
+    files = [b["file"] for b in header["blocks"]] if "blocks" in header else [header["x"]["file"]]
+    return [header_path.parent / f for f in files + [header["ids"]["file"]]] + [header_path]
+
+
+def _stamp(path) -> list:
+    st = Path(path).stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _id_entries(parquet_path, id_col):
+    """(ids, row group, offset) of the non-missing ids of one parquet file."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(parquet_path)
+    ids, groups, offsets = [np.empty(0, np.int64)], [np.empty(0, np.int32)], [np.empty(0, np.int32)]
+    for g in range(pf.num_row_groups):
+        col = pf.read_row_group(g, columns=[id_col]).column(0)
+        ok = col.is_valid().to_numpy(zero_copy_only=False)
+        ids.append(col.filter(col.is_valid()).to_numpy().astype(np.int64))
+        groups.append(np.full(int(ok.sum()), g, dtype=np.int32))
+        offsets.append(np.flatnonzero(ok).astype(np.int32))
+    return np.concatenate(ids), np.concatenate(groups), np.concatenate(offsets)
+
+
+def _save_index(index_path, id_col, files, ids, file_no, row_group, offset) -> int:
+    index_path = Path(index_path)
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    if len(ids) > 1 and (ids[1:] == ids[:-1]).any():
+        raise ValueError(f"{id_col} is not unique across {files}, cannot index it.")
+    names = [Path(f).resolve().relative_to(index_path.parent.resolve()).as_posix() for f in files]
+    np.savez(index_path, ids=ids, file_no=file_no[order], row_group=row_group[order], offset=offset[order],
+             files=np.array(names), id_col=np.array(id_col),
+             stamps=np.array([_stamp(f) for f in files], dtype=np.int64).reshape(-1, 2))
+    return len(ids)
+
+
+def write_index(parquet_paths=DENSE_PARQ, id_col="HastaNo", index_path=INDEX_NPZ) -> int:
+    """
+    Sidecar index of the dense dataset (one file or several, e.g. appended
+    partitions): id -> (file, row group, offset), sorted by id. Rows with a
+    missing id are not indexed. Returns the number of indexed ids.
+    """
+    files = [Path(p) for p in (parquet_paths if isinstance(parquet_paths, (list, tuple)) else [parquet_paths])]
+    entries = [_id_entries(f, id_col) for f in files]
+    ids, groups, offsets = (np.concatenate(parts) for parts in zip(*entries))
+    file_no = np.concatenate([np.full(len(e[0]), k, dtype=np.int16) for k, e in enumerate(entries)])
+    return _save_index(index_path, id_col, files, ids, file_no, groups, offsets)
+
+
+def append_index(parquet_path, index_path=INDEX_NPZ) -> int:
+    """Add one new file to an existing index; only that file's ids are read."""
+    index_path = Path(index_path)
+    with np.load(index_path) as z:
+        old = {k: z[k] for k in z.files}
+    id_col = str(old["id_col"])
+    files = [index_path.parent / str(f) for f in old["files"]] + [Path(parquet_path)]
+    ids, groups, offsets = _id_entries(parquet_path, id_col)
+    return _save_index(index_path, id_col, files,
+                       np.concatenate([old["ids"], ids]),
+                       np.concatenate([old["file_no"], np.full(len(ids), len(files) - 1, dtype=np.int16)]),
+                       np.concatenate([old["row_group"], groups]),
+                       np.concatenate([old["offset"], offsets]))
+
+
+@lru_cache(maxsize=4)
+def _load_index(index_path: str, stamp: tuple):
+    with np.load(index_path) as z:
+        return {k: z[k] for k in z.files}
+
+
+def lookup(hasta_nos, columns=None, index_path=INDEX_NPZ) -> pd.DataFrame:
+    """
+    Rows of the dense dataset for the given ids, in the requested order
+    (unknown ids are skipped). Only the row groups holding them are read,
+    so a point lookup costs one binary search and one row group.
+    """
+    import pyarrow.parquet as pq
+
+    index_path = Path(index_path)
+    idx = _load_index(str(index_path), tuple(_stamp(index_path)))
+    files = [index_path.parent / str(f) for f in idx["files"]]
+    for f, stamp in zip(files, idx["stamps"].tolist()):
+        if _stamp(f) != stamp:
+            raise ValueError(f"{index_path} is stale: {f} changed since it was indexed.")
+
+    q = np.atleast_1d(np.asarray(hasta_nos, dtype=np.int64))
+    pos = np.searchsorted(idx["ids"], q).clip(max=max(len(idx["ids"]) - 1, 0))
+    found = (idx["ids"][pos] == q) if len(idx["ids"]) else np.zeros(len(q), bool)
+    pos = pos[found]
+    if columns is not None:
+        id_col = str(idx["id_col"])
+        columns = [id_col] + [c for c in columns if c != id_col]
+
+    frames, where = [], np.empty(len(pos), dtype=np.int64)
+    done = 0
+    for k in np.unique(idx["file_no"][pos]):
+        hit = np.flatnonzero(idx["file_no"][pos] == k)
+        row_group, offset = idx["row_group"][pos[hit]], idx["offset"][pos[hit]]
+        groups = np.unique(row_group)
+        pf = pq.ParquetFile(files[k])
+        table = pf.read_row_groups(groups.tolist(), columns=columns)
+        # row position in the concatenated groups = start of its group + offset
+        sizes = np.array([pf.metadata.row_group(int(g)).num_rows for g in groups], dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        frames.append(table.take(starts[np.searchsorted(groups, row_group)] + offset).to_pandas())
+        where[hit] = np.arange(done, done + len(hit))
+        done += len(hit)
+    if not frames:
+        schema = pq.read_schema(files[0])
+        return schema.empty_table().select(columns or schema.names).to_pandas()
+    out = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return out.iloc[where].reset_index(drop=True)
+
+
+def dense_paths(base=DENSE_PARQ, parts_dir=PARTS_DIR) -> list:
+    """The dense dataset in row order: the last full run, then appended partitions."""
+    return [Path(base)] + sorted(Path(parts_dir).glob("part-*.parquet"))
+
+
+def clear_parts(parts_dir=PARTS_DIR) -> int:
+    """Remove appended partitions (a full run has folded them into the base file)."""
+    parts = sorted(Path(parts_dir).glob("part-*.parquet"))
+    for p in parts:
+        p.unlink()
+    return len(parts)
@@ -0,0 +1,388 @@
+"""
+Single-pass, constant-memory data-quality profile checked against a
+declarative schema contract.
+
+One chunked read accumulates, per column: missing count, distinct count and
+(for `numeric` columns) coerced min/max/negatives/zeros; plus full-row and
+id duplicate counts. Distinct counts are exact up to `exact_limit` distinct
+values per column (numpy hash set, see src.data.dedup) and HyperLogLog
+estimates beyond that, so memory stays bounded for any input size.
+
+Contract (JSON, or YAML when PyYAML is installed), e.g. docs/schema_contract.json:
+
+    rows           : int (exact) or {"min": .., "max": ..}
+    columns        : [{"name": .., "numeric": bool, "min": .., "max": ..,
+                       "max_missing_pct": .., "unique": bool}, ...]  (or plain names)
+    column_order   : "strict" | "warn" | "ignore"   (default "warn")
+    extra_columns  : "fail" | "warn" | "ignore"     (default "fail")
+    id_column      : column whose duplicates are reported (optional)
+
+Usage:
+    python -m src.data.profiler --input export.parquet --contract docs/schema_contract.json
+Exit code 1 when a contract check fails, 0 otherwise.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from src import perf
+from src.data.dedup import UInt64Set, column_hash, combine_hashes
+from src.features.sketches import HyperLogLog
+
+CONTRACT = Path("docs/schema_contract.json")
+PROFILE_JSON = Path("reports/summary/data_profile.json")
+DEFAULT_CHUNKSIZE = 100_000
+EXACT_LIMIT = 100_000
+
+
+# -------- Contract --------
+def load_contract(path) -> dict:
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("YAML contracts need PyYAML (pip install pyyaml); or use JSON.") from e
+        contract = yaml.safe_load(text)
+    else:
+        contract = json.loads(text)
+    contract["columns"] = [c if isinstance(c, dict) else {"name": c} for c in contract.get("columns", [])]
+    return contract
+
+
+def _row_bounds(contract):
+    rows = contract.get("rows")
+    if rows is None:
+        return None, None
+    if isinstance(rows, dict):
+        return rows.get("min"), rows.get("max")
+    return rows, rows
+
+
+# -------- Accumulators --------
+class DistinctCounter:
+    """Exact distinct count of 64-bit keys up to `exact_limit`, HyperLogLog after."""
+
+    def __init__(self, exact_limit: int = EXACT_LIMIT, p: int = 14):
+        self.exact_limit = exact_limit
+        self._set = UInt64Set() if exact_limit > 0 else None
+        self.hll = HyperLogLog(p)
+
+    @property
+    def exact(self) -> bool:
+        return self._set is not None
+
+    def update(self, keys) -> "DistinctCounter":
+        self.hll.update(keys)
+        if self._set is not None:
+            self._set.add(keys)
+            if len(self._set) > self.exact_limit:
+                self._set = None  # switch to the estimate; frees the table
+        return self
+
+    def count(self) -> int:
+        return len(self._set) if self._set is not None else int(round(self.hll.estimate()))
+
+
+class NumericStats:
+    """Running stats of `pd.to_numeric(values, errors="coerce")`."""
+
+    def __init__(self):
+        self.non_null = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.negatives = 0
+        self.zeros = 0
+        self.non_numeric_or_missing = 0
+        self.integer = True  # pd.to_numeric of the whole column would be an int dtype
+
+    def update(self, values: pd.Series) -> "NumericStats":
+        if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+            v = values.to_numpy(dtype="float64", na_value=np.nan)
+            self.integer &= pd.api.types.is_integer_dtype(values)
+        else:  # text: parse each distinct value once
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+            parsed = pd.to_numeric(pd.Series(np.asarray(uniques, dtype=object)), errors="coerce")
+            v = np.append(parsed.to_numpy(dtype="float64", na_value=np.nan), np.nan)[codes]
+            self.integer &= pd.api.types.is_integer_dtype(parsed) and bool((codes >= 0).all())
+        ok = ~np.isnan(v)
+        x = v[ok]
+        self.non_null += int(ok.sum())
+        self.non_numeric_or_missing += int((~ok).sum())
+        if len(x):
+            self.min = min(self.min, float(x.min()))
+            self.max = max(self.max, float(x.max()))
+            self.negatives += int((x < 0).sum())
+            self.zeros += int((x == 0).sum())
+        return self
+
+    def _number(self, x):
+        if not self.non_null:
+            return None
+        return int(x) if self.integer else float(x)
+
+    def to_dict(self) -> dict:
+        return {
+            "non_null": self.non_null,
+            "min": self._number(self.min),
+            "max": self._number(self.max),
+            "negatives": self.negatives,
+            "zeros": self.zeros,
+            "non_numeric_or_missing": self.non_numeric_or_missing,
+        }
+
+
+class Profiler:
+    """Feed chunks with `update(chunk)`; `result()` returns the profile dict."""
+
+    def __init__(self, contract: dict | None = None, exact_limit: int = EXACT_LIMIT):
+        self.contract = contract or {"columns": []}
+        self.exact_limit = exact_limit
+        self.specs = {c["name"]: c for c in self.contract["columns"]}
+        self.id_col = self.contract.get("id_column")
+        self.columns = None
+        self.rows = 0
+        self.chunks = 0
+        self.missing = {}
+        self.dtypes = {}
+        self.distinct = {}
+        self.numeric = {}
+        self.row_distinct = DistinctCounter(exact_limit)
+        self.id_missing = 0
+
+    def start(self, columns) -> None:
+        self.columns = list(columns)
+        for c in self.columns:
+            self.missing[c] = 0
+            self.dtypes[c] = set()
+            self.distinct[c] = DistinctCounter(self.exact_limit)
+            if self.specs.get(c, {}).get("numeric"):
+                self.numeric[c] = NumericStats()
+
+    def update(self, chunk: pd.DataFrame) -> "Profiler":
+        if self.columns is None:
+            self.start(chunk.columns)
+        self.rows += len(chunk)
+        self.chunks += 1
+        hashes = []
+        for c in self.columns:
+            s = chunk[c]
+            na = s.isna().to_numpy()
+            h = column_hash(s)
+            hashes.append(h)
+            self.missing[c] += int(na.sum())
+            self.dtypes[c].add(str(s.dtype))
+            self.distinct[c].update(h[~na])
+            if c in self.numeric:
+                self.numeric[c].update(s)
+            if c == self.id_col:
+                self.id_missing += int(na.sum())
+        self.row_distinct.update(combine_hashes(hashes, len(chunk)))
+        return self
+
+    def result(self) -> dict:
+        fields = {}
+        for c in self.columns or []:
+            d = self.distinct[c]
+            f = {
+                "dtypes": sorted(self.dtypes[c]),
+                "missing_count": self.missing[c],
+                "missing_pct": round(self.missing[c] / self.rows * 100, 2) if self.rows else 0.0,
+                "distinct": d.count(),
+                "distinct_exact": d.exact,
+            }
+            if c in self.numeric:
+                f["numeric"] = self.numeric[c].to_dict()
+            fields[c] = f
+        dup = {
+            "full_rows": max(self.rows - self.row_distinct.count(), 0),
+            "full_rows_exact": self.row_distinct.exact,
+        }
+        if self.id_col in fields:
+            unique = fields[self.id_col]["distinct"]
+            dup.update({
+                "id_column": self.id_col,
+                "unique_ids": unique,
+                # duplicated(subset=[id]): every repeat of an id, missing ids counted as one id
+                "duplicated_ids": max(self.rows - unique - (1 if self.id_missing else 0), 0),
+                "ids_exact": fields[self.id_col]["distinct_exact"],
+            })
+        return {
+            "rows": self.rows,
+            "n_columns": len(self.columns or []),
+            "columns": list(self.columns or []),
+            "chunks": self.chunks,
+            "exact_limit": self.exact_limit,
+            "duplicates": dup,
+            "fields": fields,
+        }
+
+
+# -------- Checks --------
+def check_columns(columns, contract) -> tuple[list, list, dict]:
+    """Header-only checks: (failures, warnings, info)."""
+    failures, warnings = [], []
+    expected = [c["name"] for c in contract["columns"]]
+    found = list(columns)
+    missing = [c for c in expected if c not in found]
+    extra = [c for c in found if c not in expected]
+    order_match = found == expected
+    if missing:
+        failures.append(f"Missing columns: {missing}")
+    if extra:
+        msg = f"Extra columns: {extra}"
+        mode = contract.get("extra_columns", "fail")
+        if mode == "fail":
+            failures.append(msg)
+        elif mode == "warn":
+            warnings.append(msg)
+    if expected and not order_match and not missing and not extra:
+        msg = "Column order differs from the contract."
+        mode = contract.get("column_order", "warn")
+        if mode == "strict":
+            failures.append(msg)
+        elif mode == "warn":
+            warnings.append(msg)
+    info = {"missing": missing, "extra": extra, "set_match": not missing and not extra,
+            "order_match": order_match}
+    return failures, warnings, info
+
+
+def check_profile(profile: dict, contract: dict) -> dict:
+    failures, warnings, info = check_columns(profile["columns"], contract)
+    lo, hi = _row_bounds(contract)
+    rows = profile["rows"]
+    if not profile.get("complete", True):
+        lo = None  # stopped early: the row count is only a lower bound
+    if (lo is not None and rows < lo) or (hi is not None and rows > hi):
+        want = lo if lo == hi else f"[{lo}, {hi}]"
+        failures.append(f"Row count {rows} outside contract ({want})")
+    for spec in contract["columns"]:
+        f = profile["fields"].get(spec["name"])
+        if f is None:
+            continue
+        name = spec["name"]
+        if "max_missing_pct" in spec and f["missing_pct"] > spec["max_missing_pct"]:
+            failures.append(f"{name}: missing {f['missing_pct']}% > {spec['max_missing_pct']}%")
+        num = f.get("numeric")
+        if num and "min" in spec and num["min"] is not None and num["min"] < spec["min"]:
+            failures.append(f"{name}: min {num['min']} < {spec['min']}")
+        if num and "max" in spec and num["max"] is not None and num["max"] > spec["max"]:
+            failures.append(f"{name}: max {num['max']} > {spec['max']}")
+        if spec.get("unique"):
+            n_valid = rows - f["missing_count"]
+            if f["distinct"] < n_valid:
+                approx = "" if f["distinct_exact"] else " (estimated)"
+                failures.append(f"{name}: {n_valid - f['distinct']} duplicate values{approx}")
+    return {"passed": not failures, "failures": failures, "warnings": warnings, **info}
+
+
+# -------- Input --------
+def iter_input(path, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    Chunks of `path`, streamed in constant memory (Excel: the memory-mapped
+    parse-once cache when present, else openpyxl read-only rows).
+    Excel chunks see missing cells as NaN, as pd.read_excel does.
+    """
+    from src.data.readers import iter_raw_chunks
+    chunks = iter_raw_chunks(path, chunksize)
+    if Path(path).suffix.lower() not in (".xlsx", ".xlsm"):
+        yield from chunks
+        return
+    for chunk in chunks:
+        # openpyxl and Arrow hand back None for empty text cells
+        for col in chunk.columns:
+            if chunk[col].dtype == object:
+                chunk[col] = chunk[col].where(chunk[col].notna(), np.nan)
+        yield chunk
+
+
+def profile_chunks(chunks: Iterable[pd.DataFrame], contract: dict, exact_limit: int = EXACT_LIMIT,
+                   fail_fast: bool = False) -> dict:
+    """
+    Profile `chunks` in one pass and check the result against `contract`.
+    fail_fast stops reading as soon as the header (or the row maximum) fails.
+    """
+    prof = Profiler(contract, exact_limit)
+    _, hi = _row_bounds(contract)
+    stopped = False
+    for chunk in perf.timed_iter(chunks, "read"):
+        if prof.columns is None and fail_fast and check_columns(chunk.columns, contract)[0]:
+            prof.start(chunk.columns)
+            stopped = True
+            break
+        with perf.step("profile", rows=len(chunk)):
+            prof.update(chunk)
+        if fail_fast and hi is not None and prof.rows > hi:
+            stopped = True
+            break
+    profile = prof.result()
+    profile["complete"] = not stopped
+    profile["checks"] = check_profile(profile, contract)
+    return profile
+
+
+def write_profile(profile: dict, path=PROFILE_JSON) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(profile, indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def print_profile(profile: dict, source) -> None:
+    checks = profile["checks"]
+    print("=== Profile ===")
+    print(f"Path        : {source}")
+    print(f"Shape       : {profile['rows']} rows x {profile['n_columns']} cols"
+          + ("" if profile["complete"] else " (stopped early)"))
+    print(f"Contract    : {'PASS' if checks['passed'] else 'FAIL'}")
+    for m in checks["failures"]:
+        print(f"  ❌ {m}")
+    for m in checks["warnings"]:
+        print(f"  ⚠️ {m}")
+    dup = profile["duplicates"]
+    approx = "" if dup["full_rows_exact"] else "~"
+    print(f"Duplicate full rows: {approx}{dup['full_rows']}")
+    if "id_column" in dup:
+        approx = "" if dup["ids_exact"] else "~"
+        print(f"Unique {dup['id_column']}: {approx}{dup['unique_ids']} | "
+              f"Duplicated {dup['id_column']}: {approx}{dup['duplicated_ids']}")
+
+
+@perf.instrument_stage("profile")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="One-pass data profile checked against a schema contract.")
+    ap.add_argument("--input", type=Path, required=True, help=".xlsx / .csv / .parquet")
+    ap.add_argument("--contract", type=Path, default=CONTRACT)
+    ap.add_argument("--output", type=Path, default=PROFILE_JSON)
+    ap.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    ap.add_argument("--exact-limit", type=int, default=EXACT_LIMIT,
+                    help="exact distinct counts up to N values per column, HyperLogLog above")
+    ap.add_argument("--fail-fast", action="store_true",
+                    help="stop reading as soon as the header or row maximum fails")
+    args = ap.parse_args(argv)
+
+    if not args.input.exists():
+        print(f"❌ Data file not found at: {args.input}")
+        sys.exit(1)
+    profile = profile_chunks(iter_input(args.input, args.chunksize), load_contract(args.contract),
+                             args.exact_limit, args.fail_fast)
+    profile.update({"source": str(args.input), "contract": str(args.contract)})
+    write_profile(profile, args.output)
+    perf.note_read(args.input)
+    perf.note_written(args.output)
+    perf.set_rows(rows_in=profile["rows"])
+    print_profile(profile, args.input)
+    print(f"Saved: {args.output}")
+    sys.exit(0 if profile["checks"]["passed"] else 1)
+
+if __name__ == "__main__":
+    main()
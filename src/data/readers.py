@@ -0,0 +1,123 @@
+"""
+Chunked readers for raw exports (.xlsx / .csv / .parquet).
+
+Each reader yields DataFrames of at most `chunksize` rows, so callers can
+process files of any size in constant memory.
+
+`iter_raw_chunks` and `read_raw` also take a directory or a glob pattern
+(e.g. one workbook per clinic and month): the matching files are read in
+sorted order (`raw_files`).
+"""
+from __future__ import annotations
+
+import glob
+from itertools import chain
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 50_000
+RAW_SUFFIXES = (".xlsx", ".xlsm", ".csv", ".parquet", ".pq")
+
+
+def is_multi(spec) -> bool:
+    """True when `spec` names several exports: a directory or a glob pattern."""
+    return Path(spec).is_dir() or glob.has_magic(str(spec))
+
+
+def raw_files(spec) -> list:
+    """The raw exports named by `spec` (a file, a directory or a glob pattern), sorted."""
+    if not is_multi(spec):
+        return [Path(spec)]
+    if Path(spec).is_dir():
+        paths = Path(spec).iterdir()
+    else:
+        paths = map(Path, glob.glob(str(spec), recursive=True))
+    # "~$book.xlsx" is Excel's lock file for an open workbook
+    return sorted(p for p in paths if p.is_file() and p.suffix.lower() in RAW_SUFFIXES
+                  and not p.name.startswith("~$"))
+
+
+def iter_xlsx_chunks(path: Path, chunksize: int = DEFAULT_CHUNKSIZE, sheet=None) -> Iterator[pd.DataFrame]:
+    """Stream row blocks from an .xlsx via openpyxl read-only mode (first row = header)."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Trailing empty header cells come from formatted-but-empty columns
+        while header and header[-1] is None:
+            header = header[:-1]
+        width = len(header)
+        block = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            row = tuple(row[:width])
+            block.append(row + (None,) * (width - len(row)))
+            if len(block) >= chunksize:
+                yield pd.DataFrame(block, columns=list(header))
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=list(header))
+    finally:
+        wb.close()
+
+
+def iter_csv_chunks(path: Path, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def iter_parquet_chunks(path: Path, chunksize: int = DEFAULT_CHUNKSIZE, columns=None) -> Iterator[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
+
+
+def iter_raw_chunks(path, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Dispatch on file suffix: .xlsx/.xlsm, .csv, .parquet (several files: one after another)."""
+    if is_multi(path):
+        return chain.from_iterable(iter_raw_chunks(p, chunksize) for p in raw_files(path))
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".xlsx", ".xlsm"):
+        from src.data.excel_cache import cached_table
+        table = cached_table(path)
+        if table is not None:  # already converted: slice the memory-mapped cache
+            return (b.to_pandas() for b in table.to_batches(max_chunksize=chunksize))
+        return iter_xlsx_chunks(path, chunksize)
+    if suffix == ".csv":
+        return iter_csv_chunks(path, chunksize)
+    if suffix in (".parquet", ".pq"):
+        return iter_parquet_chunks(path, chunksize)
+    raise ValueError(f"Unsupported raw file type: {path}")
+
+
+def read_raw(path) -> pd.DataFrame:
+    """
+    Whole-file counterpart of iter_raw_chunks (same suffix dispatch).
+    Several files are concatenated in sorted order; for concurrent parsing
+    see src.features.ingest.
+    """
+    if is_multi(path):
+        files = raw_files(path)
+        if not files:
+            raise ValueError(f"No raw files match {path}")
+        return pd.concat([read_raw(p) for p in files], ignore_index=True)
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".xlsx", ".xlsm"):
+        from src.data.excel_cache import read_excel_cached
+        return read_excel_cached(path)
+    if suffix == ".csv":
+        return pd.read_csv(path)
+    if suffix in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    raise ValueError(f"Unsupported raw file type: {path}")
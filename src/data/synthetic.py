@@ -0,0 +1,249 @@
+"""
+Seeded synthetic raw dataset with the 13-column schema of docs/DATA_DICTIONARY.md.
+
+Values are deliberately messy, like the real export:
+- TedaviSuresi "15 Seans", "8-10 seans", "15 SEANS", bare "15"
+- UygulamaSuresi "20 Dakika", "45 dk", "1,5 saat", "90 sn"
+- multi-label cells joined with , ; / | (with stray spaces / casing)
+- several visits per patient (repeated HastaNo), exact duplicate rows
+- missing values at roughly the real per-column rates
+
+Rows are generated in fixed blocks of BLOCK_ROWS from (seed, block number),
+so a given (rows, seed) always yields the same file, whatever the format.
+
+Usage:
+    python -m src.data.synthetic --rows 100000 --output data/raw/synthetic_100k.parquet
+    python -m src.data.synthetic --rows 2235 --output data/raw/Talent_Academy_Case_DT_2025.xlsx
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "HastaNo", "Yas", "Cinsiyet", "KanGrubu", "Uyruk",
+    "KronikHastalik", "Bolum", "Alerji", "Tanilar", "TedaviAdi",
+    "TedaviSuresi", "UygulamaYerleri", "UygulamaSuresi",
+]
+BLOCK_ROWS = 100_000
+XLSX_MAX_ROWS = 1_048_575  # Excel sheet limit minus the header row
+FIRST_ID = 145134
+VISITS_PER_PATIENT = 5.5   # 2235 rows / 404 patients in the original export
+
+# Missing-value rates (share of rows)
+MISSING = {
+    "Cinsiyet": 0.07, "KanGrubu": 0.30, "KronikHastalik": 0.27, "Bolum": 0.005,
+    "Alerji": 0.42, "Tanilar": 0.03, "UygulamaYerleri": 0.10,
+}
+
+CINSIYET = ["Kadın", "Erkek", "kadın", "ERKEK"]
+CINSIYET_P = [0.52, 0.44, 0.02, 0.02]
+KAN_GRUBU = ["0 Rh+", "A Rh+", "B Rh+", "AB Rh+", "0 Rh-", "A Rh-", "B Rh-", "AB Rh-"]
+UYRUK = ["Türkiye", "Tokelau", "Arnavutluk", "Azerbaycan", "Libya"]
+UYRUK_P = [0.95, 0.02, 0.01, 0.01, 0.01]
+BOLUM = [
+    "Fiziksel Tıp Ve Rehabilitasyon,Solunum Merkezi", "Ortopedi Ve Travmatoloji",
+    "İç Hastalıkları", "Nöroloji", "Kardiyoloji", "Genel Cerrahi",
+    "Göğüs Hastalıkları", "Tıbbi Onkoloji", "Laboratuar", "Kalp Ve Damar Cerrahisi",
+]
+KRONIK = [
+    "Aritmi", "Astım", "Diyabet", "Hipertansiyon", "Hipotiroidizm", "Hipertiroidizm",
+    "Kalp yetmezliği", "Myastenia gravis", "Osteoporoz", "Limb-Girdle Musküler Distrofi",
+    "Duchenne Musküler Distrofisi", "Fascioscapulohumeral Distrofi",
+]
+ALERJI = ["POLEN", "TOZ", "Novalgin", "Sucuk", "Arveles", "Coraspin", "Volteren",
+          "Gripin", "Yer Fıstığı", "Sitrik Asit"]
+YERLER = [
+    "Bel", "Boyun", "Sırt", "Diz", "Omuz", "Kalça", "Ayak Bileği", "El Bileği",
+    "Sol Omuz Bölgesi", "Sağ Omuz Bölgesi", "Sol Diz Bölgesi", "Sağ Diz Bölgesi",
+    "Lumbal", "Servikal", "Tüm Vücut Bölgesi", "Dirsek", "Ayak", "El",
+]
+TANILAR = [
+    "DORSALJİ, DİĞER", "Lumbago", "Omuzun darbe sendromu", "Gonartroz, tanımlanmamış",
+    "İNTERVERTEBRAL DİSK BOZUKLUKLARI, DİĞER", "Servikal disk bozuklukları",
+    "Kırık, ön kol", "Meniskopati", "Tendinit", "Bel ağrısı", "Aşil tendinit",
+    "Karpal tünel sendromu", "Koksartroz", "Skolyoz", "Miyalji",
+]
+TEDAVI_BASE = [
+    "Dorsalji", "İV DİSK BOZUKLUĞU", "Gonartroz", "Meniskopati", "Omuz İmpingement",
+    "Sol Omuz İmpingement", "Sağ Omuz İmpingement", "Lumbalji", "Servikalji",
+    "Koksartroz", "Parapleji", "Hemipleji", "Aşil Tendiniti", "Kalça Protezi",
+    "Diz Protezi", "Karpal Tünel", "Kırık Sonrası", "Skolyoz", "Fibromiyalji", "Trapez Spazmı",
+]
+TEDAVI_SITE = ["-Bel", "-Boyun", "-Boyun+trapez", "-Diz", "-Omuz", " Rehabilitasyonu", "", "-Sol", "-Sağ"]
+SEANS = [1, 3, 5, 10, 15, 20, 25, 30]
+SEANS_P = [0.02, 0.05, 0.22, 0.18, 0.40, 0.08, 0.03, 0.02]
+SEANS_FORMATS = ["{} Seans", "{} seans", "{} SEANS", "{}", "{} Seans "]
+SEANS_FORMATS_P = [0.85, 0.06, 0.03, 0.03, 0.03]
+SEANS_RANGES = ["8-10 seans", "10-15 Seans", "5 - 7 seans"]
+SURE = ["20 Dakika", "5 Dakika", "10 Dakika", "30 Dakika", "15 Dakika", "45 dk",
+        "3 Dakika", "1 saat", "1,5 saat", "90 sn", "60 Dakika", "20 dk "]
+SURE_P = [0.40, 0.15, 0.12, 0.10, 0.08, 0.04, 0.03, 0.02, 0.02, 0.01, 0.02, 0.01]
+SEPARATORS = [",", ", ", ";", "/", "|", " , ", "; "]
+SEPARATORS_P = [0.55, 0.15, 0.1, 0.07, 0.05, 0.04, 0.04]
+POOL_SIZE = 4096
+
+
+def _zipf_p(n: int, a: float = 1.1) -> np.ndarray:
+    p = 1.0 / np.arange(1, n + 1) ** a
+    return p / p.sum()
+
+
+def _noisy(token: str, rng) -> str:
+    r = rng.random()
+    if r < 0.04:
+        return token.upper()
+    if r < 0.07:
+        return token.lower()
+    if r < 0.10:
+        return f" {token} "
+    return token
+
+
+def _multilabel_pool(tokens, rng, size=POOL_SIZE) -> np.ndarray:
+    """Distinct-ish messy cells: 1-4 tokens, Zipf-distributed, random separators."""
+    p = _zipf_p(len(tokens))
+    cells = []
+    for _ in range(size):
+        k = min(rng.geometric(0.55), 4)
+        picks = rng.choice(len(tokens), size=k, replace=False, p=p)
+        sep = SEPARATORS[rng.choice(len(SEPARATORS), p=SEPARATORS_P)]
+        cells.append(sep.join(_noisy(tokens[i], rng) for i in picks))
+    return np.array(cells, dtype=object)
+
+
+class _Pools:
+    """Per-seed value pools and per-patient attributes (shared by all blocks)."""
+
+    def __init__(self, n_rows: int, seed: int):
+        rng = np.random.default_rng([seed, 0])
+        self.n_patients = max(1, int(round(n_rows / VISITS_PER_PATIENT)))
+        n = self.n_patients
+        # Patient-level attributes (same on every visit)
+        self.yas = rng.integers(1, 93, n)
+        self.cinsiyet = rng.choice(len(CINSIYET), n, p=CINSIYET_P)
+        self.kan = rng.integers(0, len(KAN_GRUBU), n)
+        self.uyruk = rng.choice(len(UYRUK), n, p=UYRUK_P)
+        self.kronik_pool = _multilabel_pool(KRONIK, rng)
+        self.alerji_pool = _multilabel_pool(ALERJI, rng)
+        self.kronik = rng.choice(POOL_SIZE, n, p=_zipf_p(POOL_SIZE, 0.9))
+        self.alerji = rng.choice(POOL_SIZE, n, p=_zipf_p(POOL_SIZE, 0.9))
+        self.missing = {c: rng.random(n) < MISSING[c]
+                        for c in ("Cinsiyet", "KanGrubu", "KronikHastalik", "Alerji")}
+        # Visit-level pools
+        self.yerler_pool = _multilabel_pool(YERLER, rng)
+        self.tedavi = np.array([b + s for b in TEDAVI_BASE for s in TEDAVI_SITE], dtype=object)
+        seans = [f.format(k) for k in SEANS for f in SEANS_FORMATS]
+        seans_p = [ps * pf for ps in SEANS_P for pf in SEANS_FORMATS_P]
+        self.seans = np.array(seans + SEANS_RANGES, dtype=object)
+        self.seans_p = np.array(seans_p + [0.01] * len(SEANS_RANGES))
+        self.seans_p /= self.seans_p.sum()
+
+
+def _pick(pool, idx, missing=None) -> np.ndarray:
+    out = np.asarray(pool, dtype=object)[idx]
+    if missing is not None:
+        out[missing] = None
+    return out
+
+
+def _block(pools: _Pools, seed: int, block_no: int, n: int, dup_rate: float) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, block_no + 1])
+    pid = rng.integers(0, pools.n_patients, n)
+    miss = lambda c: rng.random(n) < MISSING[c]
+    df = pd.DataFrame({
+        "HastaNo": FIRST_ID + pid,
+        "Yas": pools.yas[pid],
+        "Cinsiyet": _pick(CINSIYET, pools.cinsiyet[pid], pools.missing["Cinsiyet"][pid]),
+        "KanGrubu": _pick(KAN_GRUBU, pools.kan[pid], pools.missing["KanGrubu"][pid]),
+        "Uyruk": _pick(UYRUK, pools.uyruk[pid]),
+        "KronikHastalik": _pick(pools.kronik_pool, pools.kronik[pid], pools.missing["KronikHastalik"][pid]),
+        "Bolum": _pick(BOLUM, rng.choice(len(BOLUM), n, p=_zipf_p(len(BOLUM), 1.6)), miss("Bolum")),
+        "Alerji": _pick(pools.alerji_pool, pools.alerji[pid], pools.missing["Alerji"][pid]),
+        "Tanilar": _pick(TANILAR, rng.choice(len(TANILAR), n, p=_zipf_p(len(TANILAR))), miss("Tanilar")),
+        "TedaviAdi": _pick(pools.tedavi, rng.choice(len(pools.tedavi), n, p=_zipf_p(len(pools.tedavi)))),
+        "TedaviSuresi": _pick(pools.seans, rng.choice(len(pools.seans), n, p=pools.seans_p)),
+        "UygulamaYerleri": _pick(pools.yerler_pool, rng.choice(POOL_SIZE, n, p=_zipf_p(POOL_SIZE, 0.9)),
+                                 miss("UygulamaYerleri")),
+        "UygulamaSuresi": _pick(SURE, rng.choice(len(SURE), n, p=SURE_P)),
+    }, columns=COLUMNS)
+    # Exact duplicate rows: copy an earlier row of the same block
+    dup = rng.random(n) < dup_rate
+    dup[0] = False
+    src = np.arange(n)
+    src[dup] = (rng.random(int(dup.sum())) * np.flatnonzero(dup)).astype(np.int64)
+    if dup.any():
+        df = df.iloc[src].reset_index(drop=True)
+    return df
+
+
+def iter_synthetic(n_rows: int, seed: int = 0, dup_rate: float = 0.05) -> Iterator[pd.DataFrame]:
+    """Yield the dataset in blocks of at most BLOCK_ROWS rows."""
+    pools = _Pools(n_rows, seed)
+    for block_no, start in enumerate(range(0, n_rows, BLOCK_ROWS)):
+        yield _block(pools, seed, block_no, min(BLOCK_ROWS, n_rows - start), dup_rate)
+
+
+def generate(n_rows: int, seed: int = 0, dup_rate: float = 0.05) -> pd.DataFrame:
+    """Whole synthetic dataset in memory."""
+    return pd.concat(list(iter_synthetic(n_rows, seed, dup_rate)), ignore_index=True)
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([pa.field(c, pa.int64() if c in ("HastaNo", "Yas") else pa.string()) for c in COLUMNS])
+
+
+def write(path, n_rows: int, seed: int = 0, dup_rate: float = 0.05) -> Path:
+    """Stream the dataset to .parquet / .csv / .xlsx (by suffix) in constant memory."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    suffix = path.suffix.lower()
+    blocks = iter_synthetic(n_rows, seed, dup_rate)
+    tmp = path.with_name(path.name + ".tmp")
+    if suffix in (".parquet", ".pq"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = _arrow_schema()
+        with pq.ParquetWriter(tmp, schema) as writer:
+            for df in blocks:
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+    elif suffix == ".csv":
+        for i, df in enumerate(blocks):
+            df.to_csv(tmp, index=False, encoding="utf-8", mode="w" if i == 0 else "a", header=i == 0)
+    elif suffix in (".xlsx", ".xlsm"):
+        if n_rows > XLSX_MAX_ROWS:
+            raise ValueError(f"{n_rows} rows do not fit in one Excel sheet (max {XLSX_MAX_ROWS}); use .parquet or .csv")
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(COLUMNS)
+        for df in blocks:
+            for row in df.itertuples(index=False, name=None):
+                ws.append([int(v) if isinstance(v, np.integer) else v for v in row])
+        wb.save(tmp)
+    else:
+        raise ValueError(f"Unsupported output type: {path}")
+    tmp.replace(path)
+    return path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write a seeded synthetic raw dataset.")
+    ap.add_argument("--rows", type=int, default=2235)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--dup-rate", type=float, default=0.05, help="share of exact duplicate rows")
+    ap.add_argument("--output", type=Path, default=None,
+                    help=".parquet/.csv/.xlsx (default: data/raw/synthetic_<rows>.parquet)")
+    args = ap.parse_args(argv)
+    out = args.output or Path(f"data/raw/synthetic_{args.rows}.parquet")
+    write(out, args.rows, seed=args.seed, dup_rate=args.dup_rate)
+    print(f"✅ Saved: {out} ({args.rows} rows, seed={args.seed})")
+
+
+if __name__ == "__main__":
+    main()
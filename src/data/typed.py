@@ -0,0 +1,118 @@
+"""
+Typed, column-pruned loading of the interim parquet.
+
+Compact in-memory dtypes instead of Python objects:
+- low-cardinality columns (CATEGORY_COLS) -> `category`
+- free text (TEXT_COLS)                   -> pyarrow-backed `string`
+- numerics -> smallest lossless type (intN / nullable IntN / float32 only
+  when every value round-trips)
+
+Parquet strings are converted straight to Arrow-backed pandas columns
+(`types_mapper`), so no per-cell Python str objects are created on load.
+
+`to_model_frame` widens a typed frame back to what the preprocess pipeline
+was fitted on: int64/Int64, float64, and object columns where a missing
+cell is None (as pandas 2.x reads string nulls from parquet; SimpleImputer
+keeps None as a category, only NaN is imputed).
+"""
+from __future__ import annotations
+
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+CATEGORY_COLS = ["Cinsiyet", "KanGrubu", "Uyruk", "Bolum", "TedaviAdi"]
+TEXT_COLS = ["KronikHastalik", "Alerji", "Tanilar", "TedaviSuresi", "UygulamaYerleri", "UygulamaSuresi"]
+STRING_DTYPE = pd.StringDtype("pyarrow")
+
+_INT_LADDER = [(np.int8, "Int8"), (np.int16, "Int16"), (np.int32, "Int32"), (np.int64, "Int64")]
+
+
+def _types_mapper(t):
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        return STRING_DTYPE
+    return None
+
+
+def downcast_numeric(s: pd.Series) -> pd.Series:
+    """Smallest dtype that holds every value of `s` exactly."""
+    if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+        return s
+    values = s.to_numpy(dtype="float64", na_value=np.nan)
+    valid = values[~np.isnan(values)]
+    has_na = len(valid) < len(values)
+    if not len(valid):
+        return s
+    if np.all(np.isfinite(valid)) and np.array_equal(valid, np.trunc(valid)):
+        lo, hi = valid.min(), valid.max()
+        for np_type, nullable in _INT_LADDER:
+            info = np.iinfo(np_type)
+            if info.min <= lo and hi <= info.max:
+                if has_na:
+                    return s.astype(nullable)
+                return s.astype(np_type)
+        return s
+    if s.dtype == np.float64 and np.array_equal(valid.astype(np.float32).astype(np.float64), valid):
+        return s.astype(np.float32)
+    return s
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the compact dtypes above (returns a new frame)."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in CATEGORY_COLS:
+            out[col] = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype(STRING_DTYPE).astype("category")
+        elif col in TEXT_COLS or s.dtype == object:
+            out[col] = s if s.dtype == STRING_DTYPE else s.astype(STRING_DTYPE)
+        else:
+            out[col] = downcast_numeric(s)
+    return pd.DataFrame(out, index=df.index)
+
+
+def _paths(path) -> list:
+    return list(path) if isinstance(path, (list, tuple)) else [path]
+
+
+def read_typed(path, columns=None) -> pd.DataFrame:
+    """
+    Read only `columns` of a parquet file, with compact dtypes. A list of
+    files is read in order and concatenated (their physical types may differ).
+    """
+    import pyarrow.parquet as pq
+    frames = [pq.read_table(p, columns=columns).to_pandas(types_mapper=_types_mapper) for p in _paths(path)]
+    return optimize_dtypes(frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True))
+
+
+def iter_typed_chunks(path, chunksize: int, columns=None) -> Iterator[pd.DataFrame]:
+    """Chunked counterpart of read_typed (row index continues across chunks and files)."""
+    import pyarrow.parquet as pq
+    start = 0
+    for p in _paths(path):
+        for batch in pq.ParquetFile(p).iter_batches(batch_size=chunksize, columns=columns):
+            df = batch.to_pandas(types_mapper=_types_mapper)
+            df.index = pd.RangeIndex(start, start + len(df))
+            start += len(df)
+            yield optimize_dtypes(df)
+
+
+def to_model_frame(df: pd.DataFrame, float_cols=()) -> pd.DataFrame:
+    """Widen compact dtypes back to int64/Int64, float64 and object-with-None."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in float_cols:
+            out[col] = pd.Series(s.to_numpy(dtype="float64", na_value=np.nan), index=s.index)
+        elif isinstance(s.dtype, pd.CategoricalDtype) or isinstance(s.dtype, pd.StringDtype) or s.dtype == object:
+            values = s.to_numpy(dtype=object, na_value=None)
+            out[col] = pd.Series(values, index=s.index, dtype=object)
+        elif pd.api.types.is_integer_dtype(s):
+            out[col] = s.astype("Int64") if s.hasnans else s.astype("int64")
+        elif pd.api.types.is_float_dtype(s):
+            out[col] = s.astype("float64")
+        else:
+            out[col] = s
+    return pd.DataFrame(out, index=df.index)
@@ -0,0 +1,163 @@
+"""
+Delta mode: add a batch of new raw records without refitting or rewriting history.
+
+    python -m src.features.append --input data/raw/new_batch.xlsx
+
+1. derive TedaviSuresi_num / UygulamaSuresi_min for the batch only
+2. dedup against data/processed/known_ids.npz: rows whose HastaNo is
+   already in the dataset and repeats within the batch are dropped
+   (keep-first, the same rows a full run over history + batch keeps)
+3. transform with the fitted models/preprocess_pipeline.joblib
+4. write data/processed/dataset_model_ready_parts/part-NNNNN.parquet and the
+   kept derived rows as data/interim/01_numeric_parts/part-NNNNN.parquet
+   (both removed if either fails), then add the batch to the known ids and
+   the HastaNo index (src.data.model_ready)
+
+Cost is proportional to the batch. Refitting stays a separate, explicit
+action: `python -m src.features.preprocess` reads the full export plus
+every appended batch, refits, and folds the partitions into one file.
+If the preprocess stage of src.pipeline was up to date, the append is
+recorded there too, so `python -m src.pipeline run` does not refit.
+The CSV and .npy exports are only written by full runs.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import load
+from scipy import sparse
+
+from src import perf, pipeline
+from src.data.dedup import Deduplicator
+from src.data.model_ready import (DENSE_PARQ, INDEX_NPZ, KNOWN_IDS, PARTS_DIR, PROCESSED_DIR,
+                                  ROW_GROUP_ROWS, append_index, feature_frame)
+from src.data.typed import optimize_dtypes, to_model_frame
+from src.features.derive_numeric import PARTS_DIR as INTERIM_PARTS_DIR, derive, interim_table
+from src.features.preprocess import ID_COL, NUM_COLS, PIPELINE, TARGET, USED_COLS
+
+MANIFEST = PROCESSED_DIR / "append_manifest.json"
+
+
+def next_part_name(*dirs) -> str:
+    """part-NNNNN.parquet, numbered after every part in `dirs` (interim and processed share numbers)."""
+    numbers = [int(m.group(1)) for d in dirs for p in Path(d).glob("part-*.parquet")
+               if (m := re.fullmatch(r"part-(\d+)\.parquet", p.name))]
+    return f"part-{max(numbers, default=0) + 1:05d}.parquet"
+
+
+def _write_parquet(df, path: Path, **kwargs) -> None:
+    """Write a DataFrame or an Arrow table via a .tmp file."""
+    import pyarrow.parquet as pq
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        if isinstance(df, pd.DataFrame):
+            df.to_parquet(tmp_path, index=False, **kwargs)
+        else:
+            pq.write_table(df, tmp_path, **kwargs)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(path)
+
+
+def _fail(msg: str) -> None:
+    print(f"❌ {msg}")
+    sys.exit(1)
+
+
+def _record(entry: dict) -> None:
+    entries = json.loads(MANIFEST.read_text(encoding="utf-8")) if MANIFEST.exists() else []
+    entries.append(entry)
+    MANIFEST.write_text(json.dumps(entries, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+@perf.instrument_stage("append")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Append a batch of new raw records (no refit).")
+    ap.add_argument("--input", type=Path, required=True, help="raw .xlsx/.csv/.parquet batch")
+    ap.add_argument("--pipeline", type=Path, default=Path(PIPELINE))
+    args = ap.parse_args(argv)
+
+    if not args.input.exists():
+        _fail(f"Data file not found: {args.input}")
+    for path in (args.pipeline, DENSE_PARQ, KNOWN_IDS, INDEX_NPZ):
+        if not Path(path).exists():
+            _fail(f"Missing {path} (run `python -m src.features.preprocess` first)")
+
+    stage_current = pipeline.is_current("preprocess")
+    ct = load(args.pipeline)
+    if getattr(ct, "sparse_output_", False):
+        _fail("Append writes the dense layout; the pipeline is sparse.")
+    feat_names = list(ct.get_feature_names_out())
+    import pyarrow.parquet as pq
+    schema = pq.read_schema(DENSE_PARQ)
+    if schema.names != [ID_COL, TARGET] + feat_names:
+        _fail(f"{args.pipeline} does not match {DENSE_PARQ} (refit with `python -m src.features.preprocess`)")
+    # the parts keep the base file's feature dtypes (e.g. a --dtypes compact run)
+    dtypes = [np.dtype(schema.field(name).type.to_pandas_dtype()) for name in feat_names]
+
+    # 1) Derive numerics for the batch only; keep them for the next full run
+    from src.data.readers import read_raw
+    with perf.step("read") as st:
+        raw = read_raw(args.input)
+        st.rows = len(raw)
+    perf.note_read(args.input)
+    typed = optimize_dtypes(derive(raw))
+
+    # 2) Dedup against every HastaNo already in the dataset (keep-first)
+    with perf.step("dedup", rows=len(typed)):
+        dd = Deduplicator(id_col=ID_COL).load_ids(KNOWN_IDS)
+        kept = typed[dd.keep_mask(typed)].reset_index(drop=True)
+    dd.report()
+    perf.set_rows(rows_in=len(typed), rows_out=len(kept))
+
+    entry = {"source": str(args.input), "rows_in": len(typed), "rows_appended": len(kept),
+             "dropped": dd.dropped, "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    if kept.empty:
+        _record(entry)
+        print(f"✅ Nothing to append: every row of {args.input} is already in the dataset.")
+        return
+    # the dropped rows repeat earlier ids, so a refit over history + kept rows
+    # keeps exactly what it would keep over history + the whole batch
+    new = kept[[ID_COL, TARGET] + USED_COLS]
+
+    # 3) Transform with the fitted pipeline (no refit)
+    with perf.step("transform", rows=len(new)):
+        Xt = ct.transform(to_model_frame(new[USED_COLS], float_cols=NUM_COLS))
+        Xt = Xt.toarray() if sparse.issparse(Xt) else Xt
+    out_df = pd.concat([to_model_frame(new[[ID_COL, TARGET]]), feature_frame(Xt, feat_names, dtypes)], axis=1)
+
+    # 4) New partitions (both or neither), then the state that makes them visible
+    part = entry["part"] = next_part_name(INTERIM_PARTS_DIR, PARTS_DIR)
+    out_path = PARTS_DIR / part
+    try:
+        with perf.step("write_parquet", rows=len(out_df)):
+            _write_parquet(out_df, out_path, row_group_size=ROW_GROUP_ROWS)
+        with perf.step("write_interim", rows=len(kept)):
+            _write_parquet(interim_table(kept), INTERIM_PARTS_DIR / part)  # same schema as 01_numeric
+    except BaseException:
+        out_path.unlink(missing_ok=True)
+        (INTERIM_PARTS_DIR / part).unlink(missing_ok=True)
+        raise
+    dd.save_ids(KNOWN_IDS)
+    with perf.step("write_index", rows=len(out_df)):
+        n_ids = append_index(out_path)
+    _record(entry)
+    if stage_current:
+        pipeline.refresh("preprocess")
+    for path in (INTERIM_PARTS_DIR / part, out_path, KNOWN_IDS, INDEX_NPZ, MANIFEST):
+        perf.note_written(path)
+
+    print(f"✅ Appended {len(out_df)} new rows (of {len(typed)}) as {out_path}")
+    print(f"Derived rows kept for the next refit: {INTERIM_PARTS_DIR / part}")
+    print(f"Index: {INDEX_NPZ} ({n_ids} ids)")
+
+
+if __name__ == "__main__":
+    main()
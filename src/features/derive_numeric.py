@@ -1,38 +1,192 @@
+import argparse
+import sys
 from pathlib import Path
 import pandas as pd
-from src.features.parsers import parse_sessions, parse_duration_minutes, to_int_safe
+from src import perf
+from src.data.typed import CATEGORY_COLS
+from src.features.parsers import (
+    parse_sessions_series, parse_duration_minutes_series, to_int_safe_series,
+)
 
 RAW_PATH = Path("data/raw/Talent_Academy_Case_DT_2025.xlsx")
 OUT_PARQUET = Path("data/interim/01_numeric.parquet")
+PARTS_DIR = Path("data/interim/01_numeric_parts")  # batches added by src.features.append
+DATASET_DIR = Path("data/interim/01_numeric_dataset")  # per-file partitions of a directory/glob input (src.features.ingest)
+DERIVED_COLS = ["TedaviSuresi_num", "UygulamaSuresi_min"]
 
-def main():
-    assert RAW_PATH.exists(), f"Data file not found: {RAW_PATH}"
-    df = pd.read_excel(RAW_PATH)
+# Fixed Arrow types for every writer of the derived data (this module's
+# in-memory and streaming paths, ingest partitions, append's interim parts):
+# every row group and file must share one schema, even when a chunk has an
+# all-null or mixed-type column or a batch downcasts differently. Low-cardinality
+# columns are dictionary-encoded (read back as `category`, see src.data.typed).
+INT_COLS = ["HastaNo"]
+INT32_COLS = ["TedaviSuresi_num"]
+FLOAT_COLS = ["Yas", "UygulamaSuresi_min"]
 
-    # Parse target: TedaviSuresi (sessions)
-    parsed_sessions = df["TedaviSuresi"].apply(parse_sessions)
-    df["TedaviSuresi_num"] = parsed_sessions.apply(to_int_safe)
+def derive(df: pd.DataFrame) -> pd.DataFrame:
+    """Add TedaviSuresi_num / UygulamaSuresi_min to a raw frame (in place) and return it."""
+    # Parse target: TedaviSuresi (sessions) — vectorized over the whole column
+    with perf.step("parse_sessions", rows=len(df)):
+        parsed_sessions = parse_sessions_series(df["TedaviSuresi"])
+        df["TedaviSuresi_num"] = to_int_safe_series(parsed_sessions)
 
     # Parse application duration: UygulamaSuresi -> minutes
-    parsed_minutes = df["UygulamaSuresi"].apply(parse_duration_minutes)
-    df["UygulamaSuresi_min"] = parsed_minutes
+    with perf.step("parse_duration", rows=len(df)):
+        parsed_minutes = parse_duration_minutes_series(df["UygulamaSuresi"])
+        df["UygulamaSuresi_min"] = parsed_minutes
 
     # Basic sanity: non-negative
-    for col in ["TedaviSuresi_num", "UygulamaSuresi_min"]:
+    for col in DERIVED_COLS:
         if col in df.columns:
             df.loc[df[col].notna() & (df[col] < 0), col] = None
+    return df
+
+def interim_paths(base: Path = OUT_PARQUET, parts_dir: Path = PARTS_DIR) -> list:
+    """The derived dataset in row order: the full export, then appended batches."""
+    return [base] + sorted(parts_dir.glob("part-*.parquet"))
+
+def report(tot, t_nonnull, u_nonnull):
+    print("=== Derived numeric columns ===")
+    print(f"TedaviSuresi_num non-null: {t_nonnull}/{tot}")
+    print(f"UygulamaSuresi_min non-null: {u_nonnull}/{tot}")
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+    fields = []
+    for col in columns:
+        if col in INT_COLS:
+            fields.append(pa.field(col, pa.int64()))
+        elif col in INT32_COLS:
+            fields.append(pa.field(col, pa.int32()))
+        elif col in CATEGORY_COLS:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        elif col in FLOAT_COLS:
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+def _to_arrow(df: pd.DataFrame, schema):
+    import pyarrow as pa
+    df = df.copy()
+    for field in schema:
+        if pa.types.is_string(field.type) or pa.types.is_dictionary(field.type):
+            df[field.name] = df[field.name].astype("string")
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False).replace_schema_metadata(None)
+
+def interim_table(df: pd.DataFrame):
+    """`df` as an Arrow table with the fixed schema above, whatever its pandas dtypes."""
+    return _to_arrow(df, _arrow_schema(df.columns))
+
+def write_derived(chunks, out_path: Path, progress: bool = False):
+    """
+    Derive numerics per chunk and append each chunk as a Parquet row group
+    of `out_path` (written to a .tmp file, renamed when complete and removed
+    on failure; nothing is written for an empty input).
+    Returns (rows, TedaviSuresi_num non-null, UygulamaSuresi_min non-null).
+    """
+    import pyarrow.parquet as pq
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    writer = None
+    tot = t_nonnull = u_nonnull = 0
+    try:
+        for i, chunk in enumerate(chunks):
+            chunk = derive(chunk)
+            tot += len(chunk)
+            t_nonnull += int(chunk["TedaviSuresi_num"].notna().sum())
+            u_nonnull += int(chunk["UygulamaSuresi_min"].notna().sum())
+            if writer is None:
+                schema = _arrow_schema(chunk.columns)
+                writer = pq.ParquetWriter(tmp_path, schema)
+            with perf.step("write", rows=len(chunk)):
+                writer.write_table(_to_arrow(chunk, schema))
+            if progress:
+                print(f"  chunk {i}: {len(chunk)} rows (total {tot})")
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            writer = None
+            tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        tmp_path.replace(out_path)
+    return tot, t_nonnull, u_nonnull
+
+def stream(raw_path: Path, out_path: Path, chunksize: int):
+    """
+    Constant-memory mode: read `raw_path` in row blocks, derive numerics per
+    block and append each block as a Parquet row group.
+    """
+    from src.data.readers import iter_raw_chunks
+
+    tot, t_nonnull, u_nonnull = write_derived(
+        perf.timed_iter(iter_raw_chunks(raw_path, chunksize), "read"), out_path, progress=True)
+    if not tot:
+        raise ValueError(f"No rows read from {raw_path}")
+    perf.note_read(raw_path)
+    perf.note_written(out_path)
+    perf.set_rows(rows_in=tot, rows_out=tot)
+    report(tot, t_nonnull, u_nonnull)
+
+@perf.instrument_stage("derive_numeric")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Derive TedaviSuresi_num / UygulamaSuresi_min.")
+    ap.add_argument("--input", type=Path, default=RAW_PATH,
+                    help="raw .xlsx/.csv/.parquet, or a directory / glob pattern of them")
+    ap.add_argument("--output", type=Path, default=OUT_PARQUET)
+    ap.add_argument("--chunksize", type=int, default=None,
+                    help="stream the input in blocks of N rows (constant memory)")
+    ap.add_argument("--dataset", type=Path, default=DATASET_DIR,
+                    help="partitioned dataset for a directory/glob input (source=<file>/month=<YYYY-MM>)")
+    ap.add_argument("--jobs", type=int, default=0,
+                    help="files parsed in parallel for a directory/glob input (0 = all cores)")
+    ap.add_argument("--force", action="store_true",
+                    help="re-ingest files that are unchanged since their last ingestion")
+    args = ap.parse_args(argv)
+
+    from src.data.readers import DEFAULT_CHUNKSIZE, is_multi, raw_files
+    if is_multi(args.input):
+        from src.features.ingest import ingest
+        files = raw_files(args.input)
+        assert files, f"No raw files match {args.input}"
+        failed = ingest(files, args.dataset, args.output, n_jobs=args.jobs,
+                        chunksize=args.chunksize or DEFAULT_CHUNKSIZE, force=args.force)
+        if failed:
+            return 1
+        print(f"✅ Saved: {args.output} (partitions: {args.dataset})")
+        return
+
+    assert args.input.exists(), f"Data file not found: {args.input}"
+    if args.chunksize:
+        stream(args.input, args.output, args.chunksize)
+        print(f"✅ Saved: {args.output}")
+        return
+
+    from src.data.readers import read_raw
+    with perf.step("read") as st:
+        df = read_raw(args.input)
+        st.rows = len(df)
+    perf.note_read(args.input)
+    df = derive(df)
 
     # Report
     tot = len(df)
     t_nonnull = int(df["TedaviSuresi_num"].notna().sum())
     u_nonnull = int(df["UygulamaSuresi_min"].notna().sum())
-    print("=== Derived numeric columns ===")
-    print(f"TedaviSuresi_num non-null: {t_nonnull}/{tot}")
-    print(f"UygulamaSuresi_min non-null: {u_nonnull}/{tot}")
+    report(tot, t_nonnull, u_nonnull)
 
-    OUT_PARQUET.parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(OUT_PARQUET, index=False)
-    print(f"✅ Saved: {OUT_PARQUET}")
+    import pyarrow.parquet as pq
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with perf.step("write", rows=tot):
+        pq.write_table(interim_table(df), args.output)
+    perf.note_written(args.output)
+    perf.set_rows(rows_in=tot, rows_out=tot)
+    print(f"✅ Saved: {args.output}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
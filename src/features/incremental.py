@@ -0,0 +1,144 @@
+"""
+Out-of-core fitting of the preprocessing ColumnTransformer.
+
+The in-memory path (`ct.fit_transform(X)`) needs the whole de-duplicated
+frame at once. Here the fitted state is accumulated over chunks instead:
+
+- median imputer  : streaming quantile sketch per numeric column
+- most_frequent   : exact value counts per categorical column
+- OneHotEncoder   : categories = distinct values seen (None cells included,
+                    as SimpleImputer only imputes NaN)
+- category caps  : OneHotEncoder infrequent categories from the same value
+                    counts (NaN counted as the imputed mode, as in memory)
+- MultiLabel      : token counts (and capped vocabulary) via
+                    MultiLabelBinarizerDF.partial_fit
+- Hashing         : stateless (HashingMultiLabelDF), nothing to accumulate
+- StandardScaler  : StandardScaler.partial_fit on median-imputed chunks
+                    (second pass, once the medians are known)
+
+The result is an ordinary fitted ColumnTransformer, interchangeable with the
+one `preprocess.main` pickles to models/preprocess_pipeline.joblib.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.preprocessing import OneHotEncoder
+
+from src.data.dedup import Deduplicator, dedup_chunks
+from src.features.sketches import QuantileSketch, ValueCounter
+
+ChunkSource = Callable[[], Iterable[pd.DataFrame]]
+
+
+def keep_first_by_id(chunks: Iterable[pd.DataFrame], id_col: str = "HastaNo") -> Iterator[pd.DataFrame]:
+    """
+    Streaming version of `drop_duplicates()` + `drop_duplicates(subset=id_col, keep="first")`.
+    The first row of an id always survives the full-row pass, so keeping the
+    first row per id (missing ids count as one id) gives the same rows.
+    Use src.data.dedup.Deduplicator directly for the dropped-row counts.
+    """
+    return dedup_chunks(chunks, Deduplicator(id_col=id_col, rows="off"))
+
+
+def _set_infrequent(ohe, counts, n_rows):
+    """Capped OneHotEncoder state (infrequent categories) from per-column value counts."""
+    ohe._check_infrequent_enabled()
+    if ohe._infrequent_enabled:
+        # same call as OneHotEncoder._fit, with the accumulated counts
+        ohe._fit_infrequent_category_mapping(
+            n_rows, [np.array([c.get(v, 0) for v in cats], dtype=np.int64)
+                     for cats, c in zip(ohe.categories_, counts)], {})
+    ohe._n_features_outs = ohe._compute_n_features_outs()
+
+
+def fit_out_of_core(make_chunks: ChunkSource, num_cols, cat_cols, mlb_cols, build_ct, hash_cols=()):
+    """
+    Fit `build_ct()` from chunks without holding the dataset in memory.
+
+    `make_chunks()` must return a fresh iterable of (already de-duplicated)
+    DataFrames each time it is called; it is consumed twice.
+    """
+    ct = build_ct()
+    branches = {name: trans for name, trans, _ in ct.transformers}
+    sketches = {c: QuantileSketch() for c in num_cols}
+    # None cells are categories for SimpleImputer/OneHotEncoder; only NaN is imputed
+    counters = {c: ValueCounter(none_is_missing=False) for c in cat_cols}
+    mlb = clone(branches["mlb"])
+    mlb.token_counts_ = {}
+
+    # Pass 1: medians, modes/categories, multi-label vocabulary
+    n_rows = 0
+    for chunk in make_chunks():
+        n_rows += len(chunk)
+        for c in num_cols:
+            sketches[c].update(pd.to_numeric(chunk[c], errors="coerce").to_numpy(dtype="float64", na_value=np.nan))
+        for c in cat_cols:
+            counters[c].update(chunk[c])
+        mlb.partial_fit(chunk[mlb_cols])
+    if n_rows == 0:
+        raise ValueError("No rows to fit on.")
+
+    # Category caps see imputed values: NaN cells count towards the mode
+    modes = {c: counters[c].mode() for c in cat_cols}
+    cat_counts = []
+    for c in cat_cols:
+        counts = Counter(counters[c].counts)
+        if counters[c].n_missing and counters[c].counts:
+            counts[modes[c]] += counters[c].n_missing
+        cat_counts.append(counts)
+    ohe_step = next(n for n, s in branches["cat"].steps if isinstance(s, OneHotEncoder))
+    cats = {c: list(counters[c].counts) for c in cat_cols}
+
+    # Small frame whose ordinary fit reproduces the accumulated state:
+    # numeric = median (constant), categorical = every category once,
+    # multi-label = every (kept) vocabulary token once (tokens are already
+    # normalized). Caps are lifted for this fit, since every value occurs
+    # about once here, and the real counts are put back afterwards.
+    width = max([1] + [len(v) for v in cats.values()] + [len(v) for v in mlb.vocab_.values()])
+    summary = {}
+    for c in num_cols:
+        summary[c] = np.full(width, sketches[c].median(), dtype="float64")
+    for c in cat_cols:
+        values = np.resize(np.array(cats[c], dtype=object), width) if cats[c] else [np.nan] * width
+        summary[c] = pd.Series(values, dtype=object)  # keep None as None (no string inference)
+    for c in mlb_cols:
+        vocab = mlb.vocab_.get(c, [])
+        summary[c] = list(vocab) + [None] * (width - len(vocab))
+    for c in hash_cols:
+        summary[c] = [None] * width
+    uncapped = {"mlb__min_df": 1, "mlb__max_features": None,
+                f"cat__{ohe_step}__min_frequency": None, f"cat__{ohe_step}__max_categories": None}
+    capped = {k: v for k, v in ct.get_params().items() if k in uncapped}
+    ct.set_params(**uncapped)
+    ct.fit(pd.DataFrame(summary)[list(num_cols) + list(cat_cols) + list(mlb_cols) + list(hash_cols)])
+    ct.set_params(**capped)
+
+    # Real modes for the categorical imputer
+    cat_pipe = ct.named_transformers_["cat"]
+    cat_imputer = cat_pipe.named_steps["imputer"]
+    cat_imputer.statistics_ = np.array([modes[c] for c in cat_cols], dtype=object)
+    # Real counts (and caps) for the encoder and the multi-label branch
+    caps = branches["cat"].named_steps[ohe_step].get_params()
+    ohe = cat_pipe.named_steps[ohe_step].set_params(min_frequency=caps["min_frequency"],
+                                                     max_categories=caps["max_categories"])
+    _set_infrequent(ohe, cat_counts, n_rows)
+    ct.transformers_ = [(name, mlb if name == "mlb" else trans, cols)
+                        for name, trans, cols in ct.transformers_]
+
+    # Pass 2: scaler statistics on median-imputed values
+    num_pipe = ct.named_transformers_["num"]
+    imputer = num_pipe.named_steps["imputer"]
+    scaler = num_pipe.named_steps["scaler"].__class__(**num_pipe.named_steps["scaler"].get_params())
+    for chunk in make_chunks():
+        if len(chunk):
+            scaler.partial_fit(imputer.transform(chunk[list(num_cols)]))
+    fitted = num_pipe.named_steps["scaler"]
+    for attr in ("mean_", "var_", "scale_", "n_samples_seen_"):
+        setattr(fitted, attr, getattr(scaler, attr))
+
+    return ct, n_rows
@@ -0,0 +1,258 @@
+"""
+Concurrent ingestion of many raw exports (e.g. one workbook per clinic and
+month), used by derive_numeric when --input is a directory or a glob:
+
+    python -m src.features.derive_numeric --input "data/raw/clinics/*.xlsx" --jobs 0
+
+- each file is read and derived in its own worker process (openpyxl
+  parsing is CPU-bound, so processes, not threads), streamed in row blocks
+  into one partition of a Hive-style dataset:
+      data/interim/01_numeric_dataset/source=<file stem>/month=<YYYY-MM>/part-0.parquet
+  (month from a YYYY-MM / YYYYMM in the file name, else __HIVE_DEFAULT_PARTITION__)
+- each partition must have the columns of the schema contract
+  (docs/schema_contract.json) plus the derived ones; without a contract, the
+  column set most partitions share. A file that fails or does not match is
+  reported and changes nothing: a new file leaves no partition, a re-ingested
+  one keeps its previous partition (the new one is written to a temporary
+  file and only renamed into place once it is accepted)
+- files unchanged since they were ingested (size and mtime recorded in the
+  dataset's _manifest.json) are not parsed again; --force re-ingests them
+- every partition of the dataset, including those of earlier runs, is
+  concatenated in partition order (source, then month) into
+  data/interim/01_numeric.parquet for the downstream stages; deleting a
+  partition directory removes that file's rows on the next run
+
+`pyarrow.dataset.dataset(DATASET_DIR, partitioning="hive")` reads the
+dataset with `source` and `month` as columns.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from src import perf
+from src.data.profiler import CONTRACT, load_contract
+from src.data.readers import DEFAULT_CHUNKSIZE
+from src.features.derive_numeric import (DATASET_DIR, DERIVED_COLS, OUT_PARQUET, _arrow_schema,
+                                         report, write_derived)
+
+PART_FILE = "part-0.parquet"
+NEW_FILE = "." + PART_FILE + ".tmp"  # "." prefix: skipped by pyarrow dataset discovery
+MANIFEST = "_manifest.json"  # "_" prefix: skipped by pyarrow dataset discovery
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+_MONTH = re.compile(r"(?<!\d)(20\d{2})[-_.]?(0[1-9]|1[0-2])(?!\d)")
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def file_month(path) -> str:
+    """YYYY-MM taken from the file name (last match), or the Hive null partition."""
+    found = _MONTH.findall(Path(path).stem)
+    return f"{found[-1][0]}-{found[-1][1]}" if found else NULL_PARTITION
+
+
+def partition_of(path) -> str:
+    """Partition directory of a raw file, relative to the dataset root."""
+    source = _UNSAFE.sub("_", Path(path).stem).strip("_") or "_"
+    return f"source={source}/month={file_month(path)}"
+
+
+def _load_manifest(dataset_dir: Path) -> dict:
+    p = dataset_dir / MANIFEST
+    manifest = json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+    # a partition deleted by hand is forgotten (its file is ingested again)
+    return {part: e for part, e in manifest.items() if (dataset_dir / part / PART_FILE).exists()}
+
+
+def _save_manifest(dataset_dir: Path, manifest: dict) -> None:
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    tmp = dataset_dir / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(dataset_dir / MANIFEST)
+
+
+def expected_columns(contract: Path = CONTRACT):
+    """Columns every partition must have: the contract's plus the derived ones (None without a contract)."""
+    contract = Path(contract)
+    if not contract.exists():
+        return None
+    names = [c["name"] for c in load_contract(contract)["columns"]]
+    return names + [c for c in DERIVED_COLS if c not in names]
+
+
+def _ingest_file(path: Path, part_file: Path, chunksize: int) -> dict:
+    """Worker: raw file -> derived partition file (NEW_FILE, renamed by the caller once accepted)."""
+    import pyarrow.parquet as pq
+    from src.data.readers import iter_raw_chunks
+
+    t0 = time.perf_counter()
+    rows, t_nonnull, u_nonnull = write_derived(iter_raw_chunks(path, chunksize), part_file)
+    if not rows:
+        raise ValueError("no rows read")
+    return {"rows": rows, "t_nonnull": t_nonnull, "u_nonnull": u_nonnull,
+            "columns": pq.read_schema(part_file).names, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def _run(todo, dataset_dir: Path, n_jobs: int, chunksize: int):
+    """Yield (path, part, result or exception) as files finish."""
+    if n_jobs <= 1:
+        for path, part in todo:
+            try:
+                yield path, part, _ingest_file(path, dataset_dir / part / NEW_FILE, chunksize)
+            except Exception as e:  # one bad file must not stop the others
+                yield path, part, e
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = {pool.submit(_ingest_file, path, dataset_dir / part / NEW_FILE, chunksize): (path, part)
+                   for path, part in todo}
+        for fut in as_completed(futures):
+            path, part = futures[fut]
+            try:
+                yield path, part, fut.result()
+            except Exception as e:
+                yield path, part, e
+
+
+def _drop(dataset_dir: Path, manifest: dict, part: str) -> None:
+    manifest.pop(part, None)
+    shutil.rmtree(dataset_dir / part, ignore_errors=True)
+    source_dir = (dataset_dir / part).parent
+    if source_dir.is_dir() and not any(source_dir.iterdir()):
+        source_dir.rmdir()
+
+
+def _discard(dataset_dir: Path, manifest: dict, part: str) -> None:
+    """Remove a rejected new file; the partition's previous file, if any, stays."""
+    (dataset_dir / part / NEW_FILE).unlink(missing_ok=True)
+    if part not in manifest:
+        _drop(dataset_dir, manifest, part)
+
+
+def _majority(column_sets) -> list:
+    """The most common column set (ties: the first seen)."""
+    counts = {}
+    for cols in column_sets:
+        counts.setdefault(frozenset(cols), [0, cols])[0] += 1
+    return max(counts.values(), key=lambda c: c[0])[1] if counts else []
+
+
+def _column_diff(columns, expected) -> str:
+    missing, extra = sorted(set(expected) - set(columns)), sorted(set(columns) - set(expected))
+    return "columns differ from the expected schema" + (f"; missing {missing}" if missing else "") \
+        + (f"; unexpected {extra}" if extra else "")
+
+
+def _prune(dataset_dir: Path, manifest: dict) -> None:
+    """Remove what an interrupted run left: unlisted partition directories and unrenamed new files."""
+    for part_dir in dataset_dir.glob("source=*/month=*"):
+        part = part_dir.relative_to(dataset_dir).as_posix()
+        if part not in manifest:
+            _drop(dataset_dir, manifest, part)
+        else:
+            (part_dir / NEW_FILE).unlink(missing_ok=True)
+
+
+def combine(dataset_dir: Path, manifest: dict, columns: list, out_path: Path) -> int:
+    """Concatenate the partitions (sorted) into one parquet file with `columns`."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(columns)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    rows = 0
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for part in sorted(manifest):
+            for batch in pq.ParquetFile(dataset_dir / part / PART_FILE).iter_batches():
+                writer.write_table(pa.Table.from_batches([batch]).select(columns).cast(schema))
+                rows += batch.num_rows
+    tmp_path.replace(out_path)
+    return rows
+
+
+def ingest(files, dataset_dir: Path = DATASET_DIR, out_path: Path = OUT_PARQUET, n_jobs: int = 0,
+           chunksize: int = DEFAULT_CHUNKSIZE, force: bool = False, contract: Path = CONTRACT) -> dict:
+    """
+    Ingest `files` into the partitioned dataset and rebuild `out_path`.
+    Returns {file: error message} for the files that failed.
+    """
+    dataset_dir, out_path = Path(dataset_dir), Path(out_path)
+    expected = expected_columns(contract)
+    manifest = _load_manifest(dataset_dir)
+    failed, claimed, stamps, todo = {}, {}, {}, []
+    for path in map(Path, files):
+        part, st = partition_of(path), path.stat()
+        source = str(path.resolve())
+        entry = manifest.get(part)
+        if part in claimed:
+            failed[str(path)] = f"same partition {part} as {claimed[part]}"
+        elif entry is not None and entry["source"] != source:
+            failed[str(path)] = f"partition {part} already holds {entry['source']}"
+        elif not force and entry is not None and (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            claimed[part] = path  # unchanged since its last ingestion
+        else:
+            claimed[part] = path
+            stamps[part] = {"source": source, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            todo.append((path, part))
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(todo), 1))
+    print(f"Ingesting {len(todo)} of {len(files)} files on {n_jobs} process(es) "
+          f"({len(claimed) - len(todo)} unchanged) -> {dataset_dir}")
+    done = {}
+    with perf.step("ingest") as st:
+        for i, (path, part, result) in enumerate(_run(todo, dataset_dir, n_jobs, chunksize), 1):
+            if isinstance(result, Exception):
+                failed[str(path)] = f"{type(result).__name__}: {result}"
+                _discard(dataset_dir, manifest, part)
+                print(f"  [{i}/{len(todo)}] ✗ {path.name}: {failed[str(path)]}")
+                continue
+            print(f"  [{i}/{len(todo)}] {path.name}: {result['rows']} rows in {result['seconds']}s -> {part}")
+            result.pop("seconds")
+            done[part] = (path, result)
+
+        # each partition is checked against the expected columns (any order), so
+        # a bad file never costs a good partition its place
+        columns = expected or _majority([e["columns"] for p, e in sorted(manifest.items()) if p not in done]
+                                        + [r["columns"] for _, r in done.values()])
+        for part, (path, result) in done.items():
+            if set(result["columns"]) != set(columns):
+                failed[str(path)] = _column_diff(result["columns"], columns)
+                print(f"  ✗ {path.name}: {failed[str(path)]}")
+                _discard(dataset_dir, manifest, part)
+                continue
+            (dataset_dir / part / NEW_FILE).replace(dataset_dir / part / PART_FILE)
+            manifest[part] = {**stamps[part], **result}
+        st.rows = sum(manifest[p]["rows"] for p in done if p in manifest)
+
+    _prune(dataset_dir, manifest)
+    _save_manifest(dataset_dir, manifest)
+    for path in files:
+        perf.note_read(path)
+
+    # a partition kept from a run with another schema stays on disk but is left out
+    parts = {}
+    for part, entry in sorted(manifest.items()):
+        if set(entry["columns"]) == set(columns):
+            parts[part] = entry
+        else:
+            failed[entry["source"]] = _column_diff(entry["columns"], columns) + " (partition kept, not combined)"
+            print(f"  ✗ {part}: {failed[entry['source']]}")
+    if not parts:
+        print("No partitions to combine.")
+        return failed
+    with perf.step("combine") as st:
+        st.rows = combine(dataset_dir, parts, columns, out_path)
+    perf.note_written(out_path)
+    perf.set_rows(rows_in=st.rows, rows_out=st.rows)
+    report(st.rows, sum(e["t_nonnull"] for e in parts.values()),
+           sum(e["u_nonnull"] for e in parts.values()))
+    if failed:
+        print(f"⚠️ {len(failed)} file(s) failed:")
+        for path, err in failed.items():
+            print(f"  {path}: {err}")
+    return failed
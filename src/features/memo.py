@@ -0,0 +1,102 @@
+"""
+Factorize-then-map memoization for per-cell text parsing and tokenization.
+
+Raw text columns (TedaviSuresi, UygulamaSuresi, multi-label cells) hold few
+distinct values repeated across many rows. `map_unique` factorizes a column,
+runs the parser/tokenizer once per distinct value and broadcasts the results
+back through the integer codes, so work scales with cardinality, not rows.
+
+Per-value functions are memoized with `memoize` (a named, bounded
+functools.lru_cache that lives for the whole process), so later chunks of
+the same run reuse earlier work. Cached results are shared between callers:
+memoized functions return immutable values (str, numbers, tuples).
+"""
+from __future__ import annotations
+
+import functools
+from typing import Any, Callable
+
+import numpy as np
+
+DEFAULT_MAXSIZE = 100_000
+
+_CACHES: dict[str, Callable] = {}  # name -> lru_cache-wrapped function
+
+
+def clear_caches() -> None:
+    for cached in _CACHES.values():
+        cached.cache_clear()
+
+
+def memoize(name: str, maxsize: int = DEFAULT_MAXSIZE):
+    """
+    Decorator: memoize a one-argument function in a functools.lru_cache
+    registered under `name`. typed=True keeps 12, 12.0 and "12" apart;
+    unhashable arguments are computed without caching.
+    """
+    def deco(func: Callable[[Any], Any]):
+        cached = _CACHES[name] = functools.lru_cache(maxsize=maxsize, typed=True)(func)
+
+        @functools.wraps(func)
+        def wrapper(arg):
+            try:
+                hash(arg)
+            except TypeError:
+                return func(arg)
+            return cached(arg)
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+    return deco
+
+
+def factorize_map(
+    values: pd.Series,
+    func: Callable,
+    *,
+    batch: bool = False,
+) -> tuple[np.ndarray, list]:
+    """
+    Factorize `values` and evaluate `func` once per distinct value.
+
+    Returns (codes, results): `results[codes[i]]` is the result for row i.
+    The last entry of `results` is the shared result for missing cells
+    (NaN/None -> `func(None)`), and missing rows point at it.
+    - batch=False: `func(value)` is called per distinct value.
+    - batch=True : `func(Series_of_distinct_values)` returns a same-length array.
+    Pass a `memoize`d `func` to reuse results across calls.
+    """
+    import pandas as pd  # the memoized tokenizers are also used pandas-free (src.serving.compiled)
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    codes = np.where(codes < 0, len(uniques), codes)
+    args = list(uniques) + [None]
+    if batch:
+        results = list(func(pd.Series(args, dtype=object)))
+    else:
+        results = [func(a) for a in args]
+    return codes, results
+
+
+def map_unique(
+    values: pd.Series,
+    func: Callable,
+    *,
+    batch: bool = False,
+    dtype=object,
+) -> pd.Series:
+    """
+    Apply `func` once per distinct value of `values` and broadcast back
+    (see `factorize_map`). Returns a Series aligned with `values.index`.
+    """
+    import pandas as pd
+
+    codes, results = factorize_map(values, func, batch=batch)
+    if np.dtype(dtype) == object:
+        table = np.empty(len(results), dtype=object)
+        for i, value in enumerate(results):
+            table[i] = value
+    else:
+        table = np.array([np.nan if v is None else v for v in results], dtype=dtype)
+    return pd.Series(table[codes], index=values.index, name=values.name)
@@ -1,72 +1,170 @@
 from sklearn.base import BaseEstimator, TransformerMixin
 import numpy as np
 import pandas as pd
-import re, unicodedata
+from functools import partial
 from scipy.sparse import csr_matrix
 
-def _norm_token(s):
-    if s is None: return None
-    t = str(s).strip().lower()
-    # Türkçe karakterleri sadeleştir + punctuation temizle
-    t = (t.replace("ı","i").replace("İ","i")
-           .replace("ş","s").replace("ğ","g")
-           .replace("ç","c").replace("ö","o").replace("ü","u"))
-    t = unicodedata.normalize("NFKD", t)
-    t = "".join(ch for ch in t if not unicodedata.combining(ch))
-    t = re.sub(r"[^a-z0-9]+", "_", t)
-    t = re.sub(r"_+", "_", t).strip("_")
-    return t or None
-
-def _split_cell(x):
-    if pd.isna(x): return []
-    parts = re.split(r"[;,/|]+", str(x))
-    return [p.strip() for p in parts if p.strip()]
+from src import perf
+from src.features.memo import factorize_map
+from src.features.tokens import _cell_buckets, _cell_tokens, _norm_token, _split_cell, _token_hash  # noqa: F401
+from src.features.vocab import OTHER, cap_vocabulary
+
+def _cell_indices(lookup, other, x):
+    # hücredeki bilinen token'ların sıralı, tekil sütun indeksleri;
+    # sözlük dışı token'lar (other varsa) __other__ sütununa düşer
+    idx = {lookup.get(t, other) for t in _cell_tokens(x)}
+    idx.discard(None)
+    return np.array(sorted(idx), dtype=np.int32)
 
 class MultiLabelBinarizerDF(BaseEstimator, TransformerMixin):
-    def __init__(self, columns):
+    def __init__(self, columns, min_df=1, max_features=None, other_bucket=False):
         # clone() uyumu: __init__ içinde parametreyi **hiç değiştirme**
+        # min_df: token en az kaç satırda görülmeli; max_features: sütun başına
+        # en fazla token; other_bucket: kalanlar için sütun başına __other__ (src.features.vocab)
         self.columns = columns
+        self.min_df = min_df
+        self.max_features = max_features
+        self.other_bucket = other_bucket
 
     def fit(self, X, y=None):
+        self.token_counts_ = {}
+        return self.partial_fit(X)
+
+    @perf.timed("mlb.fit")
+    def partial_fit(self, X, y=None):
+        """Token sayımlarını parça parça biriktir (out-of-core fit); fit() = sıfırla + partial_fit."""
         data = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X, columns=self.columns)
+        counts = getattr(self, "token_counts_", None)
+        if counts is None:  # eski pickle: yalnızca vocab_ var, her token bir kez sayılır
+            counts = {col: dict.fromkeys(getattr(self, "vocab_", {}).get(col, []), 1) for col in self.columns}
+        counts = {col: dict(counts.get(col, {})) for col in self.columns}
+        with perf.step("mlb.tokenize", rows=len(data)):
+            for col in self.columns:
+                # satır başına değil, farklı hücre değeri başına tokenize et;
+                # token sayısı = token'ı içeren satır sayısı
+                acc = counts[col]
+                for cell, n in data[col].value_counts(sort=False).items():
+                    if n:
+                        for t in set(_cell_tokens(cell)):
+                            acc[t] = acc.get(t, 0) + int(n)
+        self.token_counts_ = counts
+        self._build_vocab(counts)
+        return self
+
+    def _build_vocab(self, counts):
         self.vocab_ = {}
         self._order_ = []
+        self._index_ = {}
+        self._other_ = {}
         self.feature_names_ = []
         seen = set()  # tüm feature adlarında global tekillik
 
         for col in self.columns:
-            toks_series = data[col].apply(_split_cell)
-            norm_series = toks_series.apply(lambda lst: [_norm_token(t) for t in lst])
-            vocab = sorted({t for lst in norm_series for t in lst if t})
+            vocab = sorted(cap_vocabulary(counts[col], self.min_df, self.max_features))
             self.vocab_[col] = vocab
+            lookup = {}
             for tok in vocab:
                 name = f"mlb__{col}__{tok}"
                 if name in seen:
                     continue
                 seen.add(name)
+                lookup[tok] = len(self._order_)
                 self._order_.append((col, tok))
                 self.feature_names_.append(name)
-        return self
+            self._index_[col] = lookup
+            if self.other_bucket:
+                self._other_[col] = len(self._order_)
+                self._order_.append((col, OTHER))
+                self.feature_names_.append(f"mlb__{col}__{OTHER}")
 
+    def _column_index(self):
+        # Eski pickle'larda _index_ yok: _order_'dan yeniden kur
+        index = getattr(self, "_index_", None)
+        if index is None:
+            index = {col: {} for col in self.columns}
+            for j, (col, tok) in enumerate(self._order_):
+                index[col][tok] = j
+        return index
+
+    @perf.timed("mlb.transform")
     def transform(self, X):
         data = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X, columns=self.columns)
         n_rows = len(data)
         n_cols = len(self._order_)
-        out = np.zeros((n_rows, n_cols), dtype=np.int8)
+        index = self._column_index()
+        others = getattr(self, "_other_", {})
 
-        tokenized = {}
+        # Her sütun bloğu: farklı hücre başına indeks dizisi, factorize kodlarıyla
+        # satırlara yayılır; CSR doğrudan kurulur (yoğun matris yok).
+        # Sütun blokları _order_ içinde ayrık olduğundan toplamları birleşimdir.
+        out = csr_matrix((n_rows, n_cols), dtype=np.int8)
         for col in self.columns:
-            toks_series = data[col].apply(_split_cell)
-            tokenized[col] = toks_series.apply(
-                lambda lst: { _norm_token(t) for t in lst if _norm_token(t) }
-            )
-
-        for j, (col, tok) in enumerate(self._order_):
-            col_sets = tokenized[col]
-            for i, toks in enumerate(col_sets):
-                if tok in toks:
-                    out[i, j] = 1
-        return csr_matrix(out)
+            lookup = index.get(col, {})
+            other = others.get(col)
+            if not lookup and other is None:
+                continue
+            codes, cells = factorize_map(data[col], partial(_cell_indices, lookup, other))
+            # farklı hücrelerin indekslerini düz diziye koy, satırlara vektörel topla
+            cell_lens = np.array([len(c) for c in cells], dtype=np.int64)
+            cell_starts = np.concatenate([[0], np.cumsum(cell_lens)[:-1]])
+            flat = np.concatenate(cells)
+            lens = cell_lens[codes]
+            indptr = np.zeros(n_rows + 1, dtype=np.int64)
+            np.cumsum(lens, out=indptr[1:])
+            offsets = np.arange(indptr[-1], dtype=np.int64) - np.repeat(indptr[:-1], lens)
+            indices = flat[np.repeat(cell_starts[codes], lens) + offsets]
+            values = np.ones(len(indices), dtype=np.int8)
+            out = out + csr_matrix((values, indices, indptr), shape=(n_rows, n_cols))
+        return out
 
     def get_feature_names_out(self, input_features=None):
         return np.array(self.feature_names_, dtype=object)
+
+
+class HashingMultiLabelDF(BaseEstimator, TransformerMixin):
+    """
+    Sözlüksüz multi-label dal: token'lar (MultiLabelBinarizerDF ile aynı split +
+    normalizasyon) `n_features` işaretli kovaya hash'lenir, çıktı CSR.
+    Durum tutmaz: fit() hiçbir şey öğrenmez, yeni token'lar refit gerektirmez.
+    """
+    def __init__(self, columns, n_features=128, alternate_sign=True):
+        # clone() uyumu: parametreler olduğu gibi saklanır
+        self.columns = columns
+        self.n_features = n_features
+        self.alternate_sign = alternate_sign
+
+    def fit(self, X, y=None):
+        if self.n_features < 1:
+            raise ValueError(f"n_features must be >= 1, got {self.n_features}")
+        return self
+
+    def partial_fit(self, X, y=None):
+        return self.fit(X)
+
+    @perf.timed("hashmlb.transform")
+    def transform(self, X):
+        data = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X, columns=self.columns)
+        n_rows = len(data)
+        out = csr_matrix((n_rows, self.n_features), dtype=np.float64)
+        for col in self.columns:
+            codes, cells = factorize_map(data[col], partial(_cell_buckets, col, self.n_features,
+                                                            self.alternate_sign))
+            # hücre sonuçları satırlara yayılır (MultiLabelBinarizerDF.transform ile aynı düzen)
+            cell_lens = np.array([len(i) for i, _ in cells], dtype=np.int64)
+            cell_starts = np.concatenate([[0], np.cumsum(cell_lens)[:-1]])
+            flat_idx = np.concatenate([i for i, _ in cells])
+            flat_val = np.concatenate([v for _, v in cells])
+            lens = cell_lens[codes]
+            indptr = np.zeros(n_rows + 1, dtype=np.int64)
+            np.cumsum(lens, out=indptr[1:])
+            pos = np.repeat(cell_starts[codes], lens) + (np.arange(indptr[-1], dtype=np.int64)
+                                                         - np.repeat(indptr[:-1], lens))
+            # sütunlar aynı kovalara düşebilir: toplam = çakışmaların işaretli toplamı
+            out = out + csr_matrix((flat_val[pos], flat_idx[pos], indptr), shape=(n_rows, self.n_features))
+        out.eliminate_zeros()
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        stem = "_".join(self.columns)
+        width = len(str(self.n_features - 1))
+        return np.array([f"hash__{stem}__{j:0{width}d}" for j in range(self.n_features)], dtype=object)
@@ -0,0 +1,145 @@
+"""
+Sharded multi-process transform of a fitted preprocess ColumnTransformer.
+
+`ct.transform(X)` runs on one core and the multi-label tokenization is
+GIL-bound. `transform_sharded` splits the rows into contiguous shards and
+transforms them on a process pool:
+
+- input : the frame is written once to an uncompressed Arrow IPC file that
+          every worker memory-maps (as in src.visualization.eda_report), so
+          shards are zero-copy slices instead of pickled frames
+- dense : each worker writes its rows into one preallocated memmap output,
+          which is returned as is (read-only, file-backed), so the matrix
+          is never copied into process memory
+- sparse: each worker returns its CSR piece; pieces are stacked in shard order
+
+Rows come back in the original order and the result equals
+`ct.transform(prepare(frame))`: every transformer in the pipeline is
+row-wise once fitted, and the dense/sparse choice is fixed at fit time
+(`sparse_output_`). The speed-up on multi-core nodes has not been measured
+yet (results were only checked for equality, on a single-core machine).
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src import perf
+
+SHARDS_PER_JOB = 4  # a few shards per worker evens out slow shards
+
+
+def shard_bounds(n_rows: int, n_shards: int) -> list:
+    """Contiguous [start, stop) row ranges, sizes differing by at most one."""
+    n_shards = max(1, min(n_shards, n_rows))
+    edges = np.linspace(0, n_rows, n_shards + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+# Worker state: fitted transformer, memory-mapped input, output memmap
+_CT = None
+_PREPARE = None
+_TABLE = None
+_OUT = None
+
+
+def _init_worker(ct, prepare, arrow_path, out_path, out_shape, out_dtype):
+    global _CT, _PREPARE, _TABLE, _OUT
+    import pyarrow as pa
+    _CT, _PREPARE = ct, prepare
+    _TABLE = pa.ipc.open_file(pa.memory_map(str(arrow_path), "r")).read_all()
+    if out_path is not None:
+        _OUT = np.memmap(out_path, dtype=out_dtype, mode="r+", shape=out_shape)
+
+
+def _transform_shard(bounds):
+    start, stop = bounds
+    frame = _TABLE.slice(start, stop - start).to_pandas()
+    if _PREPARE is not None:
+        frame = _PREPARE(frame)
+    Xt = _CT.transform(frame)
+    if _OUT is None:
+        return bounds, sparse.csr_matrix(Xt)
+    _OUT[start:stop] = Xt
+    _OUT.flush()
+    return bounds, None
+
+
+def _map_output(path, dtype, shape) -> np.memmap:
+    """Read-only map of the finished output; its file goes away with the map."""
+    out = np.memmap(path, dtype=dtype, mode="r", shape=shape)
+    try:
+        os.unlink(path)  # POSIX: the pages stay mapped until the memmap is released
+    except OSError:  # Windows: a mapped file cannot be removed yet
+        weakref.finalize(out, _remove, path)
+    return out
+
+
+def _remove(path) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def transform_sharded(ct, frame: pd.DataFrame, n_jobs: int = 0,
+                      prepare: Optional[Callable] = None, n_shards: Optional[int] = None,
+                      out_dir: Optional[Path] = None):
+    """
+    `ct.transform(prepare(frame))` on `n_jobs` processes (0 = all cores).
+
+    `prepare` (picklable, e.g. a functools.partial of to_model_frame) runs
+    per shard in the worker, so the shared Arrow file can hold the compact
+    typed frame rather than object columns.
+    A dense result is a read-only np.memmap over a temporary file in
+    `out_dir` (default: the system temp dir, which may be RAM-backed).
+    """
+    import pyarrow as pa
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    n_rows = len(frame)
+    bounds = shard_bounds(n_rows, n_shards or n_jobs * SHARDS_PER_JOB)
+    if n_jobs <= 1 or len(bounds) <= 1:
+        return ct.transform(prepare(frame) if prepare is not None else frame)
+
+    sparse_out = bool(getattr(ct, "sparse_output_", False))
+    n_features = len(ct.get_feature_names_out())
+    out_path, dtype = None, None
+    if not sparse_out:
+        # output dtype as ct.transform would produce it (one row, in-process)
+        head = frame.iloc[:1]
+        dtype = np.asarray(ct.transform(prepare(head) if prepare is not None else head)).dtype
+        fd, out_path = tempfile.mkstemp(prefix=".transform-", suffix=".dat", dir=out_dir)
+        os.close(fd)
+        np.memmap(out_path, dtype=dtype, mode="w+", shape=(n_rows, n_features)).flush()  # sized, zero-filled
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            arrow_path = Path(tmp) / "transform_input.arrow"
+            with perf.step("shard_input", rows=n_rows):
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                with pa.OSFile(str(arrow_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+                del table
+
+            pieces = {}
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(bounds)), initializer=_init_worker,
+                                     initargs=(ct, prepare, arrow_path, out_path, (n_rows, n_features),
+                                               dtype)) as pool:
+                for (start, stop), piece in pool.map(_transform_shard, bounds):
+                    pieces[start] = piece
+    except BaseException:
+        if out_path is not None:
+            _remove(out_path)
+        raise
+
+    if sparse_out:
+        return sparse.vstack([pieces[start] for start, _ in bounds], format="csr")
+    return _map_output(out_path, dtype, (n_rows, n_features))
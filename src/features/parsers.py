@@ -1,8 +1,26 @@
 import re
 from typing import Optional
 
-_NUM_RE = re.compile(r"(\d+(?:[.,]\d+)?)")
-_RANGE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*[-–]\s*(\d+(?:[.,]\d+)?)", re.UNICODE)
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.features.memo import map_unique
+
+_NUM = r"\d+(?:[.,]\d+)?"
+_NUM_RE = re.compile(rf"({_NUM})")
+_RANGE_RE = re.compile(rf"({_NUM})\s*[-–]\s*({_NUM})", re.UNICODE)
+
+# Duration unit markers, checked in priority order (first match wins).
+_DURATION_UNITS = [
+    ("hour", ["saat", " hour", " hours", " hrs", " hr", " h "]),
+    ("min", ["dk", "dakika", " min", "mins", "minute"]),
+    ("sec", ["sn", "saniye", " sec", "second"]),
+    ("day", ["gün", " day"]),
+]
+# Minutes per unit; text without a known unit is treated as minutes.
+_MINUTES_PER_UNIT = {"hour": 60.0, "min": 1.0, "sec": 1.0 / 60.0, "day": 24.0 * 60.0}
 
 def _to_float(num_str: str) -> Optional[float]:
     if num_str is None:
@@ -64,19 +82,14 @@ def parse_duration_minutes(value: str) -> Optional[float]:
     n = extract_number_or_range(s)
     if n is None:
         return None
+    return n * _MINUTES_PER_UNIT[_duration_unit(s)]
 
-    # unit detection
-    if any(u in s for u in ["saat", " hour", " hours", " hrs", " hr", " h "]):
-        return n * 60.0
-    if any(u in s for u in ["dk", "dakika", " min", "mins", "minute"]):
-        return n
-    if any(u in s for u in ["sn", "saniye", " sec", "second"]):
-        return n / 60.0
-    if any(u in s for u in ["gün", " day"]):
-        return n * 24.0 * 60.0
-
-    # default: treat as minutes
-    return n
+def _duration_unit(s: str) -> str:
+    """Return the unit key of a lowercased duration string (default: 'min')."""
+    for unit, markers in _DURATION_UNITS:
+        if any(u in s for u in markers):
+            return unit
+    return "min"
 
 def to_int_safe(x: Optional[float]) -> Optional[int]:
     """Cast float to int when close to integer; otherwise round sensibly."""
@@ -88,3 +101,112 @@ def to_int_safe(x: Optional[float]) -> Optional[int]:
         return int(round(x))
     except Exception:
         return None
+
+
+# -------- Vectorized (Series-in / Series-out) versions --------
+# The kernels below run pyarrow compute (RE2 regexes, substring matching) on
+# the dictionary of distinct values only and broadcast the result back with
+# `take`, so a low-cardinality column costs one hash pass plus a handful of
+# regex evaluations.
+# RE2 and Arrow's string kernels agree with Python's re/str only on ASCII
+# text: Python's \d and \s also match Unicode digits and spaces, and
+# "İ".lower() or str.strip() differ from utf8_lower/utf8_trim. So the kernels
+# see ASCII patterns, and distinct values with any non-ASCII character go
+# through the scalar parser instead.
+_ASCII_WS = " \t\n\r\f\v\x1c\x1d\x1e\x1f"  # what \s and str.strip() match in ASCII
+_ASCII_NUM = r"[0-9]+(?:[.,][0-9]+)?"
+_ASCII_SEP = r"[\t-\r\x1c-\x1f ]*-[\t-\r\x1c-\x1f ]*"  # "–" is not ASCII
+# named groups, as pyarrow's extract_regex requires
+_NUM_PAT = rf"(?P<n>{_ASCII_NUM})"
+_RANGE_PAT = rf"(?P<a>{_ASCII_NUM}){_ASCII_SEP}(?P<b>{_ASCII_NUM})"
+
+def _as_text(values: pd.Series) -> pa.Array:
+    """Arrow string array of `values` (non-strings via str(), missing -> null)."""
+    try:
+        arr = pa.array(values, from_pandas=True)
+    except (pa.ArrowException, TypeError):  # mixed str/number cells
+        arr = None
+    if arr is None or not (pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type)):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        codes = pa.array(codes, mask=codes < 0)
+        arr = pc.take(pa.array([str(u) for u in uniques], type=pa.string()), codes)
+    return arr.combine_chunks() if isinstance(arr, pa.ChunkedArray) else arr
+
+def _on_distinct(values: pd.Series, kernel, scalar) -> pd.Series:
+    """
+    float64 Series of `kernel` (Arrow strings -> Arrow doubles) evaluated per
+    distinct value; non-ASCII values use `scalar` (str -> float or None).
+    """
+    enc = pc.dictionary_encode(_as_text(values))
+    uniques = enc.dictionary
+    table = kernel(uniques).to_numpy(zero_copy_only=False).astype("float64")
+    for i in np.flatnonzero(~pc.string_is_ascii(uniques).to_numpy(zero_copy_only=False)):
+        v = scalar(uniques[i].as_py())
+        table[i] = np.nan if v is None else v
+    table = np.append(table, np.nan)  # missing cells
+    codes = pc.fill_null(enc.indices, len(uniques)).to_numpy(zero_copy_only=False)
+    return pd.Series(table[codes], index=values.index, dtype="float64")
+
+def _to_float_arrow(num_str: pa.Array) -> pa.Array:
+    return pc.cast(pc.replace_substring(num_str, ",", "."), pa.float64())
+
+def _number_or_range(s: pa.Array) -> pa.Array:
+    rng = pc.extract_regex(s, _RANGE_PAT)
+    mid = pc.divide(pc.add(_to_float_arrow(pc.struct_field(rng, "a")),
+                           _to_float_arrow(pc.struct_field(rng, "b"))), 2.0)
+    single = _to_float_arrow(pc.struct_field(pc.extract_regex(s, _NUM_PAT), "n"))
+    return pc.if_else(pc.is_valid(mid), mid, single)
+
+_UNIT_KEYS = ["min"] + [unit for unit, _ in _DURATION_UNITS]  # 0: no known unit
+
+def _unit_index(s: pa.Array) -> pa.Array:
+    """Index into _UNIT_KEYS of lowercased text; the first unit in priority order wins."""
+    idx = pa.array(np.zeros(len(s), dtype=np.int8))
+    for i, (_, markers) in reversed(list(enumerate(_DURATION_UNITS, 1))):
+        hit = pc.match_substring_regex(s, "|".join(re.escape(u) for u in markers))
+        idx = pc.if_else(pc.fill_null(hit, False), pa.scalar(i, pa.int8()), idx)
+    return idx
+
+def _lower_arrow(s: pa.Array) -> pa.Array:
+    return pc.ascii_trim(pc.ascii_lower(s), _ASCII_WS)
+
+def _duration_minutes(s: pa.Array) -> pa.Array:
+    s = _lower_arrow(s)
+    factor = pc.take(pa.array([_MINUTES_PER_UNIT[k] for k in _UNIT_KEYS]), _unit_index(s))
+    return pc.multiply(_number_or_range(s), factor)
+
+def extract_number_or_range_series(values: pd.Series) -> pd.Series:
+    """Vectorized `extract_number_or_range`: float Series, NaN where no number is found."""
+    return _on_distinct(values, _number_or_range, extract_number_or_range)
+
+def _parse_sessions_vec(values: pd.Series) -> pd.Series:
+    n = extract_number_or_range_series(values)
+    return n.where(n >= 0)
+
+def parse_sessions_series(values: pd.Series) -> pd.Series:
+    """Vectorized `parse_sessions`, evaluated once per distinct value."""
+    return map_unique(values, _parse_sessions_vec, batch=True, dtype="float64")
+
+def duration_unit_series(values: pd.Series) -> pd.Series:
+    """Vectorized `_duration_unit` (lowercasing included): one unit key per row."""
+    idx = _on_distinct(values, lambda s: pc.cast(_unit_index(_lower_arrow(s)), pa.float64()),
+                       lambda v: _UNIT_KEYS.index(_duration_unit(v.lower().strip())))
+    return pd.Series(np.asarray(_UNIT_KEYS, dtype=object)[idx.fillna(0).to_numpy(dtype=int)],
+                     index=values.index)
+
+def _parse_duration_minutes_vec(values: pd.Series) -> pd.Series:
+    return _on_distinct(values, _duration_minutes, parse_duration_minutes)
+
+def parse_duration_minutes_series(values: pd.Series) -> pd.Series:
+    """Vectorized `parse_duration_minutes`, evaluated once per distinct value."""
+    return map_unique(values, _parse_duration_minutes_vec, batch=True, dtype="float64")
+
+def to_int_safe_series(x: pd.Series) -> pd.Series:
+    """
+    Vectorized `to_int_safe` (half-to-even rounding, like `round`).
+    Returns int64, or nullable Int64 when some values are missing.
+    """
+    r = np.round(pd.to_numeric(x, errors="coerce").astype("float64"))
+    if r.isna().any():
+        return r.astype("Int64")
+    return r.astype("int64")
@@ -1,63 +1,92 @@
 # src/features/preprocess.py
 
+import argparse
+from functools import partial
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from joblib import dump
 from scipy import sparse
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.impute import SimpleImputer
 
-# Clone-friendly custom transformer (already implemented in your repo)
-from src.features.multilabel import MultiLabelBinarizerDF
+from src import perf
+from src.features.vocab import is_capped
+from src.data.model_ready import (SPARSE_NPZ, IDS_PARQ, MMAP_X, MMAP_IDS, MMAP_JSON, INDEX_NPZ,
+                                  KNOWN_IDS, ROW_GROUP_ROWS, DTYPE_POLICIES, MmapWriter, SparseWriter,
+                                  clear_parts, dtype_policy, feature_dtypes, feature_frame, mmap_files,
+                                  save_mmap, save_sparse, sparse_dtype, write_index)
+from src.data.typed import read_typed, to_model_frame
+# sklearn, joblib and the stages below are imported where they are used, so
+# `python -m src preprocess --help` does not pay for them
 
 RAW_PARQ = "data/interim/01_numeric.parquet"
 OUT_PARQ = "data/processed/dataset_model_ready.parquet"
 OUT_CSV  = "data/processed/dataset_model_ready.csv"
 PIPELINE = "models/preprocess_pipeline.joblib"
+PIPELINE_JSON = "models/preprocess_pipeline.json"  # same fitted state, numpy-only load (src.serving.compiled)
 FEATURES = "reports/feature_names.txt"
 
+# Column groups
+ID_COL = "HastaNo"
+TARGET = "TedaviSuresi_num"
+NUM_COLS = ["Yas", "UygulamaSuresi_min"]
+CAT_COLS = ["Cinsiyet", "KanGrubu", "Uyruk", "Bolum", "TedaviAdi"]
+MLB_COLS = ["KronikHastalik", "Alerji", "UygulamaYerleri"]
+HASH_COLS = ["Tanilar"]  # open-ended diagnoses: hashed into --hash-width signed buckets
+HASH_WIDTH = 0  # opt-in: 0 keeps the feature set of the committed pipeline
+# Vocabulary caps for the cat and mlb branches (opt-in): values seen in fewer
+# than MIN_DF rows, or beyond MAX_FEATURES per column, share one column per
+# input column (OneHotEncoder's infrequent category, MultiLabelBinarizerDF's __other__)
+MIN_DF = 1
+MAX_FEATURES = None
+# Output dtypes (src.data.model_ready.dtype_policy): "compact" writes float32
+# numerics, uint8 indicators and int8 hash buckets
+OUT_DTYPES = "float64"
+USED_COLS = NUM_COLS + CAT_COLS + MLB_COLS + HASH_COLS
 
-def make_ohe():
+
+def make_ohe(sparse_output=False, min_df=1, max_features=None):
     """
     Return a OneHotEncoder compatible across scikit-learn versions.
 
     - scikit-learn >= 1.2 introduces `sparse_output` and deprecates `sparse`.
     - Older versions still use `sparse` (bool).
     We try the modern signature first, then fall back to the legacy one.
+
+    With caps, rare categories (and unseen ones) share the encoder's
+    `<col>_infrequent_sklearn` column (min_frequency / max_categories).
     """
+    from sklearn.preprocessing import OneHotEncoder
+
+    kwargs = {"handle_unknown": "ignore"}
+    if is_capped(min_df, max_features):
+        # max_categories counts the infrequent column; max_features does not
+        kwargs = {"handle_unknown": "infrequent_if_exist",
+                  "min_frequency": min_df if min_df > 1 else None,
+                  "max_categories": max_features + 1 if max_features is not None else None}
     try:
         # New API (>=1.2)
-        return OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+        return OneHotEncoder(sparse_output=sparse_output, **kwargs)
     except TypeError:
         # Legacy API
-        return OneHotEncoder(handle_unknown="ignore", sparse=False)
-
+        return OneHotEncoder(sparse=sparse_output, **kwargs)
 
-def main():
-    # 0) Load input with already-derived numeric columns
-    df0 = pd.read_parquet(RAW_PARQ)
-
-    # 1) Deduplicate:
-    #    (a) drop fully identical rows
-    #    (b) keep the first record per HastaNo (unique patient row)
-    df = df0.drop_duplicates()
-    if "HastaNo" in df.columns:
-        df = df.drop_duplicates(subset="HastaNo", keep="first")
-    df = df.reset_index(drop=True)
 
-    # 2) Column groups
-    id_col = "HastaNo"
-    target = "TedaviSuresi_num"
-
-    num_cols = ["Yas", "UygulamaSuresi_min"]
-    cat_cols = ["Cinsiyet", "KanGrubu", "Uyruk", "Bolum", "TedaviAdi"]
-    mlb_cols = ["KronikHastalik", "Alerji", "UygulamaYerleri"]
-    used_cols = num_cols + cat_cols + mlb_cols
+def build_column_transformer(sparse_output=False, hash_width=HASH_WIDTH,
+                             min_df=MIN_DF, max_features=MAX_FEATURES):
+    """
+    Unfitted ColumnTransformer: num (median + scale), cat (mode + capped OHE),
+    mlb (capped vocabulary), hash (Tanilar tokens in `hash_width` signed
+    buckets; 0 drops the branch).
+    With sparse_output=True the OHE and MLB branches stay CSR and the
+    stacked output is always CSR (sparse_threshold=1.0); otherwise it is
+    always dense, however sparse the hash branch makes it.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    # Clone-friendly custom transformers
+    from src.features.multilabel import HashingMultiLabelDF, MultiLabelBinarizerDF
 
-    # 3) Transformers
     num_pipe = Pipeline([
         ("imputer", SimpleImputer(strategy="median")),
         ("scaler", StandardScaler()),
@@ -65,36 +94,283 @@ def main():
 
     cat_pipe = Pipeline([
         ("imputer", SimpleImputer(strategy="most_frequent")),
-        ("ohe", make_ohe()),
+        ("ohe", make_ohe(sparse_output, min_df, max_features)),
     ])
 
-    mlb = MultiLabelBinarizerDF(columns=mlb_cols)
+    mlb = MultiLabelBinarizerDF(columns=MLB_COLS, min_df=min_df, max_features=max_features,
+                                other_bucket=is_capped(min_df, max_features))
+
+    transformers = [
+        ("num", num_pipe, NUM_COLS),
+        ("cat", cat_pipe, CAT_COLS),
+        ("mlb", mlb, MLB_COLS),
+    ]
+    if hash_width:
+        transformers.append(("hash", HashingMultiLabelDF(columns=HASH_COLS, n_features=hash_width), HASH_COLS))
 
-    ct = ColumnTransformer(
-        transformers=[
-            ("num", num_pipe, num_cols),
-            ("cat", cat_pipe, cat_cols),
-            ("mlb", mlb, mlb_cols),
-        ],
+    # Dense mode never stacks to CSR (the baseline's 0.3 threshold did once a
+    # mostly-empty hash branch lowered the density): the parquet/CSV/.npy
+    # writers need a dense matrix, and pandas sparse frames do not go to parquet.
+    return ColumnTransformer(
+        transformers=transformers,
         remainder="drop",
+        sparse_threshold=1.0 if sparse_output else 0.0,
     )
 
-    # 4) Fit/transform on the de-duplicated frame (same source for fit & transform)
-    X = df[used_cols]
-    Xt = ct.fit_transform(X)
+
+def save_artifacts(ct, columns):
+    from joblib import dump
+    from src.serving.compiled import CompiledPreprocessor
+
+    Path(FEATURES).parent.mkdir(parents=True, exist_ok=True)
+    Path("models").mkdir(exist_ok=True)
+    Path(FEATURES).write_text("\n".join(columns), encoding="utf-8")
+    dump(ct, PIPELINE)
+    CompiledPreprocessor.from_pipeline(ct).save(PIPELINE_JSON)
+
+
+def main_out_of_core(chunksize, sparse_out=False, write_csv=True, hash_width=HASH_WIDTH,
+                     min_df=MIN_DF, max_features=MAX_FEATURES, write_mmap=True, policy=None,
+                     packbits=False):
+    """
+    Out-of-core mode: fit the ColumnTransformer from parquet chunks
+    (see src.features.incremental), then transform chunk by chunk and
+    append each block to the parquet/CSV/.npy outputs (sparse mode: CSR
+    blocks are streamed into the .npz and the ID parquet, see SparseWriter).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from src.data.typed import iter_typed_chunks
+    from src.data.dedup import Deduplicator, dedup_chunks
+    from src.features.derive_numeric import interim_paths
+    from src.features.incremental import fit_out_of_core
+
+    read_cols = [ID_COL, TARGET] + USED_COLS
+    dedups = []  # one per pass; the last one is reported
+
+    def make_chunks():
+        dedups.append(Deduplicator(id_col=ID_COL))
+        chunks = dedup_chunks(iter_typed_chunks(interim_paths(Path(RAW_PARQ)), chunksize, columns=read_cols),
+                              dedups[-1])
+        return (to_model_frame(c, float_cols=NUM_COLS) for c in chunks)
+
+    with perf.step("fit") as st:
+        ct, n_fit = fit_out_of_core(make_chunks, NUM_COLS, CAT_COLS, MLB_COLS,
+                                    lambda: build_column_transformer(sparse_out, hash_width,
+                                                                     min_df, max_features),
+                                    hash_cols=HASH_COLS)
+        st.rows = n_fit
     feat_names = ct.get_feature_names_out()
+    dtypes = feature_dtypes(feat_names, policy)
+
+    Path(OUT_PARQ).parent.mkdir(parents=True, exist_ok=True)
+    writer, schema, rows, first_csv = None, None, 0, True
+    sparse_writer = SparseWriter(len(feat_names), sparse_dtype(policy)) if sparse_out else None
+    # the fit pass counted the rows, so the .npy matrix can be preallocated
+    mmap = (MmapWriter(n_fit, feat_names, policy=policy, packbits=packbits)
+            if write_mmap and not sparse_out else None)
+    try:
+        for chunk in perf.timed_iter(make_chunks(), "read"):
+            if chunk.empty:
+                continue
+            chunk = chunk.reset_index(drop=True)
+            with perf.step("transform", rows=len(chunk)):
+                Xt = ct.transform(chunk[USED_COLS])
+            rows += len(chunk)
+            if sparse_out:
+                with perf.step("write_npz", rows=len(chunk)):
+                    sparse_writer.write(chunk[[ID_COL, TARGET]], Xt)
+                continue
+            with perf.step("concat", rows=len(chunk)):
+                Xt = Xt.toarray() if sparse.issparse(Xt) else Xt
+                out_df = pd.concat([chunk[[ID_COL, TARGET]],
+                                    feature_frame(Xt, feat_names, dtypes)], axis=1)
+            with perf.step("write_parquet", rows=len(out_df)):
+                if writer is None:
+                    schema = pa.Schema.from_pandas(out_df, preserve_index=False).remove_metadata()
+                    writer = pq.ParquetWriter(OUT_PARQ, schema)
+                writer.write_table(pa.Table.from_pandas(out_df, schema=schema, preserve_index=False),
+                                   row_group_size=ROW_GROUP_ROWS)
+            if mmap is not None:
+                with perf.step("write_mmap", rows=len(chunk)):
+                    mmap.write(chunk[[ID_COL, TARGET]], Xt)
+            if write_csv:
+                with perf.step("write_csv", rows=len(out_df)):
+                    out_df.to_csv(OUT_CSV, index=False, encoding="utf-8",
+                                  mode="w" if first_csv else "a", header=first_csv)
+                first_csv = False
+        assert rows == n_fit, "Row count mismatch between fit and transform passes."
+    except BaseException:
+        if sparse_writer is not None:
+            sparse_writer.discard()
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    if not sparse_out:
+        clear_parts()
+        with perf.step("write_index", rows=rows):
+            write_index(OUT_PARQ, ID_COL)
+    dedups[-1].save_ids(KNOWN_IDS)
+    if mmap is not None:
+        mmap.close()
+    if sparse_out:
+        with perf.step("write_npz", rows=rows):
+            sparse_writer.close()
+
+    columns = [ID_COL, TARGET] + list(feat_names)
+    assert len(set(columns)) == len(columns), "Duplicate column names in final DF."
+    save_artifacts(ct, columns)
+    perf.note_read(RAW_PARQ)
+    note_outputs(sparse_out, write_csv, write_mmap)
+    perf.set_rows(rows_in=dedups[-1].rows_in, rows_out=rows)
+    dedups[-1].report()
+
+    print("transformers:", [name for name, *_ in ct.transformers])
+    print("feature_names_out count:", len(feat_names))
+    print("✅ Preprocessing completed (out-of-core)")
+    print(f"Rows (after dedup): {rows}")
+    print(f"Features (X) count: {len(feat_names)}")
+    print_saved(sparse_out, write_csv, write_mmap)
+    print(f"Pipeline: {PIPELINE} (+ {PIPELINE_JSON})")
+    print(f"Feature names: {FEATURES}")
+
+
+def note_outputs(sparse_out, write_csv, write_mmap=False):
+    dense = [OUT_PARQ, INDEX_NPZ] + ([OUT_CSV] if write_csv else []) + (mmap_files(MMAP_JSON) if write_mmap else [])
+    for path in ([SPARSE_NPZ, IDS_PARQ] if sparse_out else dense):
+        perf.note_written(path)
+    perf.note_written(PIPELINE)
+    perf.note_written(PIPELINE_JSON)
 
-    # 5) Build a feature DataFrame (dense or sparse-safe)
-    if sparse.issparse(Xt):
-        # Keep as Pandas Sparse to avoid memory blow-ups if needed
-        Xdf = pd.DataFrame.sparse.from_spmatrix(Xt, columns=feat_names)
+
+def print_saved(sparse_out, write_csv, write_mmap=False):
+    if sparse_out:
+        print(f"Saved: {SPARSE_NPZ} (CSR) and {IDS_PARQ}")
     else:
-        Xdf = pd.DataFrame(Xt, columns=feat_names)
+        print(f"Saved: {OUT_PARQ}" + (f" and {OUT_CSV}" if write_csv else "") + f" (index: {INDEX_NPZ})")
+        if write_mmap:
+            x_files = ", ".join(str(p) for p in mmap_files(MMAP_JSON)[:-2]) or MMAP_X
+            print(f"Saved: {x_files} + {MMAP_IDS} (memory-mappable, header {MMAP_JSON})")
+
+
+@perf.instrument_stage("preprocess")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build the model-ready dataset.")
+    ap.add_argument("--chunksize", type=int, default=None,
+                    help="fit and transform out-of-core over parquet chunks of N rows")
+    ap.add_argument("--sparse", action="store_true",
+                    help="keep OHE/MLB branches CSR end to end; write .npz + ID/target parquet")
+    ap.add_argument("--no-csv", dest="csv", action="store_false",
+                    help="skip the dense CSV export")
+    ap.add_argument("--hash-width", type=int, default=HASH_WIDTH,
+                    help="signed hash buckets for a Tanilar branch, e.g. 128 (default 0 = no branch)")
+    ap.add_argument("--min-df", type=int, default=MIN_DF,
+                    help="categories/tokens seen in fewer rows share one column per input column (default 1 = keep all)")
+    ap.add_argument("--max-features", type=int, default=MAX_FEATURES,
+                    help="keep at most N categories/tokens per column, most frequent first")
+    ap.add_argument("--no-mmap", dest="mmap", action="store_false",
+                    help="skip the memory-mappable .npy export (dense mode)")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="transform row shards on N processes after the fit (0 = all cores)")
+    ap.add_argument("--dtypes", choices=DTYPE_POLICIES, default=OUT_DTYPES,
+                    help="compact: float32 numerics, uint8/bool indicators, int8 hash buckets "
+                         "(sparse mode: a float32 CSR)")
+    ap.add_argument("--indicator-dtype", choices=("uint8", "bool"), default="uint8",
+                    help="dtype of the one-hot/multi-label columns under --dtypes compact")
+    ap.add_argument("--packbits", action="store_true",
+                    help="bit-pack the indicator blocks of the .npy export (needs --dtypes compact)")
+    args = ap.parse_args(argv)
+    if args.packbits and args.dtypes != "compact":
+        ap.error("--packbits needs --dtypes compact")
+    policy = dtype_policy(args.dtypes, args.indicator_dtype)
+    if args.chunksize:
+        return main_out_of_core(args.chunksize, sparse_out=args.sparse, write_csv=args.csv,
+                                hash_width=args.hash_width, min_df=args.min_df,
+                                max_features=args.max_features, write_mmap=args.mmap,
+                                policy=policy, packbits=args.packbits)
+    from src.data.dedup import Deduplicator
+    from src.features.derive_numeric import interim_paths
+    from src.features.parallel import transform_sharded
+
+    # 0) Load input with already-derived numeric columns: the full export,
+    #    then batches added by src.features.append (only the used columns,
+    #    compact dtypes; see src.data.typed)
+    with perf.step("read") as st:
+        df0 = read_typed(interim_paths(Path(RAW_PARQ)), columns=[ID_COL, TARGET] + USED_COLS)
+        st.rows = len(df0)
+    perf.note_read(RAW_PARQ)
+    perf.set_rows(rows_in=len(df0))
 
-    # 6) Final table: ID + target + features
-    base = df[[id_col, target]].reset_index(drop=True)
-    Xdf = Xdf.reset_index(drop=True)
-    out_df = pd.concat([base, Xdf], axis=1)
+    # 1) Deduplicate:
+    #    (a) drop fully identical rows
+    #    (b) keep the first record per HastaNo (unique patient row)
+    #    (a)+(b) keep the first row per HastaNo, so pruning columns first
+    #    does not change which rows survive (hash-based, see src.data.dedup).
+    with perf.step("dedup", rows=len(df0)):
+        dd = Deduplicator(id_col=ID_COL)
+        df = dd.filter(df0).reset_index(drop=True)
+    dd.report()
+    dd.save_ids(KNOWN_IDS)  # src.features.append drops rows with these ids
+
+    # 2) Column groups
+    id_col = ID_COL
+    target = TARGET
+    used_cols = USED_COLS
+
+    # 3) Transformers
+    ct = build_column_transformer(sparse_output=args.sparse, hash_width=args.hash_width,
+                                  min_df=args.min_df, max_features=args.max_features)
+
+    # 4) Fit/transform on the de-duplicated frame (same source for fit & transform)
+    X = to_model_frame(df[used_cols], float_cols=NUM_COLS)
+    if args.jobs == 1:
+        with perf.step("fit_transform", rows=len(X)):
+            Xt = ct.fit_transform(X)
+    else:
+        # same output as fit_transform; workers widen their own shard of the typed frame
+        with perf.step("fit", rows=len(X)):
+            ct.fit(X)
+        with perf.step("transform", rows=len(X)):
+            # dense: a file-backed memmap next to the outputs, not an in-memory copy
+            Path(OUT_PARQ).parent.mkdir(parents=True, exist_ok=True)
+            Xt = transform_sharded(ct, df[used_cols], args.jobs,
+                                   prepare=partial(to_model_frame, float_cols=NUM_COLS),
+                                   out_dir=Path(OUT_PARQ).parent)
+    feat_names = ct.get_feature_names_out()
+
+    # 5') Sparse mode: CSR matrix + ID/target table, no dense frame at all
+    if args.sparse:
+        ids = to_model_frame(df[[id_col, target]]).reset_index(drop=True)
+        assert ids[id_col].nunique() == len(ids), "HastaNo duplicates remained."
+        columns = [id_col, target] + list(feat_names)
+        assert len(set(columns)) == len(columns), "Duplicate column names in final DF."
+        with perf.step("write_npz", rows=len(ids)):
+            save_sparse(ids, Xt.astype(sparse_dtype(policy), copy=False))
+        save_artifacts(ct, columns)
+        note_outputs(True, False)
+        perf.set_rows(rows_out=len(ids))
+        print("transformers:", [name for name, *_ in ct.transformers])
+        print("feature_names_out count:", len(feat_names))
+        print("✅ Preprocessing completed (sparse)")
+        print(f"Rows (after dedup): {len(ids)} | nnz: {Xt.nnz}")
+        print_saved(True, False)
+        print(f"Pipeline: {PIPELINE} (+ {PIPELINE_JSON})")
+        print(f"Feature names: {FEATURES}")
+        return
+
+    with perf.step("concat", rows=len(df)):
+        # 5) Build a feature DataFrame (dense or sparse-safe)
+        if sparse.issparse(Xt):
+            # Keep as Pandas Sparse to avoid memory blow-ups if needed
+            Xdf = pd.DataFrame.sparse.from_spmatrix(Xt, columns=feat_names)
+        else:
+            Xdf = feature_frame(Xt, feat_names, feature_dtypes(feat_names, policy))
+
+        # 6) Final table: ID + target + features
+        base = to_model_frame(df[[id_col, target]]).reset_index(drop=True)
+        Xdf = Xdf.reset_index(drop=True)
+        out_df = pd.concat([base, Xdf], axis=1)
 
     # 7) Safety checks
     assert len(out_df) == len(df), "Row count mismatch after concat."
@@ -104,13 +380,21 @@ def main():
 
     # 8) Save artifacts
     Path(OUT_PARQ).parent.mkdir(parents=True, exist_ok=True)
-    Path(FEATURES).parent.mkdir(parents=True, exist_ok=True)
-    Path("models").mkdir(exist_ok=True)
 
-    out_df.to_parquet(OUT_PARQ, index=False)
-    out_df.to_csv(OUT_CSV, index=False, encoding="utf-8")
-    Path(FEATURES).write_text("\n".join(out_df.columns), encoding="utf-8")
-    dump(ct, PIPELINE)
+    with perf.step("write_parquet", rows=len(out_df)):
+        out_df.to_parquet(OUT_PARQ, index=False, row_group_size=ROW_GROUP_ROWS)
+    clear_parts()
+    with perf.step("write_index", rows=len(out_df)):
+        write_index(OUT_PARQ, id_col)
+    if args.csv:
+        with perf.step("write_csv", rows=len(out_df)):
+            out_df.to_csv(OUT_CSV, index=False, encoding="utf-8")
+    if args.mmap:
+        with perf.step("write_mmap", rows=len(out_df)):
+            save_mmap(base, Xt, feat_names, policy=policy, packbits=args.packbits)
+    save_artifacts(ct, out_df.columns)
+    note_outputs(False, args.csv, args.mmap)
+    perf.set_rows(rows_out=len(out_df))
 
     # 9) Logs
     print("transformers:", [name for name, *_ in ct.transformers])
@@ -118,8 +402,8 @@ def main():
     print("✅ Preprocessing completed")
     print(f"Rows (after dedup): {len(out_df)}")
     print(f"Features (X) count: {out_df.shape[1] - 2}")
-    print(f"Saved: {OUT_PARQ} and {OUT_CSV}")
-    print(f"Pipeline: {PIPELINE}")
+    print_saved(False, args.csv, args.mmap)
+    print(f"Pipeline: {PIPELINE} (+ {PIPELINE_JSON})")
     print(f"Feature names: {FEATURES}")
 
 
@@ -0,0 +1,101 @@
+"""
+Multi-label cell tokenization and token hashing, shared by the sklearn
+transformers (src.features.multilabel) and the pandas/sklearn-free
+serving path (src.serving.compiled).
+
+`murmurhash3_32` is a pure-Python MurmurHash3 (x86, 32-bit) that returns
+the same signed values as sklearn.utils.murmurhash3_32 for str keys, so
+hashed buckets do not depend on which side computed them. Per-token
+results are memoized, so its speed only matters for new tokens.
+"""
+from __future__ import annotations
+
+import re
+import struct
+import unicodedata
+
+import numpy as np
+
+from src.features.memo import memoize
+
+_M32 = 0xFFFFFFFF
+
+
+def _rotl32(x: int, r: int) -> int:
+    return ((x << r) | (x >> (32 - r))) & _M32
+
+
+def murmurhash3_32(key: str, seed: int = 0) -> int:
+    """Signed 32-bit MurmurHash3 of the UTF-8 bytes of `key`."""
+    data = key.encode("utf-8")
+    n = len(data)
+    h = seed & _M32
+    c1, c2 = 0xCC9E2D51, 0x1B873593
+    n_blocks = n // 4
+    for (k,) in struct.iter_unpack("<I", data[: n_blocks * 4]):
+        k = _rotl32((k * c1) & _M32, 15) * c2 & _M32
+        h = (_rotl32(h ^ k, 13) * 5 + 0xE6546B64) & _M32
+    tail = data[n_blocks * 4:]
+    if tail:
+        k = 0
+        for i, b in enumerate(tail):
+            k |= b << (8 * i)
+        h ^= _rotl32((k * c1) & _M32, 15) * c2 & _M32
+    h ^= n
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & _M32
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & _M32
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+def _is_na(x) -> bool:
+    # scalar pd.isna without pandas: None, NaN, NaT, pd.NA
+    if x is None:
+        return True
+    try:
+        return bool(x != x)
+    except TypeError:  # pd.NA
+        return True
+
+
+@memoize("multilabel._norm_token")
+def _norm_token(s):
+    if s is None: return None
+    t = str(s).strip().lower()
+    # Türkçe karakterleri sadeleştir + punctuation temizle
+    t = (t.replace("ı","i").replace("İ","i")
+           .replace("ş","s").replace("ğ","g")
+           .replace("ç","c").replace("ö","o").replace("ü","u"))
+    t = unicodedata.normalize("NFKD", t)
+    t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    t = re.sub(r"[^a-z0-9]+", "_", t)
+    t = re.sub(r"_+", "_", t).strip("_")
+    return t or None
+
+def _split_cell(x):
+    if _is_na(x): return []
+    parts = re.split(r"[;,/|]+", str(x))
+    return [p.strip() for p in parts if p.strip()]
+
+@memoize("multilabel._cell_tokens")
+def _cell_tokens(x):
+    # her token için _norm_token yalnızca bir kez çağrılır; önbellekteki
+    # sonuç paylaşıldığı için değiştirilemez bir tuple döner
+    return tuple(t for t in map(_norm_token, _split_cell(x)) if t)
+
+@memoize("multilabel._token_hash")
+def _token_hash(key):
+    # FeatureHasher ile aynı: imzalı murmurhash3_32, seed=0
+    return murmurhash3_32(key, seed=0)
+
+def _cell_buckets(col, n_features, alternate_sign, x):
+    # hücredeki tekil token'lar -> (sıralı kova indeksleri, işaretli toplamlar)
+    acc = {}
+    for t in dict.fromkeys(_cell_tokens(x)):
+        h = _token_hash(f"{col}__{t}")
+        j = abs(h) % n_features
+        acc[j] = acc.get(j, 0.0) + (-1.0 if alternate_sign and h < 0 else 1.0)
+    idx = sorted(j for j, v in acc.items() if v != 0.0)
+    return np.array(idx, dtype=np.int32), np.array([acc[j] for j in idx], dtype=np.float64)
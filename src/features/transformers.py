@@ -4,6 +4,8 @@ import numpy as np
 import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from src.features.memo import map_unique, memoize
+
 # -------- Utilities --------
 def _tokenize_cell(s: object) -> list[str]:
     """Tokenize a multi-label cell into normalized tokens."""
@@ -31,6 +33,14 @@ def _tokenize_cell(s: object) -> list[str]:
             out.append(t)
     return out
 
+@memoize("transformers._tokenize_cell")
+def _cell_token_tuple(s: object) -> tuple:
+    return tuple(_tokenize_cell(s))
+
+def _tokenize_column(ser: pd.Series) -> pd.Series:
+    """Tokenize each distinct cell once (memoized, as tuples) and broadcast to all rows."""
+    return map_unique(ser, _cell_token_tuple)
+
 def _safe_name(tok: str) -> str:
     """Make a token safe for use in column names."""
     s = tok.lower()
@@ -59,9 +69,8 @@ class MultiLabelBinarizerDF(BaseEstimator, TransformerMixin):
             ser = X[col] if col in X.columns else pd.Series([], dtype=object)
             col_tokens = set()
             # Build per-column vocabulary
-            for s in ser.fillna(""):
-                for tok in _tokenize_cell(s):
-                    col_tokens.add(tok)
+            for toks in _tokenize_column(ser.fillna("")):
+                col_tokens.update(toks)
             self.vocab_[col] = sorted(col_tokens)
         # Build feature names (stable order: by column, then token)
         self.feature_names_ = []
@@ -79,7 +88,7 @@ class MultiLabelBinarizerDF(BaseEstimator, TransformerMixin):
         tokenized = {}
         for col in self._columns_:
             ser = X[col] if col in X.columns else pd.Series([""]*n, dtype=object)
-            tokenized[col] = ser.fillna("").map(_tokenize_cell).tolist()
+            tokenized[col] = _tokenize_column(ser.fillna("")).tolist()
         # Fill matrix
         out = np.zeros((n, self.n_features_out_), dtype=np.int8)
         j = 0
@@ -0,0 +1,36 @@
+"""
+Frequency caps for multi-label vocabularies.
+
+Long-tailed columns (multi-label tokens) keep growing new rare values, and
+each one becomes a feature column. `cap_vocabulary` keeps the values seen
+in at least `min_df` rows, at most `max_features` of them per column (most
+frequent first, ties by value); the rest share one OTHER bucket
+(MultiLabelBinarizerDF(min_df=, max_features=, other_bucket=)). Values
+unseen at fit time land in the OTHER bucket as well.
+
+Categorical columns use OneHotEncoder's own caps (min_frequency /
+max_categories, see preprocess.make_ohe).
+"""
+from __future__ import annotations
+
+from typing import Mapping, Optional
+
+OTHER = "__other__"
+
+
+def _value_key(v):
+    # None vs str: same fallback as ValueCounter.mode
+    return (str(type(v)), str(v))
+
+
+def is_capped(min_df=1, max_features: Optional[int] = None) -> bool:
+    return min_df > 1 or max_features is not None
+
+
+def cap_vocabulary(counts: Mapping, min_df=1, max_features: Optional[int] = None) -> set:
+    """Values kept by the policy; `counts` maps value -> number of rows."""
+    kept = [(v, n) for v, n in counts.items() if n >= min_df]
+    if max_features is not None and len(kept) > max_features:
+        kept.sort(key=lambda vn: (-vn[1], _value_key(vn[0])))
+        kept = kept[:max_features]
+    return {v for v, _ in kept}
@@ -0,0 +1,340 @@
+"""
+Per-stage performance instrumentation.
+
+A stage's main() is wrapped with `@instrument_stage("<name>")`; inside it (and
+in any library code it calls) sub-steps are timed with
+
+    with perf.step("fit", rows=len(X)):
+        ...
+    @perf.timed("mlb.transform")
+    def transform(...): ...
+
+and IO / row counts are noted with `perf.note_read(path)`,
+`perf.note_written(path)`, `perf.set_rows(rows_in=..., rows_out=...)`.
+All of these are no-ops when no stage is active (library use, serving).
+
+Each run appends one JSON line to reports/perf/<stage>.ndjson:
+run_id, stage, status, seconds, peak RSS, rows/sec, bytes read/written and
+the aggregated sub-steps (calls, seconds, rows, rows/sec, RSS and, with
+tracemalloc on, peak traced allocations).
+
+Environment switches:
+    PERF_TRACEMALLOC=1   track Python/numpy allocations per step (slower)
+    PERF_PROFILE=1       cProfile the stage, dump reports/perf/<stage>-<run_id>.prof
+    PERF_DIR=<dir>       write records somewhere else than reports/perf
+"""
+from __future__ import annotations
+
+import functools
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+PERF_DIR = Path("reports/perf")
+_MB = 1024.0 * 1024.0
+
+
+# -------- Memory probes --------
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak-RSS counter (Linux); False if unsupported."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _status_kb(field: str):
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    kb = _status_kb("VmHWM")
+    if kb is not None:
+        return kb / 1024.0
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / _MB if sys.platform == "darwin" else peak / 1024.0
+
+
+def rss_mb():
+    kb = _status_kb("VmRSS")
+    return kb / 1024.0 if kb is not None else None
+
+
+# -------- Recorder --------
+class _Step:
+    __slots__ = ("name", "rows", "alloc_peak")
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+        self.alloc_peak = 0
+
+
+class StageRecorder:
+    def __init__(self, stage: str, trace_alloc: bool = False, profile: bool = False):
+        self.stage = stage
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self.trace_alloc = trace_alloc
+        self.profile = profile
+        self.steps = {}      # name -> aggregated stats (first-entry order)
+        self._open = []      # stack of _Step
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.extra = {}
+        self.alloc_peak = 0
+
+    # -- steps --
+    @contextmanager
+    def step(self, name: str, rows=None):
+        st = _Step(name, rows)
+        if self.trace_alloc:
+            import tracemalloc
+            self._flush_alloc_peak(tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._open.append(st)
+        t0 = time.perf_counter()
+        try:
+            yield st
+        finally:
+            dt = time.perf_counter() - t0
+            self._open.pop()
+            if self.trace_alloc:
+                import tracemalloc
+                peak = tracemalloc.get_traced_memory()[1]
+                st.alloc_peak = max(st.alloc_peak, peak)
+                self._flush_alloc_peak(peak)
+            self._record(st, dt)
+
+    def add(self, name: str, seconds: float, rows=None):
+        """Record an externally timed step (e.g. one next() of a reader)."""
+        self._record(_Step(name, rows), seconds)
+
+    def _flush_alloc_peak(self, peak):
+        # a child's reset_peak() must not hide the parent's (or the stage's) peak
+        self.alloc_peak = max(self.alloc_peak, peak)
+        for s in self._open:
+            s.alloc_peak = max(s.alloc_peak, peak)
+
+    def _record(self, st: _Step, seconds: float):
+        agg = self.steps.setdefault(st.name, {"calls": 0, "seconds": 0.0, "rows": None})
+        agg["calls"] += 1
+        agg["seconds"] += seconds
+        if st.rows is not None:
+            agg["rows"] = (agg["rows"] or 0) + int(st.rows)
+        rss = rss_mb()
+        agg["rss_mb"] = round(rss, 1) if rss is not None else None
+        if self.trace_alloc:
+            agg["alloc_peak_mb"] = max(agg.get("alloc_peak_mb", 0.0), round(st.alloc_peak / _MB, 1))
+
+    # -- notes --
+    def note_read(self, path):
+        self.bytes_read += _size(path)
+
+    def note_written(self, path):
+        self.bytes_written += _size(path)
+
+    def set_rows(self, rows_in=None, rows_out=None):
+        if rows_in is not None:
+            self.rows_in = int(rows_in)
+        if rows_out is not None:
+            self.rows_out = int(rows_out)
+
+    # -- output --
+    def record(self, status: str, seconds: float, error=None, profile_path=None) -> dict:
+        rows = self.rows_in if self.rows_in is not None else self.rows_out
+        steps = []
+        for name, agg in self.steps.items():
+            s = {"name": name, **agg, "seconds": round(agg["seconds"], 6)}
+            if agg["rows"] and agg["seconds"] > 0:
+                s["rows_per_sec"] = round(agg["rows"] / agg["seconds"], 1)
+            steps.append(s)
+        rec = {
+            "run_id": self.run_id,
+            "stage": self.stage,
+            "started_at": self.run_id.split("-")[0],
+            "status": status,
+            "seconds": round(seconds, 6),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_per_sec": round(rows / seconds, 1) if rows and seconds > 0 else None,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "steps": steps,
+            "argv": sys.argv[1:],
+            "python": platform.python_version(),
+            "host": platform.node(),
+        }
+        if error is not None:
+            rec["error"] = error
+        if profile_path is not None:
+            rec["profile"] = str(profile_path)
+        rec.update(self.extra)
+        return rec
+
+
+def _size(path) -> int:
+    try:
+        p = Path(path)
+        if p.is_dir():
+            return sum(f.stat().st_size for f in p.rglob("*") if f.is_file())
+        return p.stat().st_size
+    except OSError:
+        return 0
+
+
+# -------- Active-stage API (no-ops outside a stage) --------
+_ACTIVE: list = []
+
+
+def current():
+    return _ACTIVE[-1] if _ACTIVE else None
+
+
+@contextmanager
+def step(name: str, rows=None):
+    rec = current()
+    if rec is None:
+        yield _Step(name, rows)
+        return
+    with rec.step(name, rows) as st:
+        yield st
+
+
+def timed(name: str):
+    """Decorator form of step()."""
+    def deco(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ACTIVE:
+                return func(*args, **kwargs)
+            with _ACTIVE[-1].step(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def timed_iter(iterable, name: str):
+    """Yield from `iterable`, timing each next() as step `name` (rows = len(item))."""
+    it = iter(iterable)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        if _ACTIVE:
+            _ACTIVE[-1].add(name, time.perf_counter() - t0, len(item) if hasattr(item, "__len__") else None)
+        yield item
+
+
+def note_read(path):
+    if _ACTIVE:
+        _ACTIVE[-1].note_read(path)
+
+
+def note_written(path):
+    if _ACTIVE:
+        _ACTIVE[-1].note_written(path)
+
+
+def set_rows(rows_in=None, rows_out=None):
+    if _ACTIVE:
+        _ACTIVE[-1].set_rows(rows_in, rows_out)
+
+
+def set_extra(**fields):
+    """Stage-specific fields added to the run record."""
+    if _ACTIVE:
+        _ACTIVE[-1].extra.update(fields)
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def write_record(rec: dict, out_dir=None) -> Path:
+    out_dir = Path(out_dir or os.environ.get("PERF_DIR") or PERF_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"{rec['stage']}.ndjson"
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+    return path
+
+
+@contextmanager
+def stage(name: str, trace_alloc=None, profile=None):
+    """Record one stage run; the JSON line is written even if the stage fails."""
+    rec = StageRecorder(
+        name,
+        trace_alloc=_env_flag("PERF_TRACEMALLOC") if trace_alloc is None else trace_alloc,
+        profile=_env_flag("PERF_PROFILE") if profile is None else profile,
+    )
+    started_tracing = False
+    if rec.trace_alloc:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+    profiler = None
+    if rec.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    reset_peak_rss()
+    _ACTIVE.append(rec)
+    status, error = "ok", None
+    t0 = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield rec
+    except SystemExit as e:  # stages report failure via sys.exit(1)
+        if e.code not in (None, 0):
+            status, error = "error", f"SystemExit({e.code})"
+        raise
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        profile_path = None
+        if profiler is not None:
+            profiler.disable()
+            out_dir = Path(os.environ.get("PERF_DIR") or PERF_DIR)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            profile_path = out_dir / f"{name}-{rec.run_id}.prof"
+            profiler.dump_stats(str(profile_path))
+        _ACTIVE.pop()
+        if rec.trace_alloc:
+            import tracemalloc
+            peak = max(rec.alloc_peak, tracemalloc.get_traced_memory()[1])
+            rec.extra["alloc_peak_mb"] = round(peak / _MB, 1)
+            if started_tracing:
+                tracemalloc.stop()
+        write_record(rec.record(status, seconds, error, profile_path))
+
+
+def instrument_stage(name: str):
+    """Decorator for a stage's main(): wraps the call in stage(name)."""
+    def deco(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return deco
@@ -0,0 +1,301 @@
+"""
+Content-hashed stage runner.
+
+Each stage declares its input files, the source files it runs and its
+outputs. A stage's fingerprint is the hash of (input file contents, source
+contents, parameters). The last successful fingerprint per stage is kept in
+a manifest, and only stale stages are re-run:
+
+- fingerprint differs from the manifest, or
+- an output is missing / was modified after the stage last wrote it.
+
+Commands that extend a stage's data in place without re-running it
+(src.features.append adds batches next to preprocess's outputs) check
+`is_current()` first and call `refresh()` afterwards, so a stage that was
+up to date stays up to date: refitting remains an explicit action.
+
+Usage:
+    python -m src.pipeline run                # rebuild stale stages
+    python -m src.pipeline run --dry-run      # show what would run
+    python -m src.pipeline run --force        # rebuild everything
+    python -m src.pipeline run preprocess     # a stage (and stale upstream)
+    python -m src.pipeline status
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+MANIFEST = Path(".pipeline/manifest.json")
+
+RAW_XLSX = "data/raw/Talent_Academy_Case_DT_2025.xlsx"
+NUM_PARQ = "data/interim/01_numeric.parquet"
+NUM_PARTS = "data/interim/01_numeric_parts"  # batches added by src.features.append
+CONTRACT = "docs/schema_contract.json"
+
+_EDA_FIGURES = [
+    "missingness_bar.png", "hist_Yas.png", "hist_TedaviSuresi_num.png",
+    "hist_UygulamaSuresi_min.png", "scatter_Yas_vs_TedaviSuresi_num.png",
+    "corr_heatmap.png", "box_tedavi_by_cinsiyet.png", "box_tedavi_by_bolum_top8.png",
+    "top_KanGrubu.png", "top_Uyruk.png", "top_Bolum.png", "top_TedaviAdi.png",
+]
+
+
+@dataclass
+class Stage:
+    name: str
+    module: str
+    inputs: list
+    code: list
+    outputs: list
+    args: list = field(default_factory=list)
+    deps: list = field(default_factory=list)
+    input_dirs: list = field(default_factory=list)  # their *.parquet files are inputs (missing = empty)
+
+
+def default_stages(chunksize=None) -> list:
+    chunk_args = ["--chunksize", str(chunksize)] if chunksize else []
+    return [
+        Stage(
+            name="load_and_check",
+            module="src.data.load_and_check",
+            inputs=[RAW_XLSX, CONTRACT],
+            code=["src/data/load_and_check.py", "src/data/profiler.py", "src/data/excel_cache.py",
+                  "src/data/readers.py", "src/data/dedup.py", "src/features/sketches.py"],
+            outputs=["reports/summary/data_profile.json"],
+        ),
+        Stage(
+            name="derive_numeric",
+            module="src.features.derive_numeric",
+            inputs=[RAW_XLSX],
+            code=["src/features/derive_numeric.py", "src/features/ingest.py", "src/features/parsers.py",
+                  "src/features/memo.py", "src/data/readers.py", "src/data/typed.py",
+                  "src/data/excel_cache.py"],
+            outputs=[NUM_PARQ],
+            args=chunk_args,
+        ),
+        Stage(
+            name="eda_report",
+            module="src.visualization.eda_report",
+            inputs=[NUM_PARQ],
+            code=["src/visualization/eda_report.py", "src/visualization/eda_aggregates.py",
+                  "src/data/typed.py", "src/data/profiler.py", "src/data/dedup.py",
+                  "src/features/sketches.py"],
+            outputs=[f"reports/figures/{f}" for f in _EDA_FIGURES]
+                    + ["reports/summary/shape.csv", "reports/summary/missingness.csv",
+                       "reports/summary/duplicates_summary.csv"],
+            args=chunk_args,
+            deps=["derive_numeric"],
+        ),
+        Stage(
+            name="preprocess",
+            module="src.features.preprocess",
+            inputs=[NUM_PARQ],
+            input_dirs=[NUM_PARTS],
+            code=["src/features/preprocess.py", "src/features/derive_numeric.py",
+                  "src/features/multilabel.py", "src/features/vocab.py",
+                  "src/features/parallel.py", "src/features/tokens.py", "src/serving/compiled.py",
+                  "src/features/incremental.py", "src/features/sketches.py",
+                  "src/features/memo.py", "src/data/readers.py", "src/data/model_ready.py",
+                  "src/data/typed.py", "src/data/dedup.py"],
+            outputs=["data/processed/dataset_model_ready.parquet",
+                     "data/processed/dataset_model_ready.csv",
+                     "data/processed/dataset_model_ready_index.npz",
+                     "data/processed/known_ids.npz",
+                     "data/processed/dataset_model_ready_X.npy",
+                     "data/processed/dataset_model_ready_ids.npy",
+                     "data/processed/dataset_model_ready.json",
+                     "models/preprocess_pipeline.joblib",
+                     "models/preprocess_pipeline.json",
+                     "reports/feature_names.txt"],
+            args=chunk_args,
+            deps=["derive_numeric"],
+        ),
+    ]
+
+
+# -------- Hashing --------
+class FileHasher:
+    """sha256 of file contents, reused while (size, mtime) is unchanged."""
+
+    def __init__(self, known: dict):
+        self.known = known  # path -> {"size", "mtime_ns", "sha256"}
+
+    def __call__(self, path: str):
+        p = Path(path)
+        if not p.exists():
+            return None
+        st = p.stat()
+        rec = self.known.get(path)
+        if rec and rec["size"] == st.st_size and rec["mtime_ns"] == st.st_mtime_ns:
+            return rec["sha256"]
+        h = hashlib.sha256()
+        with p.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.known[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+
+def input_files(stage: Stage) -> list:
+    return [p.as_posix() for d in stage.input_dirs for p in sorted(Path(d).glob("*.parquet"))]
+
+
+def fingerprint(stage: Stage, hasher: FileHasher) -> str:
+    payload = {
+        "inputs": {p: hasher(p) for p in stage.inputs + input_files(stage)},
+        "code": {p: hasher(p) for p in stage.code},
+        "params": {"module": stage.module, "args": stage.args},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+# -------- Manifest --------
+def load_manifest(path: Path = MANIFEST) -> dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"stages": {}, "files": {}}
+
+
+def save_manifest(manifest: dict, path: Path = MANIFEST) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+
+
+def stale_reason(stage: Stage, manifest: dict, hasher: FileHasher):
+    """Return why `stage` must run, or None if it is up to date."""
+    missing_inputs = [p for p in stage.inputs if not Path(p).exists()]
+    if missing_inputs:
+        return f"missing input {missing_inputs[0]}"
+    rec = manifest["stages"].get(stage.name)
+    if rec is None:
+        return "never built"
+    if rec["fingerprint"] != fingerprint(stage, hasher):
+        return "inputs/code/params changed"
+    for p in stage.outputs:
+        if hasher(p) is None:
+            return f"missing output {p}"
+        if rec["outputs"].get(p) != hasher(p):
+            return f"output modified {p}"
+    return None
+
+
+def select(stages: list, names: list) -> list:
+    """Requested stages plus their upstream dependencies, in declaration order."""
+    if not names:
+        return stages
+    by_name = {s.name: s for s in stages}
+    unknown = [n for n in names if n not in by_name]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {unknown}. Known: {list(by_name)}")
+    wanted = set()
+    todo = list(names)
+    while todo:
+        n = todo.pop()
+        if n not in wanted:
+            wanted.add(n)
+            todo.extend(by_name[n].deps)
+    return [s for s in stages if s.name in wanted]
+
+
+def run(names=None, force=False, dry_run=False, chunksize=None) -> int:
+    manifest = load_manifest()
+    hasher = FileHasher(manifest.setdefault("files", {}))
+    n_run = 0
+    would_run = set()
+    for stage in select(default_stages(chunksize), names or []):
+        reason = "forced" if force else stale_reason(stage, manifest, hasher)
+        if reason is None and dry_run and would_run.intersection(stage.deps):
+            reason = "upstream would run"
+        if reason is None:
+            print(f"⏭  {stage.name}: up to date")
+            continue
+        if dry_run:
+            print(f"▶ {stage.name}: would run ({reason})")
+            would_run.add(stage.name)
+            n_run += 1
+            continue
+        print(f"▶ {stage.name}: running ({reason})")
+        for p in stage.outputs:
+            Path(p).parent.mkdir(parents=True, exist_ok=True)
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-m", stage.module, *stage.args])
+        if proc.returncode != 0:
+            print(f"❌ {stage.name} failed (exit {proc.returncode})")
+            save_manifest(manifest)
+            return proc.returncode
+        manifest["stages"][stage.name] = {
+            "fingerprint": fingerprint(stage, hasher),
+            "outputs": {p: hasher(p) for p in stage.outputs},
+            "args": stage.args,
+            "seconds": round(time.perf_counter() - t0, 3),
+        }
+        save_manifest(manifest)
+        n_run += 1
+    print(f"✅ {n_run} stage(s) {'would run' if dry_run else 'run'}")
+    return 0
+
+
+def _recorded(name: str, manifest: dict) -> Stage:
+    """Stage `name` with the arguments of its last run (e.g. --chunksize)."""
+    stage = {s.name: s for s in default_stages()}[name]
+    rec = manifest["stages"].get(name)
+    if rec is not None:
+        stage.args = rec.get("args", stage.args)
+    return stage
+
+
+def is_current(name: str) -> bool:
+    """True if stage `name` was built and is up to date."""
+    manifest = load_manifest()
+    hasher = FileHasher(manifest.setdefault("files", {}))
+    return stale_reason(_recorded(name, manifest), manifest, hasher) is None
+
+
+def refresh(name: str) -> None:
+    """Record the current inputs and outputs of stage `name` as its own (see module docstring)."""
+    manifest = load_manifest()
+    hasher = FileHasher(manifest.setdefault("files", {}))
+    stage = _recorded(name, manifest)
+    manifest["stages"][name].update(fingerprint=fingerprint(stage, hasher),
+                                    outputs={p: hasher(p) for p in stage.outputs})
+    save_manifest(manifest)
+
+
+def status() -> int:
+    manifest = load_manifest()
+    hasher = FileHasher(manifest.setdefault("files", {}))
+    for stage in default_stages():
+        reason = stale_reason(_recorded(stage.name, manifest), manifest, hasher)
+        print(f"{stage.name:16s} {'up to date' if reason is None else 'STALE: ' + reason}")
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m src.pipeline", description=__doc__.splitlines()[1])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_run = sub.add_parser("run", help="rebuild stale stages")
+    p_run.add_argument("stages", nargs="*", help="stage names (default: all)")
+    p_run.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    p_run.add_argument("--dry-run", action="store_true", help="only print what would run")
+    p_run.add_argument("--chunksize", type=int, default=None,
+                       help="pass --chunksize to derive_numeric and preprocess")
+    sub.add_parser("status", help="show stale/up-to-date stages")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "run":
+        return run(args.stages, force=args.force, dry_run=args.dry_run, chunksize=args.chunksize)
+    return status()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""
+"Compiled" fast path for a fitted preprocess ColumnTransformer.
+
+`ct.transform(pd.DataFrame([...]))` spends most of a single-record call on
+DataFrame construction and ColumnTransformer dispatch. CompiledPreprocessor
+exports the fitted state as plain lookup tables
+
+- num : imputer fill values, scaler mean_ / scale_
+- cat : imputer fill values, OHE category -> column index maps (infrequent
+        categories share their column, which also takes unseen values)
+- mlb : token -> column index maps (MultiLabelBinarizerDF vocabulary, __other__ column)
+- hash: bucket width and sign rule (HashingMultiLabelDF, no table needed)
+
+and turns dicts (or small batches of dicts) straight into numpy / CSR rows.
+
+Values match `ct.transform(pd.DataFrame(records))` bit for bit: the same
+float64 operations run in the same order. As in SimpleImputer on object
+data, only NaN is imputed in categorical columns; a None cell is looked
+up as a category (pandas keeps None in object columns).
+
+`save()` writes the tables to models/preprocess_pipeline.json (written by
+every preprocess run); `load("....json")` rebuilds them with numpy only,
+so short jobs skip importing pandas, scipy and sklearn and unpickling:
+
+    python -m src transform --input records.jsonl --output X.npy
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+from pathlib import Path
+from typing import Iterable, Mapping
+
+import numpy as np
+
+from src import perf
+from src.features.tokens import _cell_buckets, _cell_tokens
+
+PIPELINE = "models/preprocess_pipeline.joblib"
+ARTIFACT = "models/preprocess_pipeline.json"
+FORMAT = "compiled-preprocessor/1"
+
+
+def _is_nan(v) -> bool:
+    return isinstance(v, float) and math.isnan(v)
+
+
+def _coo(rows, cols, vals):
+    return (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+            np.asarray(vals, dtype=np.float64))
+
+
+class _NumericBlock:
+    """SimpleImputer(median/mean/constant) -> StandardScaler."""
+
+    kind = "num"
+
+    def __init__(self, cols, fill, mean, scale, offset):
+        self.cols = list(cols)
+        self.fill = [float(x) for x in fill]
+        self.mean = [float(x) for x in mean] if mean is not None else None
+        self.scale = [float(x) for x in scale] if scale is not None else None
+        self.offset = offset
+        self.positions = list(range(offset, offset + len(self.cols)))
+
+    @classmethod
+    def from_fitted(cls, cols, imputer, scaler, offset):
+        stats = np.asarray(imputer.statistics_, dtype=np.float64)
+        keep = ~np.isnan(stats) | bool(getattr(imputer, "keep_empty_features", False))
+        mean = getattr(scaler, "mean_", None) if scaler is not None and scaler.with_mean else None
+        scale = getattr(scaler, "scale_", None) if scaler is not None and scaler.with_std else None
+        return cls([c for c, k in zip(cols, keep) if k], [x for x, k in zip(stats, keep) if k],
+                   mean, scale, offset)
+
+    def state(self) -> dict:
+        return {"cols": self.cols, "fill": self.fill, "mean": self.mean, "scale": self.scale,
+                "offset": self.offset}
+
+    def emit(self, rec, idx, val):
+        for k, c in enumerate(self.cols):
+            v = rec.get(c)
+            x = self.fill[k] if v is None or _is_nan(v) else float(v)
+            if self.mean is not None:
+                x = x - self.mean[k]
+            if self.scale is not None:
+                x = x / self.scale[k]
+            idx.append(self.positions[k])
+            val.append(x)
+
+    def emit_batch(self, records):
+        # same float64 operations as emit(), elementwise over the whole batch
+        X = np.empty((len(records), len(self.cols)), dtype=np.float64)
+        for k, c in enumerate(self.cols):
+            X[:, k] = [self.fill[k] if v is None or _is_nan(v) else float(v)
+                       for v in (rec.get(c) for rec in records)]
+        if self.mean is not None:
+            X -= np.asarray(self.mean)
+        if self.scale is not None:
+            X /= np.asarray(self.scale)
+        return (np.repeat(np.arange(len(records)), len(self.cols)),
+                np.tile(np.asarray(self.positions, dtype=np.int64), len(records)), X.ravel())
+
+
+class _OneHotBlock:
+    """SimpleImputer(most_frequent/constant) -> OneHotEncoder(handle_unknown='ignore' or 'infrequent_if_exist')."""
+
+    kind = "ohe"
+
+    def __init__(self, cols, fill, categories, other=None):
+        # categories: per column, [category, output column] pairs (None is a valid category);
+        # other: per column, the infrequent column that takes unseen values (or None)
+        self.cols = list(cols)
+        self.fill = list(fill)
+        self.categories = [[[cat, int(j)] for cat, j in pairs] for pairs in categories]
+        self.lookup = [{cat: j for cat, j in pairs} for pairs in self.categories]
+        self.other = list(other) if other is not None else [None] * len(self.cols)
+
+    @classmethod
+    def from_fitted(cls, cols, imputer, ohe, offset):
+        if getattr(ohe, "drop_idx_", None) is not None:
+            raise TypeError("OneHotEncoder(drop=...) is not supported by the compiled path.")
+        fill = list(imputer.statistics_) if imputer is not None else [np.nan] * len(cols)
+        infrequent = (ohe._infrequent_indices if getattr(ohe, "_infrequent_enabled", False)
+                      else [None] * len(ohe.categories_))
+        categories, other, pos = [], [], offset
+        for cats, rare in zip(ohe.categories_, infrequent):
+            rare = set() if rare is None else set(rare.tolist())
+            rare_col = pos + len(cats) - len(rare) if rare else None  # infrequent column comes last
+            pairs = []
+            for i, cat in enumerate(cats):
+                j = rare_col if i in rare else pos
+                if not _is_nan(cat):
+                    pairs.append([cat, j])
+                if i not in rare:
+                    pos += 1
+            pos += 1 if rare else 0
+            categories.append(pairs)
+            other.append(rare_col if ohe.handle_unknown == "infrequent_if_exist" else None)
+        return cls(cols, fill, categories, other)
+
+    def state(self) -> dict:
+        return {"cols": self.cols, "fill": self.fill, "categories": self.categories, "other": self.other}
+
+    def _column(self, k, v):
+        if _is_nan(v):
+            v = self.fill[k]
+            if _is_nan(v):
+                return None
+        return self.lookup[k].get(v, self.other[k])
+
+    def emit(self, rec, idx, val):
+        for k, c in enumerate(self.cols):
+            j = self._column(k, rec.get(c, np.nan))
+            if j is not None:
+                idx.append(j)
+                val.append(1.0)
+
+    def emit_batch(self, records):
+        rows, cols = [], []
+        for k, c in enumerate(self.cols):  # column by column; rows are put in order later
+            for i, rec in enumerate(records):
+                j = self._column(k, rec.get(c, np.nan))
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+        return _coo(rows, cols, np.ones(len(rows)))
+
+
+class _MultiLabelBlock:
+    kind = "mlb"
+
+    def __init__(self, cols, lookup, other):
+        self.cols = list(cols)
+        self.lookup = [dict(table) for table in lookup]
+        self.other = list(other)
+
+    @classmethod
+    def from_fitted(cls, mlb, offset):
+        index = mlb._column_index()
+        cols = list(mlb.columns)
+        others = getattr(mlb, "_other_", {})
+        return cls(cols, [{tok: offset + j for tok, j in index.get(c, {}).items()} for c in cols],
+                   [offset + others[c] if c in others else None for c in cols])
+
+    def state(self) -> dict:
+        return {"cols": self.cols, "lookup": self.lookup, "other": self.other}
+
+    def _hits(self, rec):
+        hits = set()
+        for k, c in enumerate(self.cols):
+            table = self.lookup[k]
+            for tok in _cell_tokens(rec.get(c)):
+                j = table.get(tok, self.other[k])
+                if j is not None:
+                    hits.add(j)
+        return sorted(hits)
+
+    def emit(self, rec, idx, val):
+        for j in self._hits(rec):
+            idx.append(j)
+            val.append(1.0)
+
+    def emit_batch(self, records):
+        rows, cols = [], []
+        for i, rec in enumerate(records):
+            hits = self._hits(rec)
+            rows += [i] * len(hits)
+            cols += hits
+        return _coo(rows, cols, np.ones(len(rows)))
+
+
+class _HashingBlock:
+    kind = "hash"
+
+    def __init__(self, cols, n_features, alternate_sign, offset):
+        self.cols = list(cols)
+        self.n_features = int(n_features)
+        self.alternate_sign = bool(alternate_sign)
+        self.offset = offset
+
+    @classmethod
+    def from_fitted(cls, hasher, offset):
+        return cls(hasher.columns, hasher.n_features, hasher.alternate_sign, offset)
+
+    def state(self) -> dict:
+        return {"cols": self.cols, "n_features": self.n_features,
+                "alternate_sign": self.alternate_sign, "offset": self.offset}
+
+    def _buckets(self, rec):
+        acc = {}
+        for c in self.cols:
+            cell_idx, cell_val = _cell_buckets(c, self.n_features, self.alternate_sign, rec.get(c))
+            for j, v in zip(cell_idx.tolist(), cell_val.tolist()):
+                acc[j] = acc.get(j, 0.0) + v
+        return [(self.offset + j, acc[j]) for j in sorted(acc) if acc[j] != 0.0]
+
+    def emit(self, rec, idx, val):
+        for j, v in self._buckets(rec):
+            idx.append(j)
+            val.append(v)
+
+    def emit_batch(self, records):
+        rows, cols, vals = [], [], []
+        for i, rec in enumerate(records):
+            for j, v in self._buckets(rec):
+                rows.append(i)
+                cols.append(j)
+                vals.append(v)
+        return _coo(rows, cols, vals)
+
+
+_BLOCKS = {cls.kind: cls for cls in (_NumericBlock, _OneHotBlock, _MultiLabelBlock, _HashingBlock)}
+
+
+def _compile_branch(trans, cols, offset):
+    from sklearn.pipeline import Pipeline
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from src.features.multilabel import HashingMultiLabelDF, MultiLabelBinarizerDF
+
+    if isinstance(trans, MultiLabelBinarizerDF):
+        return _MultiLabelBlock.from_fitted(trans, offset)
+    if isinstance(trans, HashingMultiLabelDF):
+        return _HashingBlock.from_fitted(trans, offset)
+    steps = [s for _, s in trans.steps] if isinstance(trans, Pipeline) else [trans]
+    imputer = steps[0] if isinstance(steps[0], SimpleImputer) else None
+    rest = steps[1:] if imputer is not None else steps
+    if len(rest) == 1 and isinstance(rest[0], OneHotEncoder):
+        return _OneHotBlock.from_fitted(cols, imputer, rest[0], offset)
+    if imputer is not None and (not rest or (len(rest) == 1 and isinstance(rest[0], StandardScaler))):
+        return _NumericBlock.from_fitted(cols, imputer, rest[0] if rest else None, offset)
+    raise TypeError(f"Cannot compile transformer {trans!r}")
+
+
+def _json_default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"Not JSON serializable: {o!r}")
+
+
+class CompiledPreprocessor:
+    """Plain-lookup-table version of a fitted preprocess ColumnTransformer."""
+
+    def __init__(self, blocks, n_features, sparse_output, feature_names):
+        self.blocks = blocks
+        self.n_features = n_features
+        self.sparse_output = sparse_output
+        self.feature_names = feature_names
+
+    @classmethod
+    def from_pipeline(cls, ct) -> "CompiledPreprocessor":
+        blocks = []
+        for name, trans, cols in ct.transformers_:
+            if name == "remainder" or trans in ("drop", "passthrough"):
+                if trans == "passthrough" and len(cols):
+                    raise TypeError("remainder='passthrough' is not supported by the compiled path.")
+                continue
+            sl = ct.output_indices_[name]
+            if sl.stop == sl.start:
+                continue
+            blocks.append(_compile_branch(trans, cols, sl.start))
+        names = list(ct.get_feature_names_out())
+        return cls(blocks, len(names), bool(getattr(ct, "sparse_output_", False)), names)
+
+    def to_state(self) -> dict:
+        return {"format": FORMAT, "n_features": self.n_features, "sparse_output": self.sparse_output,
+                "feature_names": self.feature_names,
+                "blocks": [{"kind": b.kind, **b.state()} for b in self.blocks]}
+
+    @classmethod
+    def from_state(cls, state: Mapping) -> "CompiledPreprocessor":
+        if state.get("format") != FORMAT:
+            raise ValueError(f"Unsupported artifact format {state.get('format')!r} (expected {FORMAT!r})")
+        blocks = [_BLOCKS[b["kind"]](**{k: v for k, v in b.items() if k != "kind"}) for b in state["blocks"]]
+        return cls(blocks, state["n_features"], state["sparse_output"], list(state["feature_names"]))
+
+    def save(self, path=ARTIFACT) -> None:
+        """
+        Write the lookup tables as JSON: loading them needs numpy only (no
+        sklearn/scipy/pandas, no pickle). Floats are written with repr(), so
+        they round-trip exactly; NaN fills are written as NaN.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.to_state(), ensure_ascii=False, default=_json_default),
+                            encoding="utf-8")
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path=PIPELINE) -> "CompiledPreprocessor":
+        """From the JSON artifact (`.json`) or the fitted joblib pipeline."""
+        if Path(path).suffix == ".json":
+            return cls.from_state(json.loads(Path(path).read_text(encoding="utf-8")))
+        from joblib import load
+        return cls.from_pipeline(load(path))
+
+    def _row(self, rec: Mapping):
+        idx, val = [], []
+        for block in self.blocks:
+            block.emit(rec, idx, val)
+        return idx, val
+
+    def transform_one(self, rec: Mapping) -> np.ndarray:
+        """Dense float64 feature vector for one record."""
+        out = np.zeros(self.n_features, dtype=np.float64)
+        idx, val = self._row(rec)
+        out[idx] = val
+        return out
+
+    def _coo(self, records: list):
+        # block by block over the whole batch (numerics vectorized); rows unordered
+        parts = [b.emit_batch(records) for b in self.blocks] or [_coo([], [], [])]
+        return tuple(np.concatenate(p) for p in zip(*parts))
+
+    def transform_csr(self, records: Iterable[Mapping]):
+        """
+        (indptr, indices, data) of a batch, rows in order and columns sorted
+        within a row; like `_row`, entries include explicit zeros.
+        """
+        records = list(records)
+        rows, cols, vals = self._coo(records)
+        order = np.argsort(rows, kind="stable")  # blocks are emitted in column order
+        indptr = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(records)), out=indptr[1:])
+        return indptr, cols[order], vals[order]
+
+    def transform_dense(self, records: Iterable[Mapping]) -> np.ndarray:
+        records = list(records)
+        rows, cols, vals = self._coo(records)
+        out = np.zeros((len(records), self.n_features), dtype=np.float64)
+        out[rows, cols] = vals
+        return out
+
+    def transform_sparse(self, records: Iterable[Mapping]):
+        from scipy import sparse
+
+        indptr, indices, data = self.transform_csr(records)
+        nonzero = data != 0.0
+        indptr = np.concatenate([[0], np.cumsum(nonzero)])[indptr]  # row bounds after dropping zeros
+        return sparse.csr_matrix((data[nonzero], indices[nonzero].astype(np.int32), indptr),
+                                 shape=(len(indptr) - 1, self.n_features))
+
+    def transform(self, records: Iterable[Mapping]):
+        """Same output type as the fitted ColumnTransformer (dense or CSR)."""
+        return self.transform_sparse(records) if self.sparse_output else self.transform_dense(records)
+
+
+def _read_records(path: Path) -> list:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    data = json.loads(text)
+    return data if isinstance(data, list) else data.get("records", [data])
+
+
+@perf.instrument_stage("transform")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Transform JSON records with the compiled pipeline.")
+    ap.add_argument("--input", type=Path, required=True,
+                    help=".jsonl (one record per line) or .json (list / {\"records\": [...]} / one record)")
+    ap.add_argument("--output", type=Path, required=True, help=".npy (dense) or .npz (CSR) output")
+    ap.add_argument("--pipeline", default=ARTIFACT, help=".json artifact (numpy only) or .joblib pipeline")
+    args = ap.parse_args(argv)
+
+    assert args.input.exists(), f"Data file not found: {args.input}"
+    assert Path(args.pipeline).exists(), \
+        f"Missing {args.pipeline} (run `python -m src preprocess` first)"
+    with perf.step("load"):
+        compiled = CompiledPreprocessor.load(args.pipeline)
+    perf.note_read(args.input)
+    records = _read_records(args.input)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with perf.step("transform", rows=len(records)):
+        if args.output.suffix == ".npz":
+            from scipy import sparse
+            sparse.save_npz(args.output, compiled.transform_sparse(records))
+        else:
+            np.save(args.output, compiled.transform_dense(records))
+    perf.note_written(args.output)
+    perf.set_rows(rows_in=len(records), rows_out=len(records))
+    print(f"✅ Transformed {len(records)} records -> {args.output} ({compiled.n_features} features)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Local online-transform server around CompiledPreprocessor.
+
+Requests are collected by a micro-batcher: the first waiting request opens a
+batch, which is flushed when it holds `--max-batch` records or when
+`--max-latency-ms` has passed, whichever comes first (0 ms = no waiting).
+The records of a batch are transformed in one `transform_csr` call
+(column-wise, numerics vectorized) and the rows handed back per request.
+A request still unanswered after `--timeout-s` gets a 504; a batch that
+fails unexpectedly fails its own requests, and the worker keeps serving.
+
+Endpoints (JSON):
+    POST /transform   {"records": [{...}, ...]} or a single record {...}
+                      -> {"features": [[...], ...]}
+                      ?format=sparse -> {"rows": [{"indices": [...], "data": [...]}, ...]}
+    GET  /features    -> {"feature_names": [...]}
+    GET  /health      -> {"status": "ok", ...}
+
+Usage:
+    python -m src.serving.server --port 8000
+    python -m src.serving.server --unix /tmp/preprocess.sock --max-latency-ms 1
+    curl --unix-socket /tmp/preprocess.sock -d '{"Yas": 40}' http://x/transform
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from src.serving.compiled import ARTIFACT, PIPELINE, CompiledPreprocessor
+
+REQUEST_TIMEOUT_S = 30.0  # longest a request waits for its rows
+
+
+class MicroBatcher:
+    """Single worker thread that transforms queued requests in batches (one transform per batch)."""
+
+    def __init__(self, compiled: CompiledPreprocessor, max_batch: int = 64, max_latency_ms: float = 2.0):
+        self.compiled = compiled
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max(0.0, max_latency_ms) / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self.n_batches = 0
+        self.n_records = 0
+        self._worker = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, records: list) -> Future:
+        fut: Future = Future()
+        self._queue.put((records, fut))
+        return fut
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_latency
+            while size < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            # requests that timed out while queued were cancelled: skip them
+            batch = [(records, fut) for records, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._run(batch)
+            except BaseException as exc:  # never leave a request waiting, never stop the worker
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                if not isinstance(exc, Exception):
+                    raise
+
+    def _run(self, batch):
+        try:
+            indptr, indices, data = self.compiled.transform_csr([rec for records, _ in batch for rec in records])
+        except Exception:
+            # a bad record only fails its own request: redo the batch request by request
+            for records, fut in batch:
+                try:
+                    fut.set_result(self.compiled.transform_csr(records))
+                except Exception as exc:
+                    fut.set_exception(exc)
+        else:
+            start = 0
+            for records, fut in batch:
+                lo, hi = indptr[start], indptr[start + len(records)]
+                fut.set_result((indptr[start:start + len(records) + 1] - lo, indices[lo:hi], data[lo:hi]))
+                start += len(records)
+        self.n_batches += 1
+        self.n_records += sum(len(records) for records, _ in batch)
+
+
+def _sparse(rows):
+    indptr, indices, data = rows
+    return [{"indices": indices[a:b].tolist(), "data": data[a:b].tolist()}
+            for a, b in zip(indptr[:-1], indptr[1:])]
+
+
+def _dense(rows, n_features):
+    indptr, indices, data = rows
+    out = np.zeros((len(indptr) - 1, n_features), dtype=np.float64)
+    out[np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)), indices] = data
+    return out.tolist()
+
+
+def make_handler(batcher: MicroBatcher, timeout: float = REQUEST_TIMEOUT_S):
+    compiled = batcher.compiled
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                self._send(200, {"status": "ok", "n_features": compiled.n_features,
+                                 "batches": batcher.n_batches, "records": batcher.n_records})
+            elif path == "/features":
+                self._send(200, {"feature_names": compiled.feature_names})
+            else:
+                self._send(404, {"error": f"unknown path {path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/transform":
+                self._send(404, {"error": f"unknown path {url.path}"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                records = payload["records"] if isinstance(payload, dict) and "records" in payload else payload
+                if isinstance(records, dict):
+                    records = [records]
+                if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+                    raise ValueError("expected a record object or {'records': [...]}")
+                fut = batcher.submit(records)
+                rows = fut.result(timeout=timeout)
+            except FutureTimeout:
+                fut.cancel()  # still queued: the worker skips it
+                self._send(504, {"error": f"no result within {timeout}s"})
+                return
+            except Exception as exc:
+                self._send(400, {"error": str(exc)})
+                return
+            if parse_qs(url.query).get("format") == ["sparse"]:
+                self._send(200, {"rows": _sparse(rows)})
+            else:
+                self._send(200, {"features": _dense(rows, compiled.n_features)})
+
+        def address_string(self):
+            return str(self.client_address[0]) if self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve the fitted preprocess pipeline over HTTP.")
+    ap.add_argument("--pipeline", default=None,
+                    help=f"default: {ARTIFACT} (numpy-only load) if present, else {PIPELINE}")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--unix", default=None, help="listen on a Unix socket path instead of TCP")
+    ap.add_argument("--max-batch", type=int, default=64, help="records per micro-batch")
+    ap.add_argument("--max-latency-ms", type=float, default=2.0,
+                    help="longest a request waits for its batch to fill")
+    ap.add_argument("--timeout-s", type=float, default=REQUEST_TIMEOUT_S,
+                    help="answer 504 if a request has no result after this long")
+    args = ap.parse_args(argv)
+
+    if args.pipeline is None:
+        args.pipeline = ARTIFACT if os.path.exists(ARTIFACT) else PIPELINE
+    compiled = CompiledPreprocessor.load(args.pipeline)
+    handler = make_handler(MicroBatcher(compiled, args.max_batch, args.max_latency_ms), args.timeout_s)
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.unlink(args.unix)
+        server = ThreadingUnixHTTPServer(args.unix, handler)
+        where = f"unix:{args.unix}"
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        where = f"http://{args.host}:{args.port}"
+    print(f"✅ Serving {args.pipeline} ({compiled.n_features} features) on {where}")
+    print(f"Micro-batching: max_batch={args.max_batch}, max_latency_ms={args.max_latency_ms}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+if __name__ == "__main__":
+    main()
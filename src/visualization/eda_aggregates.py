@@ -0,0 +1,405 @@
+"""
+Large-data EDA: one streaming pass over the interim parquet builds small,
+persisted aggregates, and every figure is drawn from those.
+
+- histograms     : fixed bins (numpy edges from the column range, taken from
+                   the parquet row-group statistics), counts added per chunk
+- scatter        : 2-D histogram density instead of millions of points
+- correlation    : pairwise-complete Pearson from running sums
+- boxplots       : one QuantileSketch (t-digest style, exact while a group
+                   has < max_centroids distinct values) per category; boxes
+                   are drawn with matplotlib's `bxp` from the sketch stats
+                   (titled "approx." once a group's sketch is compressed)
+- missingness, top counts, duplicates / unique ids (exact up to a limit,
+  HyperLogLog above, see src.data.profiler.DistinctCounter)
+
+The aggregates are written to AGG_PATH (JSON, a few hundred KB at most) with
+the source file's size/mtime, so figures can be re-rendered without
+rescanning the data.
+"""
+from __future__ import annotations
+
+import json
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from src import perf
+from src.data.dedup import column_hash, combine_hashes
+from src.data.profiler import DistinctCounter
+from src.features.sketches import QuantileSketch
+
+AGG_PATH = Path("data/interim/eda_aggregates.json")
+DEFAULT_CHUNKSIZE = 200_000
+NUMERIC_COLS = ["Yas", "TedaviSuresi_num", "UygulamaSuresi_min"]
+SCATTER = ("Yas", "TedaviSuresi_num")
+BOXES = [("Cinsiyet", "TedaviSuresi_num", None, "box_tedavi_by_cinsiyet.png"),
+         ("Bolum", "TedaviSuresi_num", 8, "box_tedavi_by_bolum_top8.png")]
+TOP_COLS = ["KanGrubu", "Uyruk", "Bolum", "TedaviAdi"]
+HIST_BINS = 30
+DENSITY_BINS = 60
+TOP_KEEP = 100  # categories kept per top-count table
+
+
+# -------- Ranges --------
+def numeric_ranges(path, cols, chunksize=DEFAULT_CHUNKSIZE) -> dict:
+    """(min, max) per column from parquet statistics; one narrow pass if missing."""
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    names = [meta.schema.column(j).name for j in range(meta.num_columns)]
+    out, missing = {}, []
+    for col in cols:
+        j = names.index(col)
+        lo, hi, ok = np.inf, -np.inf, True
+        for i in range(meta.num_row_groups):
+            st = meta.row_group(i).column(j).statistics
+            if st is None or not st.has_min_max:
+                ok = False
+                break
+            if meta.row_group(i).column(j).num_values > (st.null_count or 0):
+                lo, hi = min(lo, float(st.min)), max(hi, float(st.max))
+        if ok:
+            out[col] = (lo, hi)
+        else:
+            missing.append(col)
+    if missing:
+        lo = {c: np.inf for c in missing}
+        hi = {c: -np.inf for c in missing}
+        for batch in pf.iter_batches(batch_size=chunksize, columns=missing):
+            for c in missing:
+                v = pd.to_numeric(batch.column(c).to_pandas(), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+                if not np.isnan(v).all():
+                    lo[c], hi[c] = min(lo[c], np.nanmin(v)), max(hi[c], np.nanmax(v))
+        out.update({c: (lo[c], hi[c]) for c in missing})
+    return out
+
+
+def _edges(lo, hi, bins):
+    if not np.isfinite(lo):
+        return None
+    # same edges np.histogram / seaborn derive from data spanning [lo, hi]
+    return np.histogram_bin_edges(np.array([lo, hi]), bins=bins)
+
+
+# -------- Accumulation --------
+def _numeric(s: pd.Series) -> np.ndarray:
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+class _PairwiseCorr:
+    """Pairwise-complete Pearson correlation (as DataFrame.corr) from shifted sums."""
+
+    def __init__(self, cols):
+        self.cols = list(cols)
+        k = len(cols)
+        self.shift = None
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sy = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.syy = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def update(self, values: np.ndarray) -> None:
+        if self.shift is None:  # centre on the first chunk's means against cancellation
+            with np.errstate(all="ignore"):
+                self.shift = np.nan_to_num(np.nanmean(values, axis=0))
+        v = values - self.shift
+        for i in range(len(self.cols)):
+            for j in range(i, len(self.cols)):
+                ok = ~np.isnan(v[:, i]) & ~np.isnan(v[:, j])
+                x, y = v[ok, i], v[ok, j]
+                self.n[i, j] += len(x)
+                self.sx[i, j] += x.sum()
+                self.sy[i, j] += y.sum()
+                self.sxx[i, j] += (x * x).sum()
+                self.syy[i, j] += (y * y).sum()
+                self.sxy[i, j] += (x * y).sum()
+
+    def matrix(self) -> list:
+        k = len(self.cols)
+        out = np.full((k, k), np.nan)
+        for i in range(k):
+            for j in range(i, k):
+                n = self.n[i, j]
+                if n < 2:
+                    continue
+                cov = self.sxy[i, j] - self.sx[i, j] * self.sy[i, j] / n
+                vx = self.sxx[i, j] - self.sx[i, j] ** 2 / n
+                vy = self.syy[i, j] - self.sy[i, j] ** 2 / n
+                if vx > 0 and vy > 0:
+                    out[i, j] = out[j, i] = cov / np.sqrt(vx * vy)
+        return [[None if np.isnan(x) else float(x) for x in row] for row in out]
+
+
+def _sketch_dict(sk: QuantileSketch) -> dict:
+    return {"means": sk.means.tolist(), "weights": sk.weights.tolist(), "exact": sk.exact,
+            "min": sk.min if len(sk.means) else None, "max": sk.max if len(sk.means) else None}
+
+
+def _sketch_from(d: dict) -> QuantileSketch:
+    sk = QuantileSketch()
+    sk.means = np.asarray(d["means"], dtype=np.float64)
+    sk.weights = np.asarray(d["weights"], dtype=np.float64)
+    sk.exact = d["exact"]
+    if len(sk.means):  # aggregates written before min/max were kept: centroid range
+        sk.min = d["min"] if d.get("min") is not None else float(sk.means[0])
+        sk.max = d["max"] if d.get("max") is not None else float(sk.means[-1])
+    return sk
+
+
+def _label(v):
+    return None if v is None or (isinstance(v, float) and np.isnan(v)) else str(v)
+
+
+def accumulate(chunks, ranges: dict, exact_limit: int = 1_000_000) -> dict:
+    """One pass over `chunks` -> JSON-serializable aggregates."""
+    rows, columns = 0, None
+    missing = Counter()
+    edges = {c: _edges(*ranges[c], HIST_BINS) for c in NUMERIC_COLS if c in ranges}
+    hist = {c: np.zeros(HIST_BINS, dtype=np.int64) for c, e in edges.items() if e is not None}
+    sx, sy = SCATTER
+    dens_edges = None
+    if sx in ranges and sy in ranges and np.isfinite(ranges[sx][0]) and np.isfinite(ranges[sy][0]):
+        dens_edges = (_edges(*ranges[sx], DENSITY_BINS), _edges(*ranges[sy], DENSITY_BINS))
+        density = np.zeros((DENSITY_BINS, DENSITY_BINS), dtype=np.int64)
+    corr = None
+    boxes = {}
+    tops = {}
+    row_distinct = DistinctCounter(exact_limit)
+    ids = DistinctCounter(exact_limit)
+
+    for chunk in perf.timed_iter(chunks, "read"):
+        if columns is None:
+            columns = list(chunk.columns)
+            num_cols = [c for c in NUMERIC_COLS if c in columns]
+            corr = _PairwiseCorr(num_cols) if len(num_cols) >= 2 else None
+            boxes = {(cat, y): {} for cat, y, _, _ in BOXES if cat in columns and y in columns}
+            tops = {c: Counter() for c in TOP_COLS if c in columns}
+        with perf.step("aggregate", rows=len(chunk)):
+            rows += len(chunk)
+            missing.update(chunk.isna().sum().to_dict())
+            num = {c: _numeric(chunk[c]) for c in num_cols}
+            for c, counts in hist.items():
+                counts += np.histogram(num[c][~np.isnan(num[c])], bins=edges[c])[0]
+            if dens_edges is not None:
+                ok = ~np.isnan(num[sx]) & ~np.isnan(num[sy])
+                density += np.histogram2d(num[sx][ok], num[sy][ok], bins=dens_edges)[0].astype(np.int64)
+            if corr is not None:
+                corr.update(np.column_stack([num[c] for c in num_cols]))
+            for (cat, y), sketches in boxes.items():
+                yv = num[y] if y in num else _numeric(chunk[y])
+                labels = chunk[cat].to_numpy(dtype=object, na_value=None)
+                ok = ~np.isnan(yv)
+                codes, uniques = pd.factorize(pd.Series(labels[ok], dtype=object), use_na_sentinel=False)
+                for k, u in enumerate(uniques):
+                    sketches.setdefault(_label(u), QuantileSketch()).update(yv[ok][codes == k])
+            for c, counter in tops.items():
+                vc = chunk[c].value_counts(dropna=True)
+                counter.update({str(k): int(v) for k, v in vc.items() if v > 0})
+            hashes = [column_hash(chunk[c]) for c in columns]
+            row_distinct.update(combine_hashes(hashes, len(chunk)))
+            if "HastaNo" in columns:
+                h = hashes[columns.index("HastaNo")]
+                ids.update(h[chunk["HastaNo"].notna().to_numpy()])
+
+    if columns is None:
+        raise ValueError("No rows to aggregate.")
+    agg = {
+        "rows": rows,
+        "columns": columns,
+        "missing": {c: int(missing.get(c, 0)) for c in columns},
+        "hist": {c: {"edges": edges[c].tolist(), "counts": hist[c].tolist()} for c in hist},
+        "corr": {"cols": corr.cols, "matrix": corr.matrix()} if corr is not None else None,
+        "boxes": {f"{cat}|{y}": [[label, _sketch_dict(sk)] for label, sk in sketches.items()]
+                  for (cat, y), sketches in boxes.items()},
+        "top": {c: counter.most_common(TOP_KEEP) for c, counter in tops.items()},
+        "duplicates": {
+            "duplicate_full_rows": max(rows - row_distinct.count(), 0),
+            "unique_HastaNo": ids.count() if "HastaNo" in columns else None,
+            "exact": row_distinct.exact and ids.exact,
+        },
+    }
+    if dens_edges is not None:
+        agg["density"] = {"x": sx, "y": sy, "xedges": dens_edges[0].tolist(),
+                          "yedges": dens_edges[1].tolist(), "counts": density.tolist()}
+    return agg
+
+
+def _stamp(path) -> dict:
+    st = Path(path).stat()
+    return {"path": str(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def build(path, chunksize: int = DEFAULT_CHUNKSIZE, out=AGG_PATH) -> dict:
+    from src.data.typed import iter_typed_chunks
+    with perf.step("ranges"):
+        ranges = numeric_ranges(path, [c for c in NUMERIC_COLS if c in _parquet_columns(path)], chunksize)
+    agg = accumulate(iter_typed_chunks(path, chunksize), ranges)
+    agg["source"] = _stamp(path)
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(agg), encoding="utf-8")
+    return agg
+
+
+def _parquet_columns(path) -> list:
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).schema_arrow.names
+
+
+def load(out=AGG_PATH, source=None):
+    """Persisted aggregates; None if missing or (with `source`) built from another file state."""
+    out = Path(out)
+    if not out.exists():
+        return None
+    agg = json.loads(out.read_text(encoding="utf-8"))
+    if source is not None and (not Path(source).exists() or agg.get("source") != _stamp(source)):
+        return None
+    return agg
+
+
+# -------- Summaries --------
+def missingness_frame(agg) -> pd.DataFrame:
+    miss = (pd.Series(agg["missing"], dtype="float64") / agg["rows"] * 100).sort_values(ascending=False)
+    miss_df = miss.reset_index()
+    miss_df.columns = ["column", "missing_pct"]
+    return miss_df
+
+
+# -------- Figures --------
+def hist_from_counts(agg, col, fig_dir):
+    h = agg["hist"][col]
+    edges, counts = np.asarray(h["edges"]), np.asarray(h["counts"])
+    plt.figure(figsize=(8, 5))
+    binned = pd.DataFrame({col: (edges[:-1] + edges[1:]) / 2, "count": counts})
+    sns.histplot(data=binned, x=col, weights="count", bins=list(edges))
+    plt.title(f"Histogram — {col}")
+    plt.xlabel(col)
+    plt.ylabel("Count")
+    plt.tight_layout()
+    plt.savefig(fig_dir / f"hist_{col}.png", dpi=150)
+    plt.close()
+
+
+def density_plot(agg, fig_dir):
+    d = agg["density"]
+    counts = np.asarray(d["counts"], dtype=np.float64)
+    plt.figure(figsize=(7, 6))
+    mesh = plt.pcolormesh(d["xedges"], d["yedges"], np.ma.masked_equal(counts, 0).T,
+                          cmap="viridis", norm="log", shading="flat")
+    plt.colorbar(mesh, label="Rows")
+    plt.xlabel(d["x"])
+    plt.ylabel(d["y"])
+    plt.title(f"Density — {d['x']} vs {d['y']} (n={int(counts.sum())})")
+    plt.tight_layout()
+    plt.savefig(fig_dir / f"scatter_{d['x']}_vs_{d['y']}.png", dpi=150)
+    plt.close()
+
+
+def corr_from_matrix(agg, fig_dir):
+    cols = agg["corr"]["cols"]
+    corr = pd.DataFrame(agg["corr"]["matrix"], index=cols, columns=cols, dtype="float64")
+    plt.figure(figsize=(6, 5))
+    sns.heatmap(corr, annot=True, fmt=".2f", square=True)
+    plt.title("Correlation (numeric)")
+    plt.tight_layout()
+    plt.savefig(fig_dir / "corr_heatmap.png", dpi=150)
+    plt.close()
+
+
+def box_stats(sk: QuantileSketch, label) -> dict:
+    """
+    matplotlib `bxp` stats (1.5 IQR whiskers) from a sketch.
+
+    Exact while the sketch is. Once compressed, the values are centroid
+    means: a whisker ending at the true min/max (inside the fences) and the
+    outermost fliers are still exact, other whisker ends and fliers are not.
+    """
+    q1, med, q3 = sk.quantile(0.25), sk.quantile(0.5), sk.quantile(0.75)
+    lo_fence, hi_fence = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    v = np.unique(np.concatenate([sk.means, [sk.min, sk.max]]))
+    inside = v[(v >= lo_fence) & (v <= hi_fence)]
+    return {
+        "label": label, "q1": q1, "med": med, "q3": q3,
+        "whislo": float(inside.min()) if len(inside) else q1,
+        "whishi": float(inside.max()) if len(inside) else q3,
+        "fliers": v[(v < lo_fence) | (v > hi_fence)],
+    }
+
+
+def box_from_sketches(agg, cat, y, top_k, fname, fig_dir):
+    groups = [(label, _sketch_from(d)) for label, d in agg["boxes"][f"{cat}|{y}"]]
+    if top_k:
+        # as box_by_category: top_k labels by row count, the rest (and missing) -> "Other"
+        ranked = sorted((g for g in groups if g[0] is not None), key=lambda g: -g[1].count)
+        top = {label for label, _ in ranked[:top_k]}
+        merged = {}
+        for label, sk in groups:
+            key = label if label in top else "Other"
+            merged[key] = merged[key].merge(sk) if key in merged else sk
+        groups = list(merged.items())
+    else:
+        groups = [g for g in groups if g[0] is not None]
+    groups.sort(key=lambda g: -g[1].median())
+    stats = [box_stats(sk, label) for label, sk in groups]
+    approx = not all(sk.exact for _, sk in groups)
+    plt.figure(figsize=(max(7, len(stats) * 0.6), 6))
+    ax = plt.gca()
+    # seaborn's look: one fill colour, dark grey lines
+    line = {"color": "0.26", "linewidth": 1.25}
+    ax.bxp(stats, positions=range(len(stats)), widths=0.8, patch_artist=True,
+           boxprops={"facecolor": sns.color_palette()[0], "edgecolor": "0.26", "linewidth": 1.25},
+           medianprops=line, whiskerprops=line, capprops=line,
+           flierprops={"marker": "d", "markersize": 4, "markerfacecolor": "0.26", "markeredgecolor": "0.26"})
+    ax.set_xticks(range(len(stats)), [s["label"] for s in stats])
+    ax.set_xlabel(cat)
+    ax.set_ylabel(y)
+    plt.xticks(rotation=30, ha="right")
+    plt.title(f"{y} by {cat}" + (" (approx. quantiles and whiskers)" if approx else ""))
+    plt.tight_layout()
+    plt.savefig(fig_dir / fname, dpi=150)
+    plt.close()
+
+
+def top_from_counts(agg, col, fig_dir, top_n=10):
+    vc = pd.DataFrame(agg["top"][col][:top_n], columns=[col, "count"])
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=vc, x="count", y=col)
+    plt.title(f"Top {top_n} — {col}")
+    plt.tight_layout()
+    plt.savefig(fig_dir / f"top_{col}.png", dpi=150)
+    plt.close()
+
+
+def render(agg, fig_dir, missingness_bar) -> list:
+    """Draw the standard figure set from `agg`; returns the file names written."""
+    fig_dir = Path(fig_dir)
+    written = []
+    with perf.step("render"):
+        missingness_bar(missingness_frame(agg))
+        written.append("missingness_bar.png")
+        for col in NUMERIC_COLS:
+            if col in agg["hist"]:
+                hist_from_counts(agg, col, fig_dir)
+                written.append(f"hist_{col}.png")
+        if "density" in agg:
+            density_plot(agg, fig_dir)
+            written.append(f"scatter_{SCATTER[0]}_vs_{SCATTER[1]}.png")
+        if agg["corr"] is not None:
+            corr_from_matrix(agg, fig_dir)
+            written.append("corr_heatmap.png")
+        for cat, y, top_k, fname in BOXES:
+            if f"{cat}|{y}" in agg["boxes"]:
+                box_from_sketches(agg, cat, y, top_k, fname, fig_dir)
+                written.append(fname)
+        for col in TOP_COLS:
+            if col in agg["top"]:
+                top_from_counts(agg, col, fig_dir)
+                written.append(f"top_{col}.png")
+    return written
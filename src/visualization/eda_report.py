@@ -1,26 +1,44 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Optional
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from src.features.parsers import parse_sessions, parse_duration_minutes, to_int_safe
+from src import perf
+from src.data.typed import optimize_dtypes, read_typed, to_model_frame
 
 PARQUET_PATH = Path("data/interim/01_numeric.parquet")
 RAW_PATH = Path("data/raw/Talent_Academy_Case_DT_2025.xlsx")
 FIG_DIR = Path("reports/figures")
 SUM_DIR = Path("reports/summary")
+RENDER_CACHE = FIG_DIR / ".render_cache.json"
 
 def load_data():
+    # every column is needed (missingness, full-row duplicates), in compact dtypes
     if PARQUET_PATH.exists():
-        df = pd.read_parquet(PARQUET_PATH)
+        df = read_typed(PARQUET_PATH)
         print(f"Loaded: {PARQUET_PATH}")
     else:
         assert RAW_PATH.exists(), f"Missing raw data at {RAW_PATH}"
-        df = pd.read_excel(RAW_PATH)
+        from src.data.excel_cache import read_excel_cached
+        from src.features.parsers import (
+            parse_sessions_series, parse_duration_minutes_series, to_int_safe_series,
+        )
+        df = read_excel_cached(RAW_PATH)
         # derive numeric columns inline if parquet is missing
-        df["TedaviSuresi_num"] = df["TedaviSuresi"].apply(parse_sessions).apply(to_int_safe)
-        df["UygulamaSuresi_min"] = df["UygulamaSuresi"].apply(parse_duration_minutes)
+        df["TedaviSuresi_num"] = to_int_safe_series(parse_sessions_series(df["TedaviSuresi"]))
+        df["UygulamaSuresi_min"] = parse_duration_minutes_series(df["UygulamaSuresi"])
+        df = optimize_dtypes(df)
         print(f"Loaded raw and derived numerics: {RAW_PATH}")
     return df
 
@@ -30,6 +48,9 @@ def save_missingness(df):
     miss_df.columns = ["column", "missing_pct"]
     SUM_DIR.mkdir(parents=True, exist_ok=True)
     miss_df.to_csv(SUM_DIR / "missingness.csv", index=False)
+    return miss_df
+
+def missingness_bar(miss_df):
     plt.figure(figsize=(10, 6))
     sns.barplot(data=miss_df, x="missing_pct", y="column")
     plt.xlabel("Missing (%)")
@@ -99,48 +120,224 @@ def top_counts_bar(df, col, top_n=10):
     plt.savefig(FIG_DIR / f"top_{col}.png", dpi=150)
     plt.close()
 
-def main():
-    sns.set_theme()
-    FIG_DIR.mkdir(parents=True, exist_ok=True)
+# -------- Figure plan, per-figure cache, parallel rendering --------
+@dataclass
+class FigureJob:
+    fname: str                     # output file under FIG_DIR
+    func: str                      # plotting function in this module: func(frame, **kwargs)
+    columns: list = field(default_factory=list)   # columns of the shared frame it reads
+    kwargs: dict = field(default_factory=dict)
+    data: Optional[pd.DataFrame] = None           # small precomputed input, sent inline
 
-    df = load_data()
-    rows, cols = df.shape
-    pd.DataFrame([{"rows": rows, "cols": cols}]).to_csv(SUM_DIR / "shape.csv", index=False)
-
-    # 1) Missingness
-    save_missingness(df)
-
-    # 2) Basic histograms
+def plan_figures(df, miss_df):
+    """The figure set rendered by main(), in the original order."""
+    jobs = [FigureJob("missingness_bar.png", "missingness_bar", data=miss_df)]
     for col in ["Yas", "TedaviSuresi_num", "UygulamaSuresi_min"]:
         if col in df.columns:
-            hist_numeric(df, col)
-
-    # 3) Scatter & correlation
+            jobs.append(FigureJob(f"hist_{col}.png", "hist_numeric", [col], {"col": col}))
     if set(["Yas","TedaviSuresi_num"]).issubset(df.columns):
-        scatter(df, "Yas", "TedaviSuresi_num")
+        jobs.append(FigureJob("scatter_Yas_vs_TedaviSuresi_num.png", "scatter",
+                              ["Yas", "TedaviSuresi_num"], {"x": "Yas", "y": "TedaviSuresi_num"}))
     numeric_cols = [c for c in ["Yas","TedaviSuresi_num","UygulamaSuresi_min"] if c in df.columns]
     if len(numeric_cols) >= 2:
-        corr_heatmap(df, numeric_cols)
-
-    # 4) Boxplots
+        jobs.append(FigureJob("corr_heatmap.png", "corr_heatmap", numeric_cols, {"cols": numeric_cols}))
     if "Cinsiyet" in df.columns and "TedaviSuresi_num" in df.columns:
-        box_by_category(df, "Cinsiyet", "TedaviSuresi_num", fname="box_tedavi_by_cinsiyet.png")
+        jobs.append(FigureJob("box_tedavi_by_cinsiyet.png", "box_by_category", ["Cinsiyet", "TedaviSuresi_num"],
+                              {"cat": "Cinsiyet", "y": "TedaviSuresi_num", "fname": "box_tedavi_by_cinsiyet.png"}))
     if "Bolum" in df.columns and "TedaviSuresi_num" in df.columns:
-        box_by_category(df, "Bolum", "TedaviSuresi_num", top_k=8, fname="box_tedavi_by_bolum_top8.png")
-
-    # 5) Top frequency bars
+        jobs.append(FigureJob("box_tedavi_by_bolum_top8.png", "box_by_category", ["Bolum", "TedaviSuresi_num"],
+                              {"cat": "Bolum", "y": "TedaviSuresi_num", "top_k": 8,
+                               "fname": "box_tedavi_by_bolum_top8.png"}))
     for col in ["KanGrubu","Uyruk","Bolum","TedaviAdi"]:
         if col in df.columns:
-            top_counts_bar(df, col, top_n=10)
+            jobs.append(FigureJob(f"top_{col}.png", "top_counts_bar", [col], {"col": col, "top_n": 10}))
+    return jobs
 
-    # 6) Save small numeric summary
-    summary = {
-        "duplicate_full_rows": int(df.duplicated().sum()),
-        "unique_HastaNo": int(df["HastaNo"].nunique()) if "HastaNo" in df.columns else None
+def _frame_digest(frame):
+    return hashlib.sha256(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()).hexdigest()
+
+def job_key(job, col_digests, code_digest):
+    """Hash of a figure's input columns, parameters and the plotting code."""
+    payload = {
+        "func": job.func,
+        "kwargs": job.kwargs,
+        "columns": {c: col_digests[c] for c in job.columns},
+        "data": _frame_digest(job.data) if job.data is not None else None,
+        "code": code_digest,
     }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _run_job(frame, job):
+    # plots see plain dtypes (no unused categories in value_counts/groupby)
+    globals()[job.func](to_model_frame(frame), **job.kwargs)
+    return job.fname
+
+# Worker state: the shared Arrow file, memory-mapped once per process
+_SHARED = None
+
+def _init_worker(arrow_path):
+    global _SHARED
+    import pyarrow as pa
+    plt.switch_backend("Agg")
+    sns.set_theme()
+    _SHARED = pa.ipc.open_file(pa.memory_map(str(arrow_path), "r")).read_all()
+
+def _render_in_worker(job):
+    frame = job.data if job.data is not None else _SHARED.select(job.columns).to_pandas()
+    return _run_job(frame, job)
+
+def render_figures(df, jobs, n_jobs=1, use_cache=True):
+    """
+    Render `jobs`, skipping figures whose input hash matches the last render
+    (use_cache=False re-renders all of them). The keys of the figures drawn
+    are saved even when a later figure fails.
+    With n_jobs > 1, figures are drawn on a process pool (Agg backend); the
+    needed columns are shared through an uncompressed Arrow IPC file that
+    each worker memory-maps, instead of pickling the frame per task.
+    """
+    cache = json.loads(RENDER_CACHE.read_text(encoding="utf-8")) if RENDER_CACHE.exists() else {}
+    shared_cols = sorted({c for j in jobs for c in j.columns})
+    col_digests = {c: _frame_digest(df[[c]]) for c in shared_cols}
+    code_digest = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+    keys = {j.fname: job_key(j, col_digests, code_digest) for j in jobs}
+
+    todo = [j for j in jobs
+            if not (use_cache and cache.get(j.fname) == keys[j.fname] and (FIG_DIR / j.fname).exists())]
+    skipped = len(jobs) - len(todo)
+    if skipped:
+        print(f"⏭  {skipped} figure(s) unchanged, skipped")
+
+    for job in todo:  # until redrawn, these files no longer match their old keys
+        cache.pop(job.fname, None)
+    try:
+        if n_jobs <= 1 or len(todo) <= 1:
+            for job in todo:
+                _run_job(job.data if job.data is not None else df[job.columns], job)
+                cache[job.fname] = keys[job.fname]
+        else:
+            import pyarrow as pa
+            with tempfile.TemporaryDirectory() as tmp:
+                arrow_path = Path(tmp) / "eda_frame.arrow"
+                table = pa.Table.from_pandas(df[shared_cols], preserve_index=False)
+                with pa.OSFile(str(arrow_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+                del table
+                with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                         initargs=(arrow_path,)) as pool:
+                    futures = [pool.submit(_render_in_worker, job) for job in todo]
+                    errors = []
+                    for fut in as_completed(futures):
+                        try:
+                            fname = fut.result()
+                        except Exception as e:  # keep the figures that did finish
+                            errors.append(e)
+                            continue
+                        cache[fname] = keys[fname]
+                    if errors:
+                        raise errors[0]
+    finally:
+        RENDER_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        RENDER_CACHE.write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
+    return len(todo)
+
+def main_large(args):
+    """
+    Large-data mode: stream the parquet once into persisted aggregates
+    (src.visualization.eda_aggregates) and draw every figure from them.
+    Aggregates built from the same parquet (size, mtime) are reused, so a
+    re-render does not rescan the data.
+    """
+    from src.visualization import eda_aggregates as ea
+
+    agg = None
+    if args.from_aggregates:
+        agg = ea.load()
+        if agg is None:
+            print(f"❌ No aggregates at {ea.AGG_PATH} (run with --large first)")
+            sys.exit(1)
+    elif not args.force:
+        agg = ea.load(source=PARQUET_PATH)
+    if agg is None:
+        if not PARQUET_PATH.exists():
+            print(f"❌ Large mode reads {PARQUET_PATH} (run derive_numeric first)")
+            sys.exit(1)
+        agg = ea.build(PARQUET_PATH, args.chunksize or ea.DEFAULT_CHUNKSIZE)
+        perf.note_read(PARQUET_PATH)
+        print(f"Aggregated: {PARQUET_PATH} -> {ea.AGG_PATH}")
+    else:
+        print(f"Loaded aggregates: {ea.AGG_PATH} (no rescan)")
+    perf.set_rows(rows_in=agg["rows"])
+
+    SUM_DIR.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame([{"rows": agg["rows"], "cols": len(agg["columns"])}]).to_csv(SUM_DIR / "shape.csv", index=False)
+    ea.missingness_frame(agg).to_csv(SUM_DIR / "missingness.csv", index=False)
+    dup = agg["duplicates"]
+    summary = {"duplicate_full_rows": dup["duplicate_full_rows"], "unique_HastaNo": dup["unique_HastaNo"]}
+    pd.DataFrame([summary]).to_csv(SUM_DIR / "duplicates_summary.csv", index=False)
+
+    written = ea.render(agg, FIG_DIR, missingness_bar)
+    # these files no longer match the in-memory render cache entries
+    if RENDER_CACHE.exists():
+        cache = json.loads(RENDER_CACHE.read_text(encoding="utf-8"))
+        for fname in written:
+            cache.pop(fname, None)
+        RENDER_CACHE.write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
+    perf.note_written(SUM_DIR)
+    perf.set_extra(figures_planned=len(written), figures_rendered=len(written), large=True)
+
+    print(f"✅ EDA figures saved to: {FIG_DIR} ({len(written)} rendered from aggregates)")
+    print("✅ Summaries saved to:", SUM_DIR)
+
+@perf.instrument_stage("eda_report")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="EDA figures & summaries.")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="render figures on N processes (0 = all cores)")
+    ap.add_argument("--force", action="store_true", help="re-render every figure (ignore the render cache)")
+    ap.add_argument("--large", action="store_true",
+                    help="large-data mode: streaming aggregates (histogram counts, density, sketches)")
+    ap.add_argument("--chunksize", type=int, default=None,
+                    help="rows per chunk in large-data mode (implies --large)")
+    ap.add_argument("--from-aggregates", action="store_true",
+                    help="re-render the large-data figures from the saved aggregates only")
+    args = ap.parse_args(argv)
+    n_jobs = args.jobs or os.cpu_count() or 1
+
+    sns.set_theme()
+    FIG_DIR.mkdir(parents=True, exist_ok=True)
+    if args.large or args.chunksize or args.from_aggregates:
+        return main_large(args)
+
+    with perf.step("load") as st:
+        df = load_data()
+        st.rows = len(df)
+    perf.note_read(PARQUET_PATH if PARQUET_PATH.exists() else RAW_PATH)
+    perf.set_rows(rows_in=len(df))
+    rows, cols = df.shape
+    SUM_DIR.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame([{"rows": rows, "cols": cols}]).to_csv(SUM_DIR / "shape.csv", index=False)
+
+    # 1) Missingness summary (figure rendered with the others)
+    with perf.step("missingness", rows=rows):
+        miss_df = save_missingness(df)
+
+    # 2-5) Histograms, scatter & correlation, boxplots, top frequency bars
+    with perf.step("plan", rows=rows):
+        jobs = plan_figures(df, miss_df)
+    with perf.step("render", rows=rows):
+        rendered = render_figures(df, jobs, n_jobs=n_jobs, use_cache=not args.force)
+
+    # 6) Save small numeric summary
+    with perf.step("duplicates", rows=rows):
+        summary = {
+            "duplicate_full_rows": int(df.duplicated().sum()),
+            "unique_HastaNo": int(df["HastaNo"].nunique()) if "HastaNo" in df.columns else None
+        }
     pd.DataFrame([summary]).to_csv(SUM_DIR / "duplicates_summary.csv", index=False)
+    perf.note_written(SUM_DIR)
+    perf.set_extra(figures_planned=len(jobs), figures_rendered=rendered)
 
-    print("✅ EDA figures saved to:", FIG_DIR)
+    print(f"✅ EDA figures saved to: {FIG_DIR} ({rendered} rendered)")
     print("✅ Summaries saved to:", SUM_DIR)
 
 if __name__ == "__main__":
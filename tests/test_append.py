@@ -0,0 +1,55 @@
+"""
+Append then refit must keep the rows a full run over history + batch keeps
+(keep-first per HastaNo), and give the same model-ready dataset.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.model_ready import DENSE_PARQ, PARTS_DIR, lookup
+from src.data.synthetic import generate
+from src.features import append, derive_numeric, preprocess
+
+PREPROCESS_ARGS = ["--no-csv", "--no-mmap"]
+
+
+def _full_run(raw: pd.DataFrame, path="data/raw/export.parquet") -> pd.DataFrame:
+    raw.to_parquet(path, index=False)
+    derive_numeric.main(["--input", path])
+    preprocess.main(PREPROCESS_ARGS)
+    return pd.read_parquet(DENSE_PARQ)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # every stage reads and writes relative to the repo root
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    history = generate(2_000, seed=1)
+    batch = generate(400, seed=2)
+    # a quarter of the batch repeats history ids; the rest are new ids, repeated within the batch
+    batch["HastaNo"] = batch["HastaNo"] + 10_000_000
+    old_ids = history["HastaNo"].drop_duplicates().to_numpy()
+    batch.loc[:99, "HastaNo"] = np.random.default_rng(0).choice(old_ids, 100)
+    return history, batch
+
+
+def test_append_then_refit_keeps_first(project):
+    history, batch = project
+    _full_run(history)
+    batch.to_parquet("data/raw/batch.parquet", index=False)
+    append.main(["--input", "data/raw/batch.parquet"])
+
+    # the appended part holds exactly the batch rows a full run would add
+    part = pd.read_parquet(next(PARTS_DIR.glob("part-*.parquet")))
+    new_ids = batch["HastaNo"][~batch["HastaNo"].isin(history["HastaNo"])].drop_duplicates(keep="first")
+    assert part["HastaNo"].tolist() == new_ids.tolist()
+    pd.testing.assert_frame_equal(lookup(new_ids.tolist()), part)
+
+    preprocess.main(PREPROCESS_ARGS)  # refit over history + appended batches
+    refit = pd.read_parquet(DENSE_PARQ)
+    assert not list(PARTS_DIR.glob("part-*.parquet"))  # folded into the base file
+
+    for p in derive_numeric.PARTS_DIR.glob("part-*.parquet"):  # a fresh full run has no appended batches
+        p.unlink()
+    full = _full_run(pd.concat([history, batch], ignore_index=True))
+    pd.testing.assert_frame_equal(refit, full)
@@ -0,0 +1,50 @@
+"""The JSON artifact must transform records exactly as the fitted ColumnTransformer does."""
+import json
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from src.data.synthetic import generate
+from src.data.typed import optimize_dtypes, to_model_frame
+from src.features.derive_numeric import derive
+from src.features.preprocess import NUM_COLS, USED_COLS, build_column_transformer
+from src.serving.compiled import CompiledPreprocessor
+
+N_FIT = 3_000  # the remaining rows include categories/tokens the fit never saw
+
+
+@pytest.fixture(scope="module")
+def frame():
+    df = optimize_dtypes(derive(generate(4_000, seed=7)))
+    return to_model_frame(df[USED_COLS], float_cols=NUM_COLS)
+
+
+def _dense(X):
+    return X.toarray() if sparse.issparse(X) else np.asarray(X)
+
+
+@pytest.mark.parametrize("sparse_output, hash_width, min_df, max_features", [
+    (False, 0, 1, None),    # the committed pipeline's settings
+    (False, 16, 3, None),   # hash branch, min_df caps
+    (True, 32, 5, 4),       # sparse output, both caps
+])
+def test_json_artifact_matches_pipeline(frame, tmp_path, sparse_output, hash_width, min_df, max_features):
+    ct = build_column_transformer(sparse_output, hash_width, min_df, max_features).fit(frame.iloc[:N_FIT])
+    path = tmp_path / "preprocess_pipeline.json"
+    CompiledPreprocessor.from_pipeline(ct).save(path)
+    compiled = CompiledPreprocessor.load(path)
+
+    rows = frame.iloc[N_FIT:]
+    records = json.loads(json.dumps(rows.to_dict("records")))  # as a client would send them
+    expected = ct.transform(rows)
+    got = compiled.transform(records)
+    assert sparse.issparse(got) == sparse.issparse(expected)
+    np.testing.assert_array_equal(_dense(got), _dense(expected))
+    assert compiled.feature_names == list(ct.get_feature_names_out())
+
+    # one record at a time, and the raw CSR triplets the server slices
+    np.testing.assert_array_equal(compiled.transform_one(records[0]), _dense(expected)[0])
+    indptr, indices, data = compiled.transform_csr(records)
+    csr = sparse.csr_matrix((data, indices, indptr), shape=(len(records), compiled.n_features))
+    np.testing.assert_array_equal(csr.toarray(), _dense(expected))
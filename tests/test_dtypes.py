@@ -0,0 +1,82 @@
+"""Compact output dtypes must round-trip the float64 transform through every layout."""
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from src.data.model_ready import (SparseWriter, branch_of, cast_features, dtype_policy, feature_dtypes,
+                                  feature_frame, load_mmap, load_mmap_blocks, save_mmap, sparse_dtype)
+from src.data.synthetic import generate
+from src.data.typed import optimize_dtypes, to_model_frame
+from src.features.derive_numeric import derive
+from src.features.preprocess import ID_COL, NUM_COLS, TARGET, USED_COLS, build_column_transformer
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    df = optimize_dtypes(derive(generate(2_000, seed=9))).drop_duplicates(ID_COL).reset_index(drop=True)
+    ct = build_column_transformer(hash_width=16).fit(to_model_frame(df[USED_COLS], float_cols=NUM_COLS))
+    X = ct.transform(to_model_frame(df[USED_COLS], float_cols=NUM_COLS))
+    return to_model_frame(df[[ID_COL, TARGET]]), X, list(ct.get_feature_names_out())
+
+
+def _expected(X, names):
+    """What compact storage keeps: float32-rounded numerics, everything else exact."""
+    out = X.copy()
+    num = [j for j, n in enumerate(names) if branch_of(n) == "num"]
+    out[:, num] = X[:, num].astype(np.float32)
+    return out
+
+
+@pytest.mark.parametrize("indicator", ["uint8", "bool"])
+def test_parquet_round_trip(fitted, tmp_path, indicator):
+    ids, X, names = fitted
+    policy = dtype_policy("compact", indicator)
+    path = tmp_path / "dataset_model_ready.parquet"
+    pd.concat([ids, feature_frame(X, names, feature_dtypes(names, policy))], axis=1).to_parquet(path, index=False)
+    back = pd.read_parquet(path)
+    assert [back[n].dtype for n in names] == [np.dtype(policy[branch_of(n)]) for n in names]
+    np.testing.assert_array_equal(back[names].to_numpy(dtype=np.float64), _expected(X, names))
+    pd.testing.assert_frame_equal(back[[ID_COL, TARGET]], ids)
+
+
+@pytest.mark.parametrize("indicator, packbits", [("uint8", False), ("uint8", True), ("bool", True)])
+def test_mmap_round_trip(fitted, tmp_path, indicator, packbits):
+    ids, X, names = fitted
+    policy = dtype_policy("compact", indicator)
+    paths = {"x_path": tmp_path / "X.npy", "ids_path": tmp_path / "ids.npy", "header_path": tmp_path / "X.json"}
+    save_mmap(ids, X, names, policy=policy, packbits=packbits, **paths)
+
+    stored_ids, blocks, stored_names = load_mmap_blocks(paths["header_path"])
+    assert stored_names == names
+    for b in blocks:
+        assert b.dtype == np.dtype(policy[b.branch])
+        assert b.packed == (packbits and b.branch in ("cat", "mlb"))
+        np.testing.assert_array_equal(b.values().astype(np.float64), _expected(X, names)[:, b.start:b.stop])
+    with pytest.raises(ValueError, match="load_mmap_blocks"):
+        load_mmap(paths["header_path"])  # never upcast silently
+    _, X64, _ = load_mmap(paths["header_path"], dtype=np.float64)
+    np.testing.assert_array_equal(X64, _expected(X, names))
+    np.testing.assert_array_equal(stored_ids[ID_COL], ids[ID_COL].to_numpy(dtype=np.int64))
+
+
+def test_sparse_round_trip(fitted, tmp_path):
+    ids, X, names = fitted
+    dtype = sparse_dtype(dtype_policy("compact"))
+    assert dtype == np.float32
+    writer = SparseWriter(len(names), dtype, tmp_path / "X.npz", tmp_path / "ids.parquet")
+    for rows in np.array_split(np.arange(len(X)), 3):
+        writer.write(ids.iloc[rows], sparse.csr_matrix(X[rows]))
+    writer.close()
+    back = sparse.load_npz(tmp_path / "X.npz")
+    assert back.dtype == np.float32
+    np.testing.assert_array_equal(back.toarray(), X.astype(np.float32))
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "ids.parquet"), ids)
+
+
+def test_integer_casts_are_exact():
+    with pytest.raises(ValueError, match="uint8"):
+        cast_features(np.array([[0.0, 0.5]]), np.uint8)
+    with pytest.raises(ValueError, match="int8"):
+        cast_features(np.array([[200.0]]), np.int8)
+    np.testing.assert_array_equal(cast_features(np.array([[1.0, -3.0]]), np.int8), [[1, -3]])
@@ -0,0 +1,57 @@
+"""lookup() through the HastaNo index must return what a filtered full read returns."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.model_ready import append_index, lookup, write_index
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(11)
+    ids = rng.permutation(np.arange(10_000, 12_500))
+    frame = pd.DataFrame({
+        "HastaNo": pd.array(ids, dtype="Int64"),
+        "TedaviSuresi_num": pd.array(rng.integers(1, 30, len(ids)), dtype="Int64"),
+        "num__Yas": rng.normal(size=len(ids)),
+        "cat__Cinsiyet_Kadın": rng.integers(0, 2, len(ids)).astype(np.uint8),
+    })
+    frame.loc[[5, 700], "HastaNo"] = pd.NA  # not indexed, never returned
+    base, part = tmp_path / "dataset_model_ready.parquet", tmp_path / "parts" / "part-00001.parquet"
+    part.parent.mkdir()
+    frame.iloc[:2_000].to_parquet(base, index=False, row_group_size=256)
+    frame.iloc[2_000:].to_parquet(part, index=False, row_group_size=128)
+    index = tmp_path / "dataset_model_ready_index.npz"
+    write_index(base, "HastaNo", index)
+    append_index(part, index)
+    return frame, index, part
+
+
+def _expected(frame, query, columns=None):
+    known = frame.dropna(subset=["HastaNo"]).set_index("HastaNo", drop=False)
+    hits = [q for q in query if q in known.index]
+    out = known.loc[hits].reset_index(drop=True)
+    return out if columns is None else out[["HastaNo"] + columns]
+
+
+def test_lookup_matches_filtered_read(dataset):
+    frame, index, _ = dataset
+    rng = np.random.default_rng(3)
+    query = list(rng.choice(frame["HastaNo"].dropna().to_numpy(dtype=np.int64), 300, replace=False))
+    query += [1, 99_999, int(query[0])]  # unknown ids are skipped, repeats are kept
+    pd.testing.assert_frame_equal(lookup(query, index_path=index), _expected(frame, query))
+    cols = ["num__Yas"]
+    pd.testing.assert_frame_equal(lookup(query, columns=cols, index_path=index), _expected(frame, query, cols))
+
+
+def test_lookup_edge_cases(dataset):
+    frame, index, part = dataset
+    assert lookup([1, 2], index_path=index).empty
+    one = int(frame["HastaNo"].iloc[-1])  # last row of the appended part
+    pd.testing.assert_frame_equal(lookup(one, index_path=index), _expected(frame, [one]))
+    st = part.stat()
+    os.utime(part, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))  # rewritten: the index is stale
+    with pytest.raises(ValueError, match="stale"):
+        lookup([one], index_path=index)
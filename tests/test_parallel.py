@@ -0,0 +1,49 @@
+"""transform_sharded must give exactly what ct.transform gives, in row order."""
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from src.data.synthetic import generate
+from src.features.parallel import shard_bounds, transform_sharded
+
+NUM, CAT = ["Yas"], ["Cinsiyet", "KanGrubu", "Bolum"]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return generate(3_000, seed=5)[NUM + CAT]
+
+
+def _fit(frame, sparse_output):
+    ct = ColumnTransformer([
+        ("num", Pipeline([("imp", SimpleImputer(strategy="median")), ("sc", StandardScaler())]), NUM),
+        ("cat", Pipeline([("imp", SimpleImputer(strategy="most_frequent")),
+                          ("ohe", OneHotEncoder(handle_unknown="ignore", sparse_output=sparse_output))]), CAT),
+    ], sparse_threshold=1.0 if sparse_output else 0.0)
+    return ct.fit(frame)
+
+
+def test_shard_bounds_cover_all_rows():
+    bounds = shard_bounds(10, 4)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 10
+    assert all(a[1] == b[0] for a, b in zip(bounds, bounds[1:]))
+    assert shard_bounds(3, 8) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_dense_matches_transform(frame, tmp_path):
+    ct = _fit(frame, sparse_output=False)
+    Xt = transform_sharded(ct, frame, n_jobs=2, n_shards=7, out_dir=tmp_path)
+    assert isinstance(Xt, np.memmap) and not Xt.flags.writeable
+    np.testing.assert_array_equal(Xt, ct.transform(frame))
+    assert not list(tmp_path.iterdir())  # the backing file is already unlinked
+
+
+def test_sparse_matches_transform(frame):
+    ct = _fit(frame, sparse_output=True)
+    Xt = transform_sharded(ct, frame, n_jobs=2, n_shards=7)
+    assert sparse.issparse(Xt)
+    assert (Xt != ct.transform(frame)).nnz == 0
@@ -0,0 +1,49 @@
+"""The Series parsers (pyarrow kernels) must give what the scalar parsers give."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.synthetic import generate
+from src.features import parsers
+from src.features.memo import clear_caches
+
+# Where RE2 / Arrow's string kernels and Python's re / str differ
+EDGE_CASES = [
+    "10 seans", "8-10 seans", "5 - 7 seans", "10–15 Seans", "1,5 saat", "90 sn", "20 dk ",
+    "2 GÜN", "3 gün", "İKİ SAAT 2", "15\xa0-\xa020", "٣ seans", "١٠-١٢", "5\x1c-\x1c7",
+    "\x1f45 dk\x1c", "4 saat", "Σ 5 dakika", "", " ", "seans", "-3", "1.5.2",
+    "9" * 400, None, np.nan, 15, 15.0, 2.5,
+]
+
+
+def _scalar(func, values):
+    out = [func(v) if isinstance(v, str) or isinstance(v, (int, float)) and v == v else None
+           for v in values]
+    return np.array([np.nan if v is None else v for v in out], dtype="float64")
+
+
+@pytest.fixture(scope="module")
+def export_values():
+    df = generate(20_000, seed=3)
+    return {c: list(df[c].drop_duplicates()) + EDGE_CASES for c in ("TedaviSuresi", "UygulamaSuresi")}
+
+
+@pytest.mark.parametrize("dtype", [object, "string"])
+@pytest.mark.parametrize("vec, scalar", [
+    (parsers.extract_number_or_range_series, parsers.extract_number_or_range),
+    (parsers.parse_sessions_series, parsers.parse_sessions),
+    (parsers.parse_duration_minutes_series, parsers.parse_duration_minutes),
+])
+def test_series_parsers_match_scalar(export_values, vec, scalar, dtype):
+    for values in export_values.values():
+        if dtype == "string":
+            values = [v for v in values if isinstance(v, str) or v is None]
+        clear_caches()
+        got = vec(pd.Series(values, dtype=dtype)).to_numpy(dtype="float64")
+        np.testing.assert_array_equal(got, _scalar(scalar, values))
+
+
+def test_duration_unit_series_matches_scalar(export_values):
+    values = [v for v in export_values["UygulamaSuresi"] if isinstance(v, str)]
+    got = list(parsers.duration_unit_series(pd.Series(values, dtype=object)))
+    assert got == [parsers._duration_unit(v.lower().strip()) for v in values]